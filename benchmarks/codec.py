@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+
+"""
+Measure how fast each JSON codec decodes large enumerations.
+
+An inventory enumeration of each --dimms size is decoded by every codec
+of openbmc.JsonCodec that is installed, and by requests' Response.json()
+which responses used to go through.  The same enumeration is then
+replayed offline from a ResponseStore which keeps nothing decoded, and
+fetched with OpenBMC.enumerate() from a MockOpenBMC, with each codec in
+turn.
+
+    python3 benchmarks/codec.py --dimms 256 1024 4096
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+# pylint: disable=wrong-import-position
+from openbmc.JsonCodec import CODECS, make_codec, set_codec
+from openbmc.MockOpenBMC import build_objects
+from openbmc.OpenBMC import INVENTORY_PATH, OpenBMC
+from openbmc.ResponseStore import ResponseStore
+from operations import MockServers
+
+
+def enumerate_json(dimms):
+    """Return an inventory enumeration of dimms DIMMs, as the BMC sends it"""
+
+    data = dict((path, properties)
+                for (path, properties) in build_objects(dimms=dimms).items()
+                if path.startswith(INVENTORY_PATH))
+    return json.dumps({"data": data,
+                       "message": "200 OK",
+                       "status": "ok"}).encode("utf-8")
+
+
+def installed_codecs():
+    """Return the Codecs which can be used here"""
+
+    codecs = []
+    for name in CODECS:
+        try:
+            codecs.append(make_codec(name))
+        except ValueError:
+            pass
+    return codecs
+
+
+def time_median(run, iterations):
+    """Return the median seconds run() takes"""
+
+    times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def response_json(content):
+    """Return a function decoding content the way Response.json() does"""
+
+    try:
+        import requests
+    except ImportError:
+        return None
+
+    def run():
+        response = requests.models.Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = "application/json"
+        # pylint: disable=protected-access
+        response._content = content
+        return response.json()
+
+    return run
+
+
+def decoding(codecs, sizes, iterations):
+    """Time every codec decoding an enumeration of each size"""
+
+    results = []
+    for dimms in sizes:
+        content = enumerate_json(dimms)
+        runs = [(codec.name, (lambda codec=codec: codec.loads(content)))
+                for codec in codecs]
+        old = response_json(content)
+        if old is not None:
+            runs.append(("Response.json()", old))
+        for (name, run) in runs:
+            seconds = time_median(run, iterations)
+            results.append({"benchmark": "decode",
+                            "codec": name,
+                            "dimms": dimms,
+                            "bytes": len(content),
+                            "ms": seconds * 1000,
+                            "mb_per_second": len(content) / seconds / 1e6})
+    return results
+
+
+def replaying(codecs, sizes, iterations, scratch):
+    """Time replaying an enumeration offline with every codec"""
+
+    # Keep nothing decoded, so that every get() decodes the body
+    store = ResponseStore(os.path.join(scratch, "replay.db"), lru_size=0)
+    url = "https://bmc/org/openbmc/inventory/system/enumerate"
+
+    results = []
+    try:
+        for dimms in sizes:
+            content = enumerate_json(dimms)
+            store.put("GET", url, None, 200, content)
+            for codec in codecs:
+                set_codec(codec)
+                seconds = time_median(lambda: store.get("GET", url),
+                                      iterations)
+                results.append({"benchmark": "replay",
+                                "codec": codec.name,
+                                "dimms": dimms,
+                                "bytes": len(content),
+                                "ms": seconds * 1000,
+                                "mb_per_second": len(content) / seconds / 1e6})
+    finally:
+        set_codec(None)
+        store.close()
+    return results
+
+
+def fetching(codecs, dimms, iterations, scratch):
+    """Time OpenBMC.enumerate() against a MockOpenBMC with every codec"""
+
+    servers = MockServers(1, {"dimms": dimms})
+    store = ResponseStore(os.path.join(scratch, "fetch.db"))
+    content = enumerate_json(dimms)
+
+    results = []
+    try:
+        ob = OpenBMC(servers.hostnames[0],
+                     servers.user,
+                     servers.password,
+                     True,
+                     store=store)
+        for codec in codecs:
+            set_codec(codec)
+            seconds = time_median(lambda: ob.enumerate(INVENTORY_PATH),
+                                  iterations)
+            results.append({"benchmark": "enumerate",
+                            "codec": codec.name,
+                            "dimms": dimms,
+                            "bytes": len(content),
+                            "ms": seconds * 1000,
+                            "mb_per_second": len(content) / seconds / 1e6})
+    finally:
+        set_codec(None)
+        store.close()
+        servers.close()
+    return results
+
+
+def print_results(title, results):
+    """Print one table of results"""
+
+    print(title)
+    print("%-16s %6s %10s %9s %9s" % (
+        "codec", "dimms", "bytes", "ms", "MB/s", ))
+    for result in results:
+        print("%-16s %6d %10d %9.2f %9.1f" % (
+            result["codec"],
+            result["dimms"],
+            result["bytes"],
+            result["ms"],
+            result["mb_per_second"], ))
+    print()
+
+
+def main():
+    """Benchmark the codecs"""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--dimms", type=int, nargs="+",
+                        default=[256, 1024, 4096],
+                        help="sizes of the inventories to decode")
+    parser.add_argument("--iterations", type=int, default=20,
+                        help="times each codec decodes each inventory")
+    parser.add_argument("--json", default=None,
+                        help="also write the results to this file")
+    args = parser.parse_args()
+
+    # The mock's certificate is self-signed
+    warnings.filterwarnings("ignore", message="Unverified HTTPS request")
+
+    codecs = installed_codecs()
+    scratch = tempfile.mkdtemp(prefix="openbmc-benchmark")
+
+    everything = []
+    try:
+        for (title, results) in (
+                ("Decoding an enumeration",
+                 decoding(codecs, args.dimms, args.iterations)),
+                ("Replaying an enumeration from a ResponseStore",
+                 replaying(codecs, args.dimms, args.iterations, scratch)),
+                ("OpenBMC.enumerate() from a MockOpenBMC",
+                 fetching(codecs, max(args.dimms), args.iterations,
+                          scratch))):
+            print_results(title, results)
+            everything.extend(results)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as fp:
+            json.dump(everything, fp, sort_keys=True, indent=4)
+
+
+if __name__ == "__main__":
+    main()
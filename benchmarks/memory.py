@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+"""
+Measure how much memory holding the results of many BMCs takes.
+
+For each simulated host an inventory, control tree and event log shaped
+like a real BMC's are decoded from JSON, and the memory they take as
+plain dictionaries is compared with the same data as openbmc.Records.
+The cost of holding one CachedResponse per host is measured as well.
+
+    python3 benchmarks/memory.py --hosts 10000
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# pylint: disable=wrong-import-position
+from openbmc.OpenBMC import CachedResponse
+from openbmc.Records import Event, control_records, frus
+
+
+def inventory_json(host, dimms):
+    """Return an inventory enumeration like a real BMC's, as JSON"""
+
+    data = {}
+    for i in range(dimms):
+        path = "/org/openbmc/inventory/system/chassis/motherboard/dimm%d" % i
+        properties = {"fru_type": "DIMM",
+                      "is_fru": 1,
+                      "present": "True",
+                      "fault": "False",
+                      "version": "",
+                      "Asset Tag": "",
+                      "FRU File ID": "",
+                      "Manufacturer": "0xce80",
+                      "Model Number": "M393B2G70DB0-YK0  ",
+                      "Name": "0x0b",
+                      "Serial Number": "0x%04x%04x" % (host % 65536, i),
+                      "Version": "0x0000"}
+        for field in range(1, 9):
+            properties["Custom Field %d" % field] = ""
+        data[path] = properties
+        data[path + "/event"] = {}
+    for i in range(2):
+        data["/org/openbmc/inventory/system/chassis/motherboard/cpu%d" % (
+            i, )] = {"fru_type": "CPU",
+                     "is_fru": 1,
+                     "present": "True",
+                     "fault": "False",
+                     "version": ""}
+    return json.dumps({"data": data, "message": "200 OK", "status": "ok"})
+
+
+def control_json():
+    """Return a control enumeration like a real BMC's, as JSON"""
+
+    data = {"/org/openbmc/control/power0": {"pgood": 1,
+                                            "poll_interval": 3000,
+                                            "pgood_timeout": 10,
+                                            "state": 1},
+            "/org/openbmc/control/chassis0": {"reboot": 0,
+                                              "uuid": "24340d83aa784d858468"}}
+    return json.dumps({"data": data, "message": "200 OK", "status": "ok"})
+
+
+def events_json(events):
+    """Return the records of an event log, as JSON"""
+
+    return [json.dumps({"associations": [
+        ["fru", "event",
+         "/org/openbmc/inventory/system/chassis/motherboard/dimm%d" % i]],
+                        "severity": "Info",
+                        "reported_by": "Test",
+                        "debug_data": [48, 0, 19, 127, 136, 255],
+                        "time": "2016:09:20 12:57:%02d" % (i % 60, ),
+                        "message": "A Test event log just happened"})
+            for i in range(events)]
+
+
+def measure(build, count):
+    """Return the bytes build(i) for i in range(count) keeps alive"""
+
+    gc.collect()
+    tracemalloc.start()
+    kept = [build(i) for i in range(count)]
+    (current, _) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    gc.collect()
+    return current
+
+
+def main():
+    """Print the footprint per host of each representation"""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--hosts", type=int, default=1000)
+    parser.add_argument("--dimms", type=int, default=32)
+    parser.add_argument("--events", type=int, default=20)
+    args = parser.parse_args()
+
+    inventories = [inventory_json(host, args.dimms)
+                   for host in range(args.hosts)]
+    control = control_json()
+    events = events_json(args.events)
+
+    def as_dicts(host):
+        """Everything about one host as decoded dictionaries"""
+        return (json.loads(inventories[host])["data"],
+                json.loads(control)["data"],
+                [json.loads(event) for event in events])
+
+    def as_records(host):
+        """Everything about one host as records"""
+        return (frus(json.loads(inventories[host])["data"].items()),
+                control_records(json.loads(control)["data"].items()),
+                [Event.from_properties("/org/openbmc/records/events/%d" % (
+                    i, ), json.loads(event))
+                 for (i, event) in enumerate(events)])
+
+    content = json.loads(control)
+
+    results = [("dictionaries", measure(as_dicts, args.hosts)),
+               ("records", measure(as_records, args.hosts)),
+               ("CachedResponse", measure(
+                   lambda _: CachedResponse(200, content), args.hosts))]
+
+    print("%d hosts, %d DIMMs and %d events each" % (args.hosts,
+                                                      args.dimms,
+                                                      args.events, ))
+    for (name, total) in results:
+        print("%-16s %10d bytes per host %8.1f MiB in all" % (
+            name,
+            total // args.hosts,
+            total / 1024.0 / 1024.0, ))
+
+
+if __name__ == "__main__":
+    main()
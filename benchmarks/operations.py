@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+
+"""
+Measure the latency, throughput and traffic of every OpenBMC operation.
+
+Each public method of openbmc.OpenBMC and each openBmcTool subcommand is
+run against MockOpenBMC servers, which live in a separate process so
+that serving does not compete with the client for the interpreter.  For
+every level of concurrency asked for, that many clients each work
+against their own server, as when a fleet is driven at once, and the
+report gives per operation latency (median and 95th percentile), the
+operations and requests per second achieved, and the requests and bytes
+each operation cost on the wire.
+
+    python3 benchmarks/operations.py --latency 0.005 --concurrency 1 8
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+# pylint: disable=wrong-import-position
+from openbmc.EventSync import EventSync
+from openbmc.MockOpenBMC import MockOpenBMC
+from openbmc.OpenBMC import FIRMWARE_VERSION_PATH, INVENTORY_PATH, OpenBMC
+from openbmc.ResponseStore import ResponseStore
+
+TOOL = os.path.join(ROOT, "openbmc", "openBmcTool")
+
+
+def serve_mocks(connection, count, options):
+    """Run count MockOpenBMCs, doing what is asked over connection"""
+
+    mocks = [MockOpenBMC(**options).start() for _ in range(count)]
+    connection.send([mock.hostname for mock in mocks])
+
+    while True:
+        (name, index, args) = connection.recv()
+        if name == "stop":
+            break
+        connection.send(getattr(mocks[index], name)(*args))
+
+    for mock in mocks:
+        mock.stop()
+
+
+class MockServers(object):
+    """MockOpenBMCs running in a child process"""
+
+    def __init__(self, count, options):
+        (self._connection, child) = multiprocessing.Pipe()
+        self._lock = threading.Lock()
+        self._process = multiprocessing.Process(target=serve_mocks,
+                                                args=(child, count, options))
+        self._process.daemon = True
+        self._process.start()
+        self.hostnames = self._connection.recv()
+        self.user = options.get("user", "root")
+        self.password = options.get("password", "0penBmc")
+
+    def call(self, index, name, *args):
+        """Call name(*args) on mock number index"""
+
+        with self._lock:
+            self._connection.send((name, index, args))
+            return self._connection.recv()
+
+    def totals(self):
+        """Return the stats of every mock added together"""
+
+        totals = {}
+        for index in range(len(self.hostnames)):
+            for (name, value) in self.call(index, "stats").items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def close(self):
+        """Stop every mock"""
+
+        with self._lock:
+            self._connection.send(("stop", None, ()))
+        self._process.join()
+
+
+def percentile(values, fraction):
+    """Return the value fraction of the way through the sorted values"""
+
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def measure(servers, concurrency, iterations, setup, run):
+    """Run an operation iterations times on each of concurrency clients
+
+    setup(index) prepares client index and returns a context, then each
+    iteration calls setup's context through run(context, index), which
+    is all that is timed.  Returns a dictionary of results.
+    """
+
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+    ready = threading.Barrier(concurrency + 1)
+    go = threading.Event()
+
+    def client(index):
+        """One client's share of the work"""
+        count = iterations
+        try:
+            context = setup(index)
+            # Once through first so that connecting and logging in are
+            # not counted against the operation
+            run(context, index)
+        except Exception as ex:  # pylint: disable=broad-except
+            with lock:
+                failures.append(repr(ex))
+            count = 0
+        ready.wait()
+        go.wait()
+        mine = []
+        for _ in range(count):
+            start = time.time()
+            try:
+                run(context, index)
+            except Exception as ex:  # pylint: disable=broad-except
+                with lock:
+                    failures.append(repr(ex))
+                continue
+            mine.append(time.time() - start)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(index, ))
+               for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    ready.wait()
+    before = servers.totals()
+    start = time.time()
+    go.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+    after = servers.totals()
+
+    done = len(latencies)
+    result = {"concurrency": concurrency,
+              "operations": done,
+              "failures": len(failures),
+              "seconds": elapsed}
+    if failures:
+        result["first_failure"] = failures[0]
+    if done:
+        requests = after["requests"] - before["requests"]
+        result.update({
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "mean_ms": sum(latencies) / done * 1000,
+            "operations_per_second": done / elapsed,
+            "requests_per_second": requests / elapsed,
+            "requests_per_operation": requests / float(done),
+            "bytes_sent_per_operation": (
+                after["bytes_received"] - before["bytes_received"]) / done,
+            "bytes_received_per_operation": (
+                after["bytes_sent"] - before["bytes_sent"]) / done})
+    return result
+
+
+def library_operations(servers, homes, store):
+    """Return [(name, setup, run)] for the public methods of OpenBMC
+
+    Responses are recorded in store, as they would be in the default one.
+    """
+
+    def login(index):
+        return OpenBMC(servers.hostnames[index],
+                       servers.user,
+                       servers.password,
+                       True,
+                       store=store)
+
+    def powered(state):
+        """Log in, after setting the power to state before each run"""
+        def setup(index):
+            return (login(index), state)
+        return setup
+
+    def with_power(state, do):
+        """Set the power to state, then do(ob)"""
+        def run(context, index):
+            servers.call(index, "set_power", state)
+            context[0].invalidate_control_cache()
+            return do(context[0])
+        return run
+
+    def event_sync(index):
+        ob = login(index)
+        return (ob, os.path.join(homes[index], "events"))
+
+    def sync_all(context, _):
+        """Fetch every event, as a first sync does"""
+        (ob, directory) = context
+        shutil.rmtree(directory, ignore_errors=True)
+        EventSync(ob,
+                  log_filename=os.path.join(directory, "log.ndjson"),
+                  state_filename=os.path.join(directory, "state.json")).sync()
+
+    def cold(do):
+        """do(ob) without reusing the previous enumeration"""
+        def run(ob, _):
+            ob.invalidate_control_cache()
+            ob.invalidate_inventory()
+            return do(ob)
+        return run
+
+    return [
+        ("OpenBMC()", lambda index: None,
+         lambda _, index: login(index)),
+        ("get", login,
+         cold(lambda ob: ob.get(FIRMWARE_VERSION_PATH))),
+        ("enumerate", login,
+         cold(lambda ob: ob.enumerate(INVENTORY_PATH))),
+        ("iter_enumerate", login,
+         cold(lambda ob: list(ob.iter_enumerate(INVENTORY_PATH,
+                                                suffix="/dimm0")))),
+        ("get_inventory", login,
+         cold(lambda ob: ob.get_inventory())),
+        ("get_frus", login,
+         cold(lambda ob: ob.get_frus())),
+        ("get_power_state", login,
+         cold(lambda ob: ob.get_power_state())),
+        ("power_on", powered(0),
+         with_power(0, lambda ob: ob.power_on())),
+        ("power_off", powered(1),
+         with_power(1, lambda ob: ob.power_off())),
+        ("trigger_warm_reset", login,
+         cold(lambda ob: ob.trigger_warm_reset())),
+        ("get_flash_bios", login,
+         cold(lambda ob: ob.get_flash_bios())),
+        ("get_bmc_state", login,
+         cold(lambda ob: ob.get_bmc_state())),
+        ("wait_for_power_state", login,
+         cold(lambda ob: ob.wait_for_power_state(0, 10))),
+        ("wait_for_bmc_state", login,
+         cold(lambda ob: ob.wait_for_bmc_state("HOST_POWERED_OFF", 10))),
+        ("EventSync.sync", event_sync, sync_all),
+    ]
+
+
+def tool_operations(servers, homes, python):
+    """Return [(name, setup, run)] for the openBmcTool subcommands"""
+
+    # What to run, and what the power must be beforehand (None if it
+    # does not matter).  watch is given a second to connect and resync,
+    # which its latency includes.
+    commands = [
+        (["is_power", "?"], None),
+        (["set_power", "on"], 0),
+        (["set_power", "off"], 1),
+        (["get_power_state"], None),
+        (["trigger_warm_reset"], None),
+        (["show_memory"], None),
+        (["ingest_inventory"], None),
+        (["query_inventory", "--fru-type", "DIMM"], None),
+        (["take_snapshot"], None),
+        (["list_snapshots"], None),
+        (["diff_snapshots"], None),
+        (["get_boot_progress"], None),
+        (["get_events"], None),
+        (["get_flash_status"], None),
+        (["get_bmc_state"], None),
+        (["wait_power", "off", "--timeout", "10"], 0),
+        (["wait_bmc_state", "HOST_POWERED_OFF", "--timeout", "10"], 0),
+        (["sample", "--rounds", "1"], None),
+        (["watch", "--duration", "1"], None),
+    ]
+
+    def runner(arguments, state):
+        """Run the tool with arguments against client index's server"""
+        def run(_, index):
+            if state is not None:
+                servers.call(index, "set_power", state)
+            env = dict(os.environ,
+                       HOME=homes[index],
+                       PYTHONPATH=ROOT)
+            process = subprocess.Popen([python, TOOL,
+                                        "-o",
+                                        "-n", servers.hostnames[index],
+                                        "-u", servers.user,
+                                        "-p", servers.password] + arguments,
+                                       stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE,
+                                       env=env)
+            (_, stderr) = process.communicate()
+            if process.returncode != 0:
+                raise RuntimeError("exit status %d: %s" % (
+                    process.returncode,
+                    stderr.decode("utf-8", "replace").strip()[-200:], ))
+        return run
+
+    return [(" ".join(arguments), lambda index: None, runner(arguments, state))
+            for (arguments, state) in commands]
+
+
+def print_results(title, results):
+    """Print one table of results"""
+
+    print(title)
+    print("%-40s %4s %9s %9s %9s %9s %7s %9s %9s" % (
+        "operation", "conc", "p50 ms", "p95 ms", "ops/s", "req/s",
+        "req/op", "sent/op", "recv/op", ))
+    for result in results:
+        if not result["operations"]:
+            print("%-40s %4d failed: %s" % (result["name"][:40],
+                                            result["concurrency"],
+                                            result.get("first_failure"), ))
+            continue
+        print("%-40s %4d %9.2f %9.2f %9.1f %9.1f %7.1f %9d %9d" % (
+            result["name"][:40],
+            result["concurrency"],
+            result["p50_ms"],
+            result["p95_ms"],
+            result["operations_per_second"],
+            result["requests_per_second"],
+            result["requests_per_operation"],
+            result["bytes_sent_per_operation"],
+            result["bytes_received_per_operation"], ))
+        if result["failures"]:
+            print("%45s %d failed: %s" % ("",
+                                          result["failures"],
+                                          result["first_failure"], ))
+    print()
+
+
+def main():
+    """Benchmark the library and the tool"""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--iterations", type=int, default=20,
+                        help="times each client runs each operation")
+    parser.add_argument("--tool-iterations", type=int, default=5,
+                        dest="tool_iterations",
+                        help="times each client runs each subcommand")
+    parser.add_argument("--concurrency", type=int, nargs="+",
+                        default=[1, 8],
+                        help="numbers of clients to measure with")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds the mock BMCs take per request")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="up to this many more seconds at random")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        dest="error_rate",
+                        help="fraction of requests the mock BMCs fail")
+    parser.add_argument("--dimms", type=int, default=32)
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--only", choices=["library", "tool"], default=None,
+                        help="only benchmark the library or the tool")
+    parser.add_argument("--filter", default=None,
+                        help="only operations whose name contains this")
+    parser.add_argument("--tool-python", default="python2",
+                        dest="tool_python",
+                        help="interpreter to run openBmcTool with")
+    parser.add_argument("--json", default=None,
+                        help="also write the results to this file")
+    args = parser.parse_args()
+
+    # The mock's certificate is self-signed
+    warnings.filterwarnings("ignore", message="Unverified HTTPS request")
+
+    options = {"latency": args.latency,
+               "jitter": args.jitter,
+               "error_rate": args.error_rate,
+               "dimms": args.dimms,
+               "events": args.events}
+    servers = MockServers(max(args.concurrency), options)
+    scratch = tempfile.mkdtemp(prefix="openbmc-benchmark")
+    homes = []
+    for index in range(len(servers.hostnames)):
+        homes.append(os.path.join(scratch, "client%d" % (index, )))
+        os.makedirs(homes[-1])
+
+    suites = []
+    if args.only in (None, "library"):
+        suites.append(("OpenBMC methods",
+                       library_operations(servers,
+                                          homes,
+                                          ResponseStore(os.path.join(
+                                              scratch, "responses.db"))),
+                       args.iterations))
+    if args.only in (None, "tool"):
+        suites.append(("openBmcTool subcommands",
+                       tool_operations(servers, homes, args.tool_python),
+                       args.tool_iterations))
+
+    everything = []
+    try:
+        for (title, operations, iterations) in suites:
+            results = []
+            for (name, setup, run) in operations:
+                if args.filter and args.filter not in name:
+                    continue
+                for concurrency in args.concurrency:
+                    result = measure(servers,
+                                     concurrency,
+                                     iterations,
+                                     setup,
+                                     run)
+                    result["name"] = name
+                    result["suite"] = title
+                    results.append(result)
+            print_results(title, results)
+            everything.extend(results)
+    finally:
+        servers.close()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as fp:
+            json.dump(everything, fp, sort_keys=True, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+
+"""
+Asyncio object library to interact with an OpenBMC controller.
+
+This mirrors the OpenBMC class but every operation is a coroutine, so
+thousands of controllers can be talked to from a single event loop.  It
+requires Python 3.5 or later and the aiohttp package.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-many-arguments
+# pylint: disable=too-few-public-methods
+# pylint: disable=global-statement
+# pylint: disable=broad-except
+
+import asyncio
+import json
+import sys
+import time
+
+import aiohttp
+
+from openbmc import OpenBMC as _sync
+from openbmc.JsonCodec import decode
+from openbmc.OpenBMC import CachedResponse, HTTPError, JSON_HEADERS
+from openbmc.OpenBMC import default_response_store, filter_control_items
+from openbmc.OpenBMC import report_request
+
+# How many requests may be outstanding at once across every instance
+DEFAULT_CONCURRENCY = 256
+
+# The connection pool and concurrency limit are shared by every
+# AsyncCachedSession open on the same event loop, and closed along with
+# the last of them so that finished loops are not kept alive.
+_SHARED = {}
+
+
+class _Shared(object):
+    """The connection pool of one event loop and how many sessions use it"""
+
+    __slots__ = ("connector", "semaphore", "users")
+
+    def __init__(self):
+        self.connector = aiohttp.TCPConnector(limit=DEFAULT_CONCURRENCY,
+                                              ssl=False)
+        self.semaphore = asyncio.Semaphore(DEFAULT_CONCURRENCY)
+        self.users = 0
+
+
+def _acquire_shared():
+    """Return the _Shared of the running loop, counting one more user"""
+
+    loop = asyncio.get_event_loop()
+
+    if loop not in _SHARED:
+        _SHARED[loop] = _Shared()
+
+    shared = _SHARED[loop]
+    shared.users += 1
+
+    return shared
+
+
+async def _release_shared(shared):
+    """Count one user less of shared, closing it after the last one"""
+
+    shared.users -= 1
+    if shared.users > 0:
+        return
+
+    loop = asyncio.get_event_loop()
+    if _SHARED.get(loop) is shared:
+        del _SHARED[loop]
+    await shared.connector.close()
+
+
+def set_concurrency(value):
+    """Set the shared limit on outstanding requests
+
+    This only affects event loops which have not made a request yet.
+    """
+
+    global DEFAULT_CONCURRENCY
+
+    DEFAULT_CONCURRENCY = value
+
+
+async def close_shared():
+    """Close the connection pool shared on the running loop"""
+
+    loop = asyncio.get_event_loop()
+
+    if loop in _SHARED:
+        await _SHARED.pop(loop).connector.close()
+
+
+class AsyncCachedSession(object):
+    """online or offline support for an aiohttp.ClientSession()"""
+
+    def __init__(self, online, connector=None, semaphore=None, store=None):
+        self.online = online
+        self.session = None
+        if store is None:
+            store = default_response_store()
+        self.store = store
+        self._connector = connector
+        self._semaphore = semaphore
+        self._shared = None
+
+    def _open(self):
+        if self.session is not None:
+            return
+
+        if self._connector is None or self._semaphore is None:
+            self._shared = _acquire_shared()
+            if self._connector is None:
+                self._connector = self._shared.connector
+            if self._semaphore is None:
+                self._semaphore = self._shared.semaphore
+
+        # Every session keeps its own cookies but borrows connections
+        # from the shared pool.  BMCs are usually addressed by IP, which
+        # the default cookie jar refuses to store cookies for.
+        self.session = aiohttp.ClientSession(
+            connector=self._connector,
+            connector_owner=False,
+            cookie_jar=aiohttp.CookieJar(unsafe=True))
+
+    async def close(self):
+        """Release the session, and the shared pool if nothing else uses it"""
+
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+        if self._shared is not None:
+            shared = self._shared
+            self._shared = None
+            if self._connector is shared.connector:
+                self._connector = None
+            if self._semaphore is shared.semaphore:
+                self._semaphore = None
+            await _release_shared(shared)
+
+    async def _request(self, method, url, data, verify, headers):
+        """Send the request, telling the request hooks how it went"""
+
+        start = time.time()
+        try:
+            (status_code, content) = await self._send(method,
+                                                      url,
+                                                      data,
+                                                      verify,
+                                                      headers)
+        except Exception as ex:
+            report_request(method,
+                           url,
+                           time.time() - start,
+                           None,
+                           error=type(ex).__name__)
+            raise
+        report_request(method,
+                       url,
+                       time.time() - start,
+                       status_code,
+                       size=len(content))
+        return (status_code, content)
+
+    async def _send(self, method, url, data, verify, headers):
+        self._open()
+
+        (connect, read) = _sync.TIMEOUT
+        timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+
+        async with self._semaphore:
+            async with self.session.request(method,
+                                            url,
+                                            data=data,
+                                            ssl=None if verify else False,
+                                            headers=headers,
+                                            timeout=timeout) as response:
+                content = await response.read()
+                return (response.status, content)
+
+    @staticmethod
+    async def _in_executor(function, *args):
+        """Run function(*args) on a thread, so SQLite does not block the loop"""
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, function, *args)
+
+    @staticmethod
+    def _report_replay(method, url, start, saved):
+        """Tell the request hooks whether a recorded response was found"""
+
+        report_request(method,
+                       url,
+                       time.time() - start,
+                       saved[0] if saved is not None else None,
+                       online=False,
+                       cache="hit" if saved is not None else "miss",
+                       error=None if saved is not None else "NotRecorded")
+
+    async def post(self, url, data, verify, headers):
+        """Replaces session.post()"""
+
+        msg = ("AsyncCachedSession:post:IN: url = %s, data = %s,"
+               " verify = %s, headers = %s") % (url, data, verify, headers, )
+        if _sync.DEBUG:
+            print(msg)
+
+        ret = None
+
+        if self.online:
+            (status_code, content) = await self._request("POST",
+                                                         url,
+                                                         data,
+                                                         verify,
+                                                         headers)
+            ret = CachedResponse(status_code, decode(content))
+
+            await self._in_executor(self.store.put,
+                                    "POST",
+                                    url,
+                                    data,
+                                    status_code,
+                                    content)
+        else:
+            start = time.time()
+            saved = await self._in_executor(self.store.get, "POST", url, data)
+            self._report_replay("POST", url, start, saved)
+            if saved is not None:
+                ret = CachedResponse(*saved)
+
+        if ret is None:
+            raise Exception("Danger Will Robinson!")
+
+        return ret
+
+    async def get(self, url, verify, headers):
+        """Replaces session.get()"""
+
+        msg = ("AsyncCachedSession:get:IN: url = %s, verify = %s,"
+               " headers = %s") % (url, verify, headers, )
+        if _sync.DEBUG:
+            print(msg)
+
+        ret = None
+
+        if self.online:
+            (status_code, content) = await self._request("GET",
+                                                         url,
+                                                         None,
+                                                         verify,
+                                                         headers)
+            ret = CachedResponse(status_code, decode(content))
+
+            await self._in_executor(self.store.put,
+                                    "GET",
+                                    url,
+                                    None,
+                                    status_code,
+                                    content)
+        else:
+            start = time.time()
+            saved = await self._in_executor(self.store.get, "GET", url)
+            self._report_replay("GET", url, start, saved)
+            if saved is not None:
+                ret = CachedResponse(*saved)
+
+        if ret is None:
+            raise Exception("Danger Will Farrel!")
+
+        return ret
+
+
+class AsyncOpenBMC(object):
+    """Asynchronous operations against a controller running OpenBMC
+
+    Use it as an async context manager, which logs in on entry and
+    releases the session on exit:
+
+        async with AsyncOpenBMC(hostname, user, password, True) as ob:
+            state = await ob.get_power_state()
+    """
+
+    def __init__(self,
+                 hostname,
+                 user,
+                 password,
+                 online,
+                 connector=None,
+                 semaphore=None,
+                 store=None):
+        self.hostname = hostname
+        self.verbose = False
+        self.session = AsyncCachedSession(online,
+                                          connector=connector,
+                                          semaphore=semaphore,
+                                          store=store)
+        self._user = user
+        self._password = password
+
+    async def __aenter__(self):
+        await self.login()
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    async def login(self):
+        """Log in with a special URL and JSON data structure"""
+
+        url = "https://%s/login" % (self.hostname, )
+        login_data = json.dumps({"data": [self._user, self._password]})
+        response = await self.session.post(url,
+                                           data=login_data,
+                                           verify=False,
+                                           headers=JSON_HEADERS)
+
+        if response.status_code != 200:
+            err_str = ("Error: Response code to login is not 200!"
+                       " (%d)" % (response.status_code, ))
+            print(err_str, file=sys.stderr)
+
+            raise HTTPError(url,
+                            response.status_code,
+                            data=login_data)
+
+    async def close(self):
+        """Release the session"""
+
+        await self.session.close()
+
+    def set_verbose(self, value):
+        """Set the verbosity to value"""
+
+        self.verbose = value
+        _sync.set_debug(value)
+
+    async def enumerate(self, key):
+        """Enumerate the provided key"""
+
+        if key.startswith("/"):
+            path = key[1:]
+        else:
+            path = key
+
+        if path.endswith("/"):
+            path = path + "enumerate"
+        else:
+            path = path + "/enumerate"
+
+        return await self.get(path)
+
+    async def get(self, key):
+        """Get the value for the provided key"""
+
+        if key.startswith("/"):
+            path = key[1:]
+        else:
+            path = key
+
+        url = "https://%s/%s" % (self.hostname, path, )
+
+        if self.verbose:
+            print("GET %s" % (url, ))
+
+        response = await self.session.get(url,
+                                          verify=False,
+                                          headers=JSON_HEADERS)
+
+        if response.status_code != 200:
+            err_str = ("Error: Response code to get %s enumerate is not 200!"
+                       " (%d)" % (key, response.status_code, ))
+            print(err_str, file=sys.stderr)
+
+            raise HTTPError(url, response.status_code)
+
+        return response.json()["data"]
+
+    async def _post_action(self, url):
+        """POST an empty action request to url and return its data"""
+
+        jdata = json.dumps({"data": []})
+
+        if self.verbose:
+            print("POST %s with %s" % (url, jdata, ))
+
+        response = await self.session.post(url,
+                                           data=jdata,
+                                           verify=False,
+                                           headers=JSON_HEADERS)
+
+        if response.status_code != 200:
+            err_str = ("Error: Response code to PUT is not 200!"
+                       " (%d)" % (response.status_code, ))
+            print(err_str, file=sys.stderr)
+
+            raise HTTPError(url, response.status_code, data=jdata)
+
+        return response.json()["data"]
+
+    async def _filter_org_openbmc_control(self, filter_list):
+        """Filter /org/openbmc/control against the provided filter list"""
+
+        try:
+            items = (await self.enumerate("/org/openbmc/control/")).items()
+        except HTTPError as ex:
+            if ex.get_status_code() == 404:
+                # @BUG
+                # There is no /org/openbmc/control entry?!
+                entries = await self.get("/org/openbmc/")
+                msg = "Error: no /org/openbmc/control in %s" % (entries, )
+                raise Exception(msg)
+            else:
+                raise
+
+        return filter_control_items(items, filter_list, self.verbose)
+
+    async def _power_common(self, from_state, action):
+        """POST action to every chassis whose power is in from_state"""
+
+        filter_list = ["control/power", "control/chassis"]
+        mappings = await self._filter_org_openbmc_control(filter_list)
+
+        for (_, ident_mappings) in mappings.items():
+            (power_url, power_mapping) = ident_mappings["control/power"]
+            (chassis_url, _) = ident_mappings["control/chassis"]
+
+            if self.verbose:
+                msg = "Current state of %s is %s" % (power_url,
+                                                     power_mapping["state"], )
+                print(msg)
+
+            if power_mapping["state"] != from_state:
+                continue
+
+            url = "https://%s%s/action/%s" % (self.hostname,
+                                              chassis_url,
+                                              action, )
+            await self._post_action(url)
+
+        return True
+
+    async def power_on(self):
+        """Turn the power on"""
+
+        return await self._power_common(0, "powerOn")
+
+    async def power_off(self):
+        """Turn the power off"""
+
+        return await self._power_common(1, "powerOff")
+
+    async def get_power_state(self):
+        """Return the state of the power"""
+
+        filter_list = ["control/chassis"]
+        mappings = await self._filter_org_openbmc_control(filter_list)
+
+        for (_, ident_mappings) in mappings.items():
+            (chassis_url, _) = ident_mappings["control/chassis"]
+
+            url = "https://%s/%s/action/getPowerState" % (self.hostname,
+                                                          chassis_url, )
+            return await self._post_action(url)
+
+        return None
+
+    async def trigger_warm_reset(self):
+        """Force a warm reset"""
+
+        filter_list = ["control/bmc"]
+        mappings = await self._filter_org_openbmc_control(filter_list)
+
+        for (_, ident_mappings) in mappings.items():
+            (bmc_url, _) = ident_mappings["control/bmc"]
+
+            url = "https://%s%s/action/warmReset" % (self.hostname,
+                                                     bmc_url, )
+            await self._post_action(url)
+
+        return True
+
+    async def get_flash_bios(self):
+        """Get the flash BIOS"""
+
+        return await self.get("/org/openbmc/control/flash/bios")
+
+    async def get_bmc_state(self):
+        """Get the state of the OpenBMC controller"""
+
+        path = "org/openbmc/managers/System"
+        url = "https://%s/%s/action/getSystemState" % (self.hostname,
+                                                       path, )
+        return await self._post_action(url)
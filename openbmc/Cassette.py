@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+"""
+Record and replay sequences of OpenBMC responses.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-many-arguments
+# What is with [invalid-name] Invalid variable name "fp"
+# pylint: disable=invalid-name
+
+from __future__ import print_function
+
+import gzip
+import threading
+import time
+
+from openbmc.JsonCodec import decode, encode
+from openbmc.ResponseStore import body_hash
+
+RECORD = "record"
+REPLAY = "replay"
+
+
+def _open(filename, mode):
+    """Open filename, transparently gzipped if it ends in .gz"""
+
+    if filename.endswith(".gz"):
+        return gzip.open(filename, mode + "b")
+    return open(filename, mode + "b")
+
+
+class Cassette(object):
+    """A recording of every response a session saw, in order
+
+    While recording, each request and its response are appended to
+    filename as one JSON object per line, along with how long the BMC
+    took to answer.  While replaying, the responses for each (method,
+    url, body) are handed back in the order they were recorded, so a
+    replay can follow state changes such as the power coming on after a
+    powerOn.  Once a request's recorded responses run out the last one
+    keeps being returned.  With realtime set, each replayed response is
+    delayed by its recorded latency.  One instance may be shared between
+    threads.
+    """
+
+    def __init__(self, filename, mode=REPLAY, realtime=False):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError("Unknown cassette mode %s" % (mode, ))
+
+        self.filename = filename
+        self.mode = mode
+        self.realtime = realtime
+        self._lock = threading.Lock()
+        self._fp = None
+        self._tracks = {}
+        self._positions = {}
+
+        if mode == RECORD:
+            self._fp = _open(filename, "a")
+        else:
+            self._load()
+
+    def _load(self):
+        with _open(self.filename, "r") as fp:
+            for line in fp:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = decode(line)
+                key = (entry["method"], entry["url"], entry["body_hash"])
+                if key not in self._tracks:
+                    self._tracks[key] = []
+                self._tracks[key].append((entry["status_code"],
+                                          entry["content"],
+                                          entry["latency"]))
+
+    def close(self):
+        """Finish writing the recording"""
+
+        with self._lock:
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
+
+    def record(self, method, url, data, status_code, content, latency):
+        """Append a response which took latency seconds to arrive"""
+
+        entry = {"method": method,
+                 "url": url,
+                 "body_hash": body_hash(data, url),
+                 "status_code": status_code,
+                 "content": content.decode("utf-8"),
+                 "latency": latency}
+        line = encode(entry) + "\n"
+
+        with self._lock:
+            self._fp.write(line.encode("utf-8"))
+            self._fp.flush()
+
+    def play_content(self, method, url, data=None):
+        """Return the next (status_code, raw content) or None"""
+
+        key = (method, url, body_hash(data, url))
+
+        with self._lock:
+            track = self._tracks.get(key)
+            if not track:
+                return None
+            position = self._positions.get(key, 0)
+            if position < len(track) - 1:
+                self._positions[key] = position + 1
+
+        (status_code, content, latency) = track[position]
+
+        if self.realtime:
+            time.sleep(latency)
+
+        return (status_code, content.encode("utf-8"))
+
+    def play(self, method, url, data=None):
+        """Return the next (status_code, json_struct) or None"""
+
+        saved = self.play_content(method, url, data)
+        if saved is None:
+            return None
+
+        (status_code, content) = saved
+        return (status_code, decode(content))
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+
+"""
+Keep OpenBMC sessions open in a resident process behind a Unix socket.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-few-public-methods
+# pylint: disable=broad-except
+# What is with [invalid-name] Invalid variable name "fp"
+# pylint: disable=invalid-name
+
+from __future__ import print_function
+
+import errno
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+
+# This module is loaded by every openBmcTool run before anything else,
+# so it does not import openbmc.OpenBMC just for CACHE_DIR.
+DEFAULT_SOCKET = os.path.join(os.path.expanduser("~"),
+                              ".cache",
+                              "openbmc",
+                              "daemon.sock")
+
+# Which environment variable names the socket openBmcTool forwards to
+DAEMON_VARIABLE = "OPENBMC_DAEMON"
+
+# How long the daemon waits for a command before exiting
+DEFAULT_IDLE_TIMEOUT = 30 * 60
+
+
+def _send(fp, message):
+    """Write message to fp as one line of JSON"""
+
+    fp.write((json.dumps(message) + "\n").encode("utf-8"))
+    fp.flush()
+
+
+def _receive(fp):
+    """Read one line of JSON from fp, or None at the end"""
+
+    line = fp.readline()
+    if not line:
+        return None
+    return json.loads(line.decode("utf-8"))
+
+
+def forward(argv, socket_path, timeout=None):
+    """Ask the daemon at socket_path to run a command
+
+    Return the daemon's reply, a dictionary with rc, stdout and stderr,
+    or one with local set when the command has to be run locally.
+    Return None if no daemon is listening.
+    """
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(socket_path)
+        except socket.error as ex:
+            if ex.errno in (errno.ENOENT, errno.ECONNREFUSED):
+                return None
+            raise
+
+        fp = sock.makefile("rwb")
+        try:
+            _send(fp, {"argv": list(argv), "cwd": os.getcwd()})
+            return _receive(fp)
+        finally:
+            fp.close()
+    finally:
+        sock.close()
+
+
+def forward_command(argv, environ=None):
+    """Run a command in the daemon named by $OPENBMC_DAEMON and exit
+
+    Nothing happens when the variable is not set, no daemon is
+    listening or the daemon cannot run the command, and the caller
+    goes on to run it itself.
+    """
+
+    if environ is None:
+        environ = os.environ
+
+    socket_path = environ.get(DAEMON_VARIABLE)
+    if not socket_path:
+        return
+
+    try:
+        reply = forward(argv, socket_path)
+    except (socket.error, ValueError) as ex:
+        print("Could not use the daemon at %s: %s" % (socket_path, ex, ),
+              file=sys.stderr)
+        return
+
+    if reply is None or reply.get("local"):
+        return
+
+    for (stream, text) in ((sys.stdout, reply["stdout"]),
+                           (sys.stderr, reply["stderr"])):
+        if not isinstance(text, str):
+            # Python 2 decodes JSON strings as unicode
+            text = text.encode("utf-8")
+        stream.write(text)
+        stream.flush()
+    sys.exit(reply["rc"])
+
+
+class Daemon(object):
+    """Answer commands sent to a Unix socket by forward()
+
+    handler is called in a thread of its own with each request, a
+    dictionary holding the argv and cwd of the command, and returns
+    the reply.  The socket is only usable by its owner.  serve() stops
+    once no command has been received for idle_timeout seconds (never
+    when None).
+    """
+
+    def __init__(self,
+                 handler,
+                 socket_path=DEFAULT_SOCKET,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.handler = handler
+        self.socket_path = socket_path
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._active = 0
+        self._last = time.time()
+        self._stopped = False
+        self._socket = None
+
+    def started(self):
+        """Note that a request is being answered"""
+
+        with self._lock:
+            self._active += 1
+            self._last = time.time()
+
+    def finished(self):
+        """Note that a request has been answered"""
+
+        with self._lock:
+            self._active -= 1
+            self._last = time.time()
+
+    def _idle(self):
+        if self.idle_timeout is None:
+            return False
+        with self._lock:
+            return (self._active == 0 and
+                    time.time() - self._last >= self.idle_timeout)
+
+    def listen(self):
+        """Create the socket, replacing one left behind by a dead daemon"""
+
+        directory = os.path.dirname(self.socket_path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except socket.error:
+                os.unlink(self.socket_path)
+            else:
+                raise OSError(errno.EADDRINUSE,
+                              "A daemon is already listening",
+                              self.socket_path)
+            finally:
+                probe.close()
+
+        umask = os.umask(0o177)
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+        sock.listen(64)
+        # Wake up every second to look at the idle timeout
+        sock.settimeout(1)
+        self._socket = sock
+
+        return self
+
+    def _answer(self, sock):
+        """Answer the one request of a connection"""
+
+        fp = sock.makefile("rwb")
+        try:
+            request = _receive(fp)
+            if request is None:
+                return
+
+            self.started()
+            try:
+                try:
+                    reply = self.handler(request)
+                except Exception:
+                    reply = {"rc": 1,
+                             "stdout": "",
+                             "stderr": traceback.format_exc()}
+                _send(fp, reply)
+            finally:
+                self.finished()
+        finally:
+            fp.close()
+            sock.close()
+
+    def serve(self):
+        """Answer requests until idle or stopped, then remove the socket"""
+
+        if self._socket is None:
+            self.listen()
+
+        try:
+            while not self._stopped and not self._idle():
+                try:
+                    (sock, _) = self._socket.accept()
+                except socket.timeout:
+                    continue
+                except socket.error as ex:
+                    # Interrupted by a signal
+                    if ex.errno == errno.EINTR:
+                        continue
+                    raise
+                sock.settimeout(None)
+                thread = threading.Thread(target=self._answer, args=(sock, ))
+                thread.daemon = True
+                thread.start()
+        finally:
+            self._socket.close()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+
+    def stop(self):
+        """Make serve() return after the current request"""
+
+        self._stopped = True
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+
+"""
+Incrementally copy the event records of OpenBMC controllers.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-few-public-methods
+# pylint: disable=broad-except
+# What is with [invalid-name] Invalid variable name "fp"
+# pylint: disable=invalid-name
+
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+from multiprocessing.pool import ThreadPool
+
+from openbmc.OpenBMC import CACHE_DIR, EVENTS_PATH, PrivateJsonFile
+from openbmc.OpenBMC import private_directory
+
+# How many event records to fetch from one BMC at once
+DEFAULT_EVENT_WORKERS = 8
+
+
+def _digest(record):
+    """Return a digest of an event record"""
+
+    content = json.dumps(record, sort_keys=True)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def event_id(path):
+    """Return the number at the end of an event path or None"""
+
+    try:
+        return int(path.rstrip("/").rsplit("/", 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+class EventSync(object):
+    """Copy new event records from a BMC into a local log
+
+    The highest event ID already copied is remembered per host in
+    state_filename.  Each sync() lists the events on the BMC, which is
+    the only request made when nothing is new, fetches just the newer
+    records, workers at a time, and appends them in ID order to the
+    host's log as one JSON object per line.
+
+    The oldest ID on the BMC and a digest of the last record copied are
+    remembered too, so that a log which has been cleared is noticed and
+    copied from its start, even once it has grown past the highest ID.
+    A log cleared and refilled to exactly where it was is only noticed
+    once it grows.
+    """
+
+    def __init__(self,
+                 ob,
+                 log_filename=None,
+                 state_filename=None,
+                 workers=DEFAULT_EVENT_WORKERS):
+        self.ob = ob
+        if log_filename is None:
+            log_filename = os.path.join(CACHE_DIR,
+                                        "events",
+                                        "%s.ndjson" % (ob.hostname, ))
+        if state_filename is None:
+            state_filename = os.path.join(CACHE_DIR, "events.json")
+        self.log_filename = log_filename
+        self.state = PrivateJsonFile(state_filename)
+        self.workers = workers
+
+    def _state(self):
+        """Return {"last", "oldest", "digest"} as of the last sync"""
+
+        state = self.state.read(self.ob.hostname)
+        if not isinstance(state, dict):
+            # Only the highest ID was kept before
+            state = {"last": state or 0, "oldest": None, "digest": None}
+        return state
+
+    def last_seen(self):
+        """Return the highest event ID copied so far"""
+
+        return self._state()["last"]
+
+    def _cleared(self, paths, state):
+        """Has the log on the BMC been cleared since the last sync?"""
+
+        last_seen = state["last"]
+        if max(paths) < last_seen:
+            return True
+
+        # IDs only grow, and a full log drops its oldest records first
+        if state["oldest"] is not None and min(paths) < state["oldest"]:
+            return True
+
+        # Once a cleared log has grown past the highest ID copied, the
+        # record with that ID is a different one
+        if (state["digest"] is not None and
+                max(paths) > last_seen and
+                last_seen in paths):
+            (_, record, error) = self._fetch(last_seen, paths[last_seen])
+            if error is None and _digest(record) != state["digest"]:
+                return True
+
+        return False
+
+    def sync(self):
+        """Copy any new events; return them as [(id, path, record)]"""
+
+        state = self._state()
+        last_seen = state["last"]
+
+        paths = {}
+        for path in self.ob.get(EVENTS_PATH):
+            ident = event_id(path)
+            if ident is not None:
+                paths[ident] = path
+
+        if paths and self._cleared(paths, state):
+            # The log on the BMC has been cleared and is numbering anew
+            last_seen = 0
+
+        new_ids = sorted(ident for ident in paths if ident > last_seen)
+        if not new_ids:
+            return []
+
+        records = {}
+        failed = []
+        pool = ThreadPool(max(1, min(self.workers, len(new_ids))))
+        try:
+            for (ident, record, error) in pool.imap_unordered(
+                    lambda ident: self._fetch(ident, paths[ident]),
+                    new_ids):
+                if error is None:
+                    records[ident] = record
+                else:
+                    failed.append(ident)
+        finally:
+            pool.close()
+            pool.join()
+
+        # Only move past events which were fetched, so that one which
+        # failed is tried again next time rather than skipped for good
+        if failed:
+            new_ids = [ident for ident in new_ids if ident < min(failed)]
+
+        new_events = [(ident, paths[ident], records[ident])
+                      for ident in new_ids]
+
+        if new_events:
+            self._append(new_events)
+            self.state.update(self.ob.hostname,
+                              {"last": new_events[-1][0],
+                               "oldest": min(paths),
+                               "digest": _digest(new_events[-1][2])})
+
+        return new_events
+
+    def _fetch(self, ident, path):
+        """Return (ident, record, None), or (ident, None, error)"""
+
+        try:
+            return (ident, self.ob.get(path), None)
+        except Exception as ex:
+            return (ident, None, ex)
+
+    def _append(self, new_events):
+        private_directory(os.path.dirname(self.log_filename))
+
+        with open(self.log_filename, "a") as fp:
+            for (ident, path, record) in new_events:
+                fp.write(json.dumps({"hostname": self.ob.hostname,
+                                     "id": ident,
+                                     "path": path,
+                                     "event": record}) + "\n")
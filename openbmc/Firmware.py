@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+
+"""
+Upload firmware images to many OpenBMC controllers from one mapping.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-many-arguments
+# pylint: disable=too-few-public-methods
+# What is with [invalid-name] Invalid variable name "fp"
+# pylint: disable=invalid-name
+
+from __future__ import print_function
+
+import mmap
+import os
+import threading
+import time
+
+from openbmc.Fleet import DEFAULT_WORKERS, run_fleet
+
+try:
+    # Python 2's mmap only offers the old buffer interface
+    _buffer = buffer  # pylint: disable=undefined-variable
+except NameError:
+    _buffer = None
+
+# How much of the image each read hands to the connection
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# How often, in seconds, UploadProgress calls its report function
+DEFAULT_REPORT_INTERVAL = 1.0
+
+
+class FirmwareImage(object):
+    """A firmware image file mapped into memory once
+
+    Every upload reads the same pages through a stream() of its own, and
+    each read is a view of the mapping rather than a copy, so flashing a
+    hundred BMCs costs no more memory than flashing one.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.closed = False
+        self._fp = open(filename, "rb")
+        try:
+            self.size = os.fstat(self._fp.fileno()).st_size
+            if self.size == 0:
+                raise ValueError("%s is empty" % (filename, ))
+            self._mapping = mmap.mmap(self._fp.fileno(),
+                                      0,
+                                      access=mmap.ACCESS_READ)
+        except Exception:
+            self._fp.close()
+            raise
+
+        if _buffer is None:
+            self._view = memoryview(self._mapping)
+        else:
+            self._view = None
+
+    def chunk(self, start, end):
+        """Return the bytes from start to end without copying them"""
+
+        end = min(end, self.size)
+        view = self._view
+        if view is not None:
+            return view[start:end]
+        if _buffer is not None and not self.closed:
+            return _buffer(self._mapping, start, end - start)
+        raise ValueError("%s is closed" % (self.filename, ))
+
+    def stream(self, on_read=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Return a new ImageStream over the whole image"""
+
+        return ImageStream(self, on_read, chunk_size)
+
+    def close(self):
+        """Unmap the image, once no upload is still sending a piece of it
+
+        Streams stop reading once the image is closed.  An upload given
+        up on by a timeout may still hold a piece, which keeps the
+        mapping alive; it is then unmapped when that piece is dropped.
+        """
+
+        if self.closed:
+            return
+        self.closed = True
+        self._view = None
+        try:
+            self._mapping.close()
+        except BufferError:
+            pass
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+class ImageStream(object):
+    """One pass over a FirmwareImage, to be sent as a request body
+
+    It has a length, so the request carries a Content-Length rather than
+    being chunked, and each read() returns the next chunk_size piece of
+    the mapping, whatever size was asked for, so that the image goes out
+    in large writes.  on_read(count) is called as each piece is handed
+    out with how much further into the image the stream has got, so a
+    piece sent again after seek() is not counted twice.
+    """
+
+    def __init__(self, image, on_read=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.image = image
+        self.on_read = on_read
+        self.chunk_size = chunk_size
+        self.position = 0
+        self._furthest = 0
+
+    def __len__(self):
+        return self.image.size
+
+    def __iter__(self):
+        return iter(self.read, b"")
+
+    def read(self, _=-1):
+        """Return the next piece of the image, empty at the end"""
+
+        if self.position >= self.image.size or self.image.closed:
+            return b""
+
+        data = self.image.chunk(self.position,
+                                self.position + self.chunk_size)
+        self.position += len(data)
+
+        if self.position > self._furthest:
+            if self.on_read is not None:
+                self.on_read(self.position - self._furthest)
+            self._furthest = self.position
+
+        return data
+
+    def seek(self, position):
+        """Start again from position, to send the image once more"""
+
+        self.position = position
+
+
+class UploadProgress(object):
+    """The bytes sent by any number of uploads, and how fast
+
+    add() is the on_read of each upload's stream.  report(progress) is
+    called at most every interval seconds from whichever upload is
+    sending.  One instance may be shared between threads.
+    """
+
+    def __init__(self, report=None, interval=DEFAULT_REPORT_INTERVAL):
+        self.report = report
+        self.interval = interval
+        self.start = time.time()
+        self.sent = 0
+        self._lock = threading.Lock()
+        self._reported = self.start
+
+    def add(self, count):
+        """Count count more bytes as sent"""
+
+        with self._lock:
+            self.sent += count
+            now = time.time()
+            due = (self.report is not None and
+                   now - self._reported >= self.interval)
+            if due:
+                self._reported = now
+
+        if due:
+            self.report(self)
+
+    def elapsed(self):
+        """Return the seconds since the first upload started"""
+
+        return time.time() - self.start
+
+    def throughput(self):
+        """Return the bytes sent per second so far"""
+
+        return self.sent / max(self.elapsed(), 1e-9)
+
+
+def upload(ob, image, name=None, update=False, progress=None,
+           chunk_size=DEFAULT_CHUNK_SIZE):
+    """Upload a FirmwareImage to ob, and flash the BIOS from it if update
+
+    Return a dictionary of where the BMC stored it, the bytes sent, the
+    seconds taken and the resulting bytes per second.
+    """
+
+    if name is None:
+        name = os.path.basename(image.filename)
+
+    start = time.time()
+    stream = image.stream(progress.add if progress is not None else None,
+                          chunk_size)
+    stored = ob.upload_image(stream, name)
+    elapsed = time.time() - start
+
+    if update:
+        ob.update_flash_bios(stored)
+
+    return {"stored": stored,
+            "bytes": image.size,
+            "seconds": elapsed,
+            "throughput": image.size / max(elapsed, 1e-9)}
+
+
+def upload_fleet(connect,
+                 hostnames,
+                 image,
+                 name=None,
+                 update=False,
+                 progress=None,
+                 workers=DEFAULT_WORKERS,
+                 timeout=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+    """Upload image to every host at once, yielding FleetResults
+
+    connect(hostname) returns a logged in OpenBMC, and each result's
+    value is what upload() returned.  The hosts all read from the one
+    mapping of image.
+    """
+
+    def upload_to(hostname):
+        """Log in to hostname and upload the image."""
+        return upload(connect(hostname),
+                      image,
+                      name=name,
+                      update=update,
+                      progress=progress,
+                      chunk_size=chunk_size)
+
+    for result in run_fleet(hostnames,
+                            upload_to,
+                            workers=workers,
+                            timeout=timeout):
+        yield result
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+
+"""
+Run operations against many OpenBMC controllers concurrently.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-few-public-methods
+# pylint: disable=broad-except
+# What is with [invalid-name] Invalid variable name "fp"
+# pylint: disable=invalid-name
+
+from __future__ import print_function
+
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+DEFAULT_WORKERS = 32
+
+
+class FleetResult(object):
+    """The outcome of running an operation against one host"""
+
+    def __init__(self,
+                 hostname,
+                 value=None,
+                 error=None,
+                 elapsed=None,
+                 timed_out=False):
+        self.hostname = hostname
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+        self.timed_out = timed_out
+
+    def __repr__(self):
+        return "FleetResult(%s, value=%s, error=%s, elapsed=%s)" % (
+            self.hostname,
+            self.value,
+            self.error,
+            self.elapsed, )
+
+    def ok(self):
+        """Did the operation finish without an error?"""
+
+        return self.error is None
+
+    def to_dict(self):
+        """Return the result as a JSON serializable dictionary"""
+
+        result = {}
+        result["hostname"] = self.hostname
+        result["elapsed"] = self.elapsed
+        if self.error is not None:
+            result["error"] = self.error
+        if self.timed_out:
+            result["timeout"] = True
+        return result
+
+
+class ThreadLocalStream(object):
+    """A stream where each thread can redirect its own writes
+
+    Install one in place of sys.stdout so that code which prints can be
+    run in many threads at once and each thread's output be collected
+    separately.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+
+    def redirect(self, target):
+        """Send this thread's writes to target (None to stop)"""
+
+        self._local.target = target
+
+    def _target(self):
+        target = getattr(self._local, "target", None)
+        if target is None:
+            return self._stream
+        return target
+
+    # The python 2 print statement keeps its state on the stream itself
+    def _get_softspace(self):
+        return getattr(self._local, "softspace", 0)
+
+    def _set_softspace(self, value):
+        self._local.softspace = value
+
+    softspace = property(_get_softspace, _set_softspace)
+
+    def write(self, data):
+        """Write data to this thread's target"""
+
+        self._target().write(data)
+
+    def flush(self):
+        """Flush this thread's target"""
+
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+
+def read_hostnames(fp):
+    """Yield the hostnames listed in fp, one per line
+
+    Blank lines and anything after a # are ignored.
+    """
+
+    for line in fp:
+        line = line.split("#", 1)[0].strip()
+        if line:
+            yield line
+
+
+def _call_with_timeout(operation, hostname, timeout):
+    """Call operation(hostname), giving up after timeout seconds"""
+
+    if timeout is None:
+        return operation(hostname)
+
+    outcome = {}
+
+    def target():
+        """Run the operation and remember how it went"""
+        try:
+            outcome["value"] = operation(hostname)
+        except BaseException as ex:
+            outcome["exception"] = ex
+
+    # A thread stuck talking to a hung BMC can not be killed, so it is
+    # left behind as a daemon and its eventual result is thrown away.
+    thread = threading.Thread(target=target,
+                              name="fleet-%s" % (hostname, ))
+    thread.daemon = True
+    thread.start()
+    thread.join(timeout)
+
+    if thread.is_alive():
+        raise _Timeout()
+    if "exception" in outcome:
+        raise outcome["exception"]
+    return outcome["value"]
+
+
+class _Timeout(Exception):
+    """The operation did not finish in time"""
+
+
+def _run_one(operation, hostname, timeout):
+    """Run operation against hostname and wrap the outcome"""
+
+    start = time.time()
+
+    try:
+        value = _call_with_timeout(operation, hostname, timeout)
+    except _Timeout:
+        return FleetResult(hostname,
+                           error="timed out after %s seconds" % (timeout, ),
+                           elapsed=time.time() - start,
+                           timed_out=True)
+    except Exception as ex:
+        return FleetResult(hostname,
+                           error="%s" % (ex, ),
+                           elapsed=time.time() - start)
+
+    return FleetResult(hostname,
+                       value=value,
+                       elapsed=time.time() - start)
+
+
+def run_fleet(hostnames,
+              operation,
+              workers=DEFAULT_WORKERS,
+              timeout=None):
+    """Run operation(hostname) for every hostname concurrently
+
+    At most workers hosts are in flight at once.  A FleetResult is
+    yielded for each host as soon as it completes, so the results come
+    back in completion order rather than in the order of hostnames.
+    hostnames may be any iterable, including a lazily read file.
+    """
+
+    if workers < 1:
+        raise ValueError("workers must be at least 1 (%s)" % (workers, ))
+
+    # The task queue is bounded so a huge host list is read as it is
+    # consumed instead of all at once.
+    tasks = queue.Queue(maxsize=workers * 2)
+    results = queue.Queue()
+    done = object()
+
+    def feeder():
+        """Hand out the hostnames and then tell every worker to stop"""
+        try:
+            for hostname in hostnames:
+                tasks.put(hostname)
+        finally:
+            for _ in range(workers):
+                tasks.put(done)
+
+    def worker():
+        """Run the operation for hostnames until told to stop"""
+        while True:
+            hostname = tasks.get()
+            if hostname is done:
+                results.put(done)
+                return
+            results.put(_run_one(operation, hostname, timeout))
+
+    threads = [threading.Thread(target=feeder, name="fleet-feeder")]
+    for idx in range(workers):
+        threads.append(threading.Thread(target=worker,
+                                        name="fleet-worker-%d" % (idx, )))
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    running = workers
+    while running > 0:
+        # Waiting with a timeout keeps the main thread interruptible
+        try:
+            result = results.get(timeout=1)
+        except queue.Empty:
+            continue
+        if result is done:
+            running -= 1
+        else:
+            yield result
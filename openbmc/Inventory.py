@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+
+"""
+Index the objects an OpenBMC enumeration returns for quick lookups.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-few-public-methods
+
+from __future__ import print_function
+
+import fnmatch
+import re
+
+# Properties which find() can look up without scanning
+INDEXED_PROPERTIES = ("fru_type", "present", "fault")
+
+_GLOB_MAGIC = re.compile(r"[*?\[]")
+
+
+def _index_key(value):
+    """Return the key value is indexed under
+
+    The BMC reports flags such as present as the strings "True" and
+    "False", so booleans are looked up as those.
+    """
+
+    if isinstance(value, bool):
+        return str(value)
+    return value
+
+
+class _Node(object):
+    """One path segment in a trie"""
+
+    __slots__ = ("children", "path")
+
+    def __init__(self):
+        self.children = {}
+        self.path = None
+
+    def walk(self):
+        """Yield every path at or below this node"""
+
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.path is not None:
+                yield node.path
+            stack.extend(node.children.values())
+
+
+class _Trie(object):
+    """Paths stored by segment, optionally from the last segment back"""
+
+    def __init__(self, reverse=False):
+        self.root = _Node()
+        self.reverse = reverse
+
+    def _segments(self, path):
+        segments = path.split("/")
+        if self.reverse:
+            segments.reverse()
+        return segments
+
+    def insert(self, path):
+        """Add path"""
+
+        node = self.root
+        for segment in self._segments(path):
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = _Node()
+            node = child
+        node.path = path
+
+    def starting(self, text):
+        """Yield the paths which start with text (end, if reversed)
+
+        Every segment but the last one of text is followed exactly, and
+        only the last may match part of a segment.
+        """
+
+        segments = self._segments(text)
+        node = self.root
+        for segment in segments[:-1]:
+            node = node.children.get(segment)
+            if node is None:
+                return
+
+        partial = segments[-1]
+        for (segment, child) in node.children.items():
+            if self.reverse:
+                matches = segment.endswith(partial)
+            else:
+                matches = segment.startswith(partial)
+            if matches:
+                for path in child.walk():
+                    yield path
+
+    def glob(self, pattern):
+        """Return the set of paths matching the shell style pattern
+
+        Each * or ? stays within a segment while a ** segment matches any
+        number of segments.
+        """
+
+        found = set()
+        parts = pattern.split("/")
+        pending = [(self.root, 0)]
+
+        while pending:
+            (node, i) = pending.pop()
+
+            if i == len(parts):
+                if node.path is not None:
+                    found.add(node.path)
+                continue
+
+            part = parts[i]
+            if part == "**":
+                pending.append((node, i + 1))
+                pending.extend((child, i) for child in node.children.values())
+            elif not _GLOB_MAGIC.search(part):
+                child = node.children.get(part)
+                if child is not None:
+                    pending.append((child, i + 1))
+            else:
+                pending.extend((child, i + 1)
+                               for (segment, child) in node.children.items()
+                               if fnmatch.fnmatchcase(segment, part))
+
+        return found
+
+
+class Inventory(object):
+    """The objects of an enumeration, indexed by path and property
+
+    Build it once from (path, properties) pairs, such as those of
+    OpenBMC.iter_enumerate() or enumerate().items(), and then look
+    objects up by path prefix, suffix or glob pattern, or by the value of
+    any of the indexed properties, without scanning every path.  Each
+    lookup returns a list of (path, properties) sorted by path.
+    """
+
+    def __init__(self, items=(), indexed=INDEXED_PROPERTIES):
+        self._objects = {}
+        self._paths = _Trie()
+        self._reversed = _Trie(reverse=True)
+        self._indexes = dict((name, {}) for name in indexed)
+
+        for (path, properties) in items:
+            self.add(path, properties)
+
+    def add(self, path, properties):
+        """Add (or replace) the object at path"""
+
+        if path in self._objects:
+            self._unindex(path)
+        else:
+            self._paths.insert(path)
+            self._reversed.insert(path)
+
+        self._objects[path] = properties
+
+        if not isinstance(properties, dict):
+            return
+        for (name, index) in self._indexes.items():
+            if name in properties:
+                try:
+                    key = _index_key(properties[name])
+                    index.setdefault(key, set()).add(path)
+                except TypeError:
+                    # Only plain values are indexed
+                    pass
+
+    def _unindex(self, path):
+        for index in self._indexes.values():
+            for paths in index.values():
+                paths.discard(path)
+
+    def __len__(self):
+        return len(self._objects)
+
+    def __contains__(self, path):
+        return path in self._objects
+
+    def __getitem__(self, path):
+        return self._objects[path]
+
+    def get(self, path, default=None):
+        """Return the properties of path or default"""
+
+        return self._objects.get(path, default)
+
+    def items(self):
+        """Return every (path, properties)"""
+
+        return self._pairs(self._objects)
+
+    def _pairs(self, paths):
+        return [(path, self._objects[path]) for path in sorted(paths)]
+
+    def prefix(self, text):
+        """Return the objects whose path starts with text"""
+
+        return self._pairs(self._paths.starting(text))
+
+    def suffix(self, text):
+        """Return the objects whose path ends with text"""
+
+        return self._pairs(self._reversed.starting(text))
+
+    def glob(self, pattern):
+        """Return the objects whose path matches pattern
+
+        For example /org/openbmc/inventory/system/**/dimm* finds every
+        DIMM but not the .../dimm2/event objects below them.
+        """
+
+        return self._pairs(self._paths.glob(pattern))
+
+    def find(self, prefix=None, suffix=None, glob=None, **properties):
+        """Return the objects matching everything given
+
+        Each keyword argument is a property the object must have with
+        that value, for example find(fru_type="DIMM", present=True).
+        """
+
+        candidates = None
+
+        def narrow(paths):
+            """Keep only the candidates in paths"""
+            if candidates is None:
+                return set(paths)
+            return candidates.intersection(paths)
+
+        for (name, value) in properties.items():
+            if name in self._indexes:
+                candidates = narrow(
+                    self._indexes[name].get(_index_key(value), ()))
+
+        if prefix is not None:
+            candidates = narrow(self._paths.starting(prefix))
+        if suffix is not None:
+            candidates = narrow(self._reversed.starting(suffix))
+        if glob is not None:
+            candidates = narrow(self._paths.glob(glob))
+
+        if candidates is None:
+            candidates = self._objects
+
+        found = []
+        for (path, object_properties) in self._pairs(candidates):
+            if all(isinstance(object_properties, dict) and
+                   name in object_properties and
+                   _index_key(object_properties[name]) == _index_key(value)
+                   for (name, value) in properties.items()):
+                found.append((path, object_properties))
+
+        return found
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+
+"""
+Keep the FRUs of many OpenBMC controllers in one indexed database.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-many-arguments
+
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from openbmc.OpenBMC import CACHE_DIR, private_directory
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS hosts (
+           hostname TEXT PRIMARY KEY,
+           ingested REAL NOT NULL)""",
+    """CREATE TABLE IF NOT EXISTS frus (
+           hostname TEXT NOT NULL,
+           path TEXT NOT NULL,
+           fru_type TEXT,
+           model TEXT,
+           serial TEXT,
+           present TEXT,
+           fault TEXT,
+           properties TEXT NOT NULL,
+           digest TEXT NOT NULL,
+           changed REAL NOT NULL,
+           PRIMARY KEY (hostname, path))""",
+    """CREATE INDEX IF NOT EXISTS frus_fru_type ON frus (fru_type)""",
+    """CREATE INDEX IF NOT EXISTS frus_model ON frus (model)""",
+    """CREATE INDEX IF NOT EXISTS frus_serial ON frus (serial)""",
+    """CREATE INDEX IF NOT EXISTS frus_fault ON frus (fault, present)""",
+]
+
+# The columns query() can filter on, all matched as GLOB patterns
+QUERY_COLUMNS = ("hostname", "path", "fru_type", "model", "serial",
+                 "present", "fault")
+
+
+def _text(value):
+    """Return value as it is stored in a column"""
+
+    if value is None:
+        return None
+    # Model and serial numbers are padded with spaces by some FRUs
+    return ("%s" % (value, )).strip()
+
+
+class InventoryDatabase(object):
+    """The FRUs of every ingested host, kept in a single SQLite file
+
+    ingest() replaces what is known about one host with the FRUs (the
+    objects with a fru_type) of its inventory, writing only the ones that
+    were added, changed or removed since the last time.  query() then
+    answers questions about every host at once, such as which ones have
+    a given DIMM model or a faulted FRU, from the indexes without asking
+    any BMC.  One instance may be shared between threads, and several
+    processes may ingest into the same file at once.
+    """
+
+    def __init__(self, filename=None):
+        if filename is None:
+            filename = os.path.join(private_directory(CACHE_DIR),
+                                    "inventory.db")
+        self.filename = filename
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(filename,
+                                   timeout=60,
+                                   check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        self._db.commit()
+
+    def close(self):
+        """Close the underlying database"""
+
+        with self._lock:
+            self._db.close()
+
+    def ingest(self, hostname, items):
+        """Record the FRUs among the (path, properties) items of hostname
+
+        Returns a dictionary counting the FRUs which were added, changed,
+        removed and unchanged.
+        """
+
+        frus = {}
+        for (path, properties) in items:
+            if isinstance(properties, dict) and "fru_type" in properties:
+                content = json.dumps(properties, sort_keys=True)
+                digest = hashlib.sha1(content.encode("utf-8")).hexdigest()
+                frus[path] = (properties, content, digest)
+
+        counts = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+        now = time.time()
+
+        with self._lock:
+            known = dict(self._db.execute(
+                "SELECT path, digest FROM frus WHERE hostname = ?",
+                (hostname, )).fetchall())
+
+            for path in set(known) - set(frus):
+                self._db.execute(
+                    "DELETE FROM frus WHERE hostname = ? AND path = ?",
+                    (hostname, path))
+                counts["removed"] += 1
+
+            for (path, (properties, content, digest)) in frus.items():
+                if known.get(path) == digest:
+                    counts["unchanged"] += 1
+                    continue
+
+                if path in known:
+                    counts["changed"] += 1
+                else:
+                    counts["added"] += 1
+
+                self._db.execute(
+                    "INSERT OR REPLACE INTO frus"
+                    " (hostname, path, fru_type, model, serial, present,"
+                    " fault, properties, digest, changed)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (hostname,
+                     path,
+                     _text(properties.get("fru_type")),
+                     _text(properties.get("Model Number")),
+                     _text(properties.get("Serial Number")),
+                     _text(properties.get("present")),
+                     _text(properties.get("fault")),
+                     content,
+                     digest,
+                     now))
+
+            self._db.execute(
+                "INSERT OR REPLACE INTO hosts (hostname, ingested)"
+                " VALUES (?, ?)",
+                (hostname, now))
+            self._db.commit()
+
+        return counts
+
+    def forget(self, hostname):
+        """Remove everything known about hostname"""
+
+        with self._lock:
+            self._db.execute("DELETE FROM frus WHERE hostname = ?",
+                             (hostname, ))
+            self._db.execute("DELETE FROM hosts WHERE hostname = ?",
+                             (hostname, ))
+            self._db.commit()
+
+    def hosts(self):
+        """Return {hostname: time of the last ingest}"""
+
+        with self._lock:
+            return dict(self._db.execute(
+                "SELECT hostname, ingested FROM hosts").fetchall())
+
+    def query(self, **patterns):
+        """Return the FRUs matching every given pattern
+
+        Each keyword is one of QUERY_COLUMNS and its value a GLOB
+        pattern, for example query(fru_type="DIMM", model="M393B*").
+        Each FRU is returned as a dictionary of those columns along with
+        its properties, ordered by hostname and path.
+        """
+
+        conditions = []
+        values = []
+        for (column, pattern) in sorted(patterns.items()):
+            if column not in QUERY_COLUMNS:
+                raise ValueError("Cannot query by %s" % (column, ))
+            if pattern is None:
+                continue
+            conditions.append("%s GLOB ?" % (column, ))
+            values.append(_text(pattern))
+
+        statement = ("SELECT %s, properties FROM frus" % (
+            ", ".join(QUERY_COLUMNS), ))
+        if conditions:
+            statement += " WHERE " + " AND ".join(conditions)
+        statement += " ORDER BY hostname, path"
+
+        with self._lock:
+            rows = self._db.execute(statement, values).fetchall()
+
+        frus = []
+        for row in rows:
+            fru = dict(zip(QUERY_COLUMNS, row[:-1]))
+            fru["properties"] = json.loads(row[-1])
+            frus.append(fru)
+
+        return frus
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+"""
+Decode and encode JSON with the fastest library installed.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-few-public-methods
+# pylint: disable=global-statement
+
+from __future__ import print_function
+
+import importlib
+import json
+
+# The codecs tried, fastest first, when none has been chosen
+CODECS = ("orjson", "ujson", "simplejson", "json")
+
+
+class Codec(object):
+    """A JSON library
+
+    loads(content) decodes bytes or text, and dumps(obj) returns text.
+    Both raise a ValueError on bad input, as the json module does.
+    """
+
+    __slots__ = ("name", "loads", "dumps")
+
+    def __init__(self, name, loads, dumps):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def __repr__(self):
+        return "Codec(%s)" % (self.name, )
+
+
+def _json():
+    def loads(content):
+        if isinstance(content, bytes):
+            content = content.decode("utf-8")
+        return json.loads(content)
+
+    return Codec("json", loads, json.dumps)
+
+
+def _simplejson():
+    simplejson = importlib.import_module("simplejson")
+
+    def loads(content):
+        if isinstance(content, bytes):
+            content = content.decode("utf-8")
+        return simplejson.loads(content)
+
+    return Codec("simplejson", loads, simplejson.dumps)
+
+
+def _ujson():
+    ujson = importlib.import_module("ujson")
+
+    def loads(content):
+        if isinstance(content, bytes):
+            content = content.decode("utf-8")
+        return ujson.loads(content)
+
+    def dumps(obj):
+        return ujson.dumps(obj, escape_forward_slashes=False)
+
+    return Codec("ujson", loads, dumps)
+
+
+def _orjson():
+    orjson = importlib.import_module("orjson")
+
+    def dumps(obj):
+        # orjson returns bytes
+        return orjson.dumps(obj).decode("utf-8")
+
+    # orjson.loads takes bytes as they are
+    return Codec("orjson", orjson.loads, dumps)
+
+
+_FACTORIES = {"orjson": _orjson,
+              "ujson": _ujson,
+              "simplejson": _simplejson,
+              "json": _json}
+
+_CODEC = None
+
+
+def make_codec(name):
+    """Return the Codec called name, a ValueError if it is not installed"""
+
+    if name not in _FACTORIES:
+        raise ValueError("Unknown JSON codec %s" % (name, ))
+    try:
+        return _FACTORIES[name]()
+    except ImportError:
+        raise ValueError("%s is not installed" % (name, ))
+
+
+def set_codec(codec):
+    """Use codec, a Codec or one of CODECS, for every response
+
+    None goes back to the fastest one installed.
+    """
+
+    global _CODEC
+    if codec is not None and not isinstance(codec, Codec):
+        codec = make_codec(codec)
+    _CODEC = codec
+
+
+def get_codec():
+    """Return the Codec in use, picking the fastest on the first call"""
+
+    global _CODEC
+    if _CODEC is None:
+        for name in CODECS:
+            try:
+                _CODEC = make_codec(name)
+                break
+            except ValueError:
+                continue
+    return _CODEC
+
+
+def decode(content):
+    """Decode content, bytes or text, with the codec in use"""
+
+    return get_codec().loads(content)
+
+
+def encode(obj):
+    """Encode obj as text with the codec in use"""
+
+    return get_codec().dumps(obj)
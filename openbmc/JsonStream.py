@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+
+"""
+Incrementally decode the large JSON objects OpenBMC enumerations return.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-few-public-methods
+
+from __future__ import print_function
+
+import codecs
+import json
+import re
+
+# How many bytes of a response to decode at a time
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+# Everything up to the next bracket outside a string
+_NOT_BRACKETS = re.compile(r'(?:"[^"\\]*(?:\\.[^"\\]*)*"|[^"{}\[\]]+)*',
+                           re.DOTALL)
+_SCALAR_END = re.compile(r"[,}\] \t\n\r]")
+
+
+def iter_chunks(content, size=CHUNK_SIZE):
+    """Yield content (bytes) size bytes at a time"""
+
+    for start in range(0, len(content), size):
+        yield content[start:start+size]
+
+
+class _Reader(object):
+    """A window onto text decoded from an iterator of byte chunks
+
+    Text before pos is thrown away as more is read, unless mark is set,
+    in which case everything from mark on is kept.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = u""
+        self.pos = 0
+        self.mark = None
+        self.eof = False
+
+    def fill(self):
+        """Read more text; return False at the end of the input"""
+
+        if self.eof:
+            return False
+
+        keep = self.pos if self.mark is None else self.mark
+        self.buf = self.buf[keep:]
+        self.pos -= keep
+        if self.mark is not None:
+            self.mark = 0
+
+        try:
+            chunk = next(self._chunks)
+            text = self._decoder.decode(chunk)
+        except StopIteration:
+            text = self._decoder.decode(b"", True)
+            self.eof = True
+
+        self.buf += text
+        return True
+
+    def _error(self, expected):
+        found = self.buf[self.pos:self.pos+20] if not self.at_end() else "EOF"
+        raise ValueError("Expected %s at %r" % (expected, found, ))
+
+    def at_end(self):
+        """Return True if nothing is left to read"""
+
+        while self.pos >= len(self.buf):
+            if not self.fill():
+                return True
+        return False
+
+    def peek(self):
+        """Skip whitespace and return the next character"""
+
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                self._error("a value")
+
+    def expect(self, characters):
+        """Consume the next character, which must be in characters"""
+
+        character = self.peek()
+        if character not in characters:
+            self._error(" or ".join(repr(c) for c in characters))
+        self.pos += 1
+        return character
+
+    def _skip_string(self):
+        while True:
+            match = _STRING.match(self.buf, self.pos)
+            if match is not None:
+                self.pos = match.end()
+                return
+            if not self.fill():
+                self._error("the end of a string")
+
+    def read_string(self):
+        """Consume a string and return its value"""
+
+        if self.peek() != '"':
+            self._error("a string")
+        self.mark = self.pos
+        self._skip_string()
+        text = self.buf[self.mark+1:self.pos-1]
+        self.mark = None
+        if "\\" in text:
+            return json.loads(u'"%s"' % (text, ))
+        return text
+
+    def skip_value(self):
+        """Consume a value without building it"""
+
+        character = self.peek()
+
+        if character == '"':
+            self._skip_string()
+            return
+
+        if character not in "{[":
+            # A number, true, false or null
+            while True:
+                match = _SCALAR_END.search(self.buf, self.pos)
+                if match is not None:
+                    self.pos = match.start()
+                    return
+                if self.eof:
+                    self.pos = len(self.buf)
+                    return
+                self.fill()
+
+        self.pos += 1
+        depth = 1
+        while depth:
+            self.pos = _NOT_BRACKETS.match(self.buf, self.pos).end()
+            if self.pos == len(self.buf):
+                if not self.fill():
+                    self._error("the end of a value")
+                continue
+            character = self.buf[self.pos]
+            if character == '"':
+                # A string which has not been completely read yet
+                self._skip_string()
+                continue
+            self.pos += 1
+            if character in "{[":
+                depth += 1
+            else:
+                depth -= 1
+
+    def read_value(self):
+        """Consume a value and return it"""
+
+        self.peek()
+        self.mark = self.pos
+        self.skip_value()
+        text = self.buf[self.mark:self.pos]
+        self.mark = None
+        return json.loads(text)
+
+
+def iter_members(chunks, member="data", want=None):
+    """Yield (key, value) for each entry of one member of a JSON object
+
+    chunks is an iterable of the bytes of a document such as
+    {"data": {...}, "message": ..., "status": ...}.  Each entry of the
+    object under member is yielded as soon as it has been read.  Only the
+    entries whose key want(key) accepts are decoded; the rest are skipped
+    over without being built.
+    """
+
+    reader = _Reader(chunks)
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+
+    while True:
+        key = reader.read_string()
+        reader.expect(":")
+
+        if key != member or reader.peek() != "{":
+            reader.skip_value()
+        else:
+            reader.expect("{")
+            if reader.peek() == "}":
+                reader.pos += 1
+            else:
+                while True:
+                    item_key = reader.read_string()
+                    reader.expect(":")
+                    if want is None or want(item_key):
+                        yield (item_key, reader.read_value())
+                    else:
+                        reader.skip_value()
+                    if reader.expect(",}") == "}":
+                        break
+            # Nothing after the member is needed
+            return
+
+        if reader.expect(",}") == "}":
+            return
+
+
+def path_matcher(prefix=None, suffix=None, match=None):
+    """Return a test for paths, or None if every path is wanted
+
+    prefix and suffix may each be a string or a tuple of strings, and
+    match a function of the path.  A path must pass all that are given.
+    """
+
+    if prefix is None and suffix is None and match is None:
+        return None
+
+    def want(path):
+        """Return True if path is wanted"""
+        if prefix is not None and not path.startswith(prefix):
+            return False
+        if suffix is not None and not path.endswith(suffix):
+            return False
+        if match is not None and not match(path):
+            return False
+        return True
+
+    return want
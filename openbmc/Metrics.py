@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+
+"""
+Count and time the requests made to OpenBMC controllers.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-few-public-methods
+# What is with [invalid-name] Invalid variable name "fp"
+# pylint: disable=invalid-name
+
+from __future__ import print_function
+
+import json
+import threading
+
+from openbmc.OpenBMC import add_request_hook, remove_request_hook
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+                   30)
+
+FORMATS = ("prometheus", "json", "summary")
+
+
+class Histogram(object):
+    """How many observations fell at or below each bucket's bound"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        """Count one observation"""
+
+        for (i, bound) in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative(self):
+        """Return [(bound, observations at or below it)]"""
+
+        total = 0
+        result = []
+        for (bound, count) in zip(self.buckets, self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def to_dict(self):
+        """Return the histogram as plain data"""
+
+        return {"buckets": [[bound, count]
+                            for (bound, count) in self.cumulative()],
+                "count": self.count,
+                "sum": self.sum,
+                "max": self.max}
+
+
+def _labels(**labels):
+    """Return labels in Prometheus' {name="value",...} form"""
+
+    def escape(value):
+        return ("%s" % (value, )).replace("\\", "\\\\").replace(
+            "\"", "\\\"").replace("\n", "\\n")
+
+    return "{%s}" % (",".join("%s=\"%s\"" % (name, escape(value))
+                              for (name, value) in sorted(labels.items())))
+
+
+def _bound(bound):
+    return "%g" % (bound, )
+
+
+class Metrics(object):
+    """Counters and latency histograms fed by request hooks
+
+    An instance is itself a request hook, and install() adds it to
+    every session.  Requests are counted by method, endpoint (the path
+    with numbers replaced, see OpenBMC.endpoint_of), status and whether
+    they were answered from a recording.  Latency and response bytes
+    are kept by method and endpoint, and requests and logins by host.
+    The totals can be written as Prometheus text or JSON, or as a
+    summary of which endpoints took the most time.  One instance may be
+    shared between threads.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # (method, endpoint, status, cache) -> requests
+        self.requests = {}
+        # (method, endpoint, error) -> requests which got no response
+        self.errors = {}
+        # (method, endpoint) -> Histogram of seconds
+        self.latency = {}
+        # (method, endpoint) -> bytes of response bodies
+        self.response_bytes = {}
+        # hostname -> requests, and logins
+        self.host_requests = {}
+        self.logins = {}
+
+    def __call__(self, info):
+        endpoint = info.endpoint
+        key = (info.method, endpoint)
+        hostname = info.hostname
+
+        with self._lock:
+            if info.error is not None:
+                error_key = key + (info.error, )
+                self.errors[error_key] = self.errors.get(error_key, 0) + 1
+            else:
+                request_key = key + ("%s" % (info.status_code, ),
+                                     info.cache)
+                self.requests[request_key] = self.requests.get(
+                    request_key, 0) + 1
+
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram(self.buckets)
+            histogram.observe(info.latency)
+
+            if info.size is not None:
+                self.response_bytes[key] = self.response_bytes.get(
+                    key, 0) + info.size
+
+            self.host_requests[hostname] = self.host_requests.get(
+                hostname, 0) + 1
+            if endpoint == "/login":
+                self.logins[hostname] = self.logins.get(hostname, 0) + 1
+
+    def install(self):
+        """Start counting the requests of every session"""
+
+        add_request_hook(self)
+        return self
+
+    def uninstall(self):
+        """Stop counting"""
+
+        remove_request_hook(self)
+
+    def endpoints(self):
+        """Return a summary per endpoint, most total time first
+
+        Each is a dictionary of the method, endpoint, number of
+        requests, total, mean and maximum seconds, share of the time
+        spent in all requests and bytes received.
+        """
+
+        with self._lock:
+            total = sum(histogram.sum for histogram in self.latency.values())
+            rows = []
+            for ((method, endpoint), histogram) in self.latency.items():
+                rows.append({
+                    "method": method,
+                    "endpoint": endpoint,
+                    "requests": histogram.count,
+                    "seconds": histogram.sum,
+                    "mean": histogram.sum / histogram.count,
+                    "max": histogram.max,
+                    "share": histogram.sum / total if total else 0.0,
+                    "bytes": self.response_bytes.get((method, endpoint),
+                                                     0)})
+
+        rows.sort(key=lambda row: (-row["seconds"],
+                                   row["method"],
+                                   row["endpoint"]))
+        return rows
+
+    def to_dict(self):
+        """Return every metric as plain data"""
+
+        with self._lock:
+            return {
+                "requests": [
+                    {"method": method,
+                     "endpoint": endpoint,
+                     "status": status,
+                     "cache": cache,
+                     "count": count}
+                    for ((method, endpoint, status, cache), count)
+                    in sorted(self.requests.items())],
+                "errors": [
+                    {"method": method,
+                     "endpoint": endpoint,
+                     "error": error,
+                     "count": count}
+                    for ((method, endpoint, error), count)
+                    in sorted(self.errors.items())],
+                "latency": [
+                    dict(histogram.to_dict(),
+                         method=method,
+                         endpoint=endpoint)
+                    for ((method, endpoint), histogram)
+                    in sorted(self.latency.items())],
+                "response_bytes": [
+                    {"method": method,
+                     "endpoint": endpoint,
+                     "bytes": size}
+                    for ((method, endpoint), size)
+                    in sorted(self.response_bytes.items())],
+                "host_requests": dict(self.host_requests),
+                "logins": dict(self.logins)}
+
+    def to_json(self):
+        """Return every metric as a JSON document"""
+
+        return json.dumps(self.to_dict(), sort_keys=True, indent=4,
+                          separators=(",", ": "))
+
+    def to_prometheus(self):
+        """Return every metric in the Prometheus text exposition format"""
+
+        lines = []
+
+        def family(name, kind, text):
+            lines.append("# HELP %s %s" % (name, text, ))
+            lines.append("# TYPE %s %s" % (name, kind, ))
+
+        with self._lock:
+            family("openbmc_requests_total", "counter",
+                   "Requests which got a response.")
+            for ((method, endpoint, status, cache), count) in sorted(
+                    self.requests.items()):
+                lines.append("openbmc_requests_total%s %d" % (
+                    _labels(method=method,
+                            endpoint=endpoint,
+                            status=status,
+                            cache=cache),
+                    count, ))
+
+            family("openbmc_request_errors_total", "counter",
+                   "Requests which got no response.")
+            for ((method, endpoint, error), count) in sorted(
+                    self.errors.items()):
+                lines.append("openbmc_request_errors_total%s %d" % (
+                    _labels(method=method, endpoint=endpoint, error=error),
+                    count, ))
+
+            family("openbmc_request_duration_seconds", "histogram",
+                   "Time taken by requests.")
+            for ((method, endpoint), histogram) in sorted(
+                    self.latency.items()):
+                for (bound, count) in histogram.cumulative():
+                    lines.append(
+                        "openbmc_request_duration_seconds_bucket%s %d" % (
+                            _labels(method=method,
+                                    endpoint=endpoint,
+                                    le=_bound(bound)),
+                            count, ))
+                labels = _labels(method=method, endpoint=endpoint)
+                lines.append(
+                    "openbmc_request_duration_seconds_bucket%s %d" % (
+                        _labels(method=method, endpoint=endpoint, le="+Inf"),
+                        histogram.count, ))
+                lines.append("openbmc_request_duration_seconds_sum%s %r" % (
+                    labels,
+                    histogram.sum, ))
+                lines.append("openbmc_request_duration_seconds_count%s %d" % (
+                    labels,
+                    histogram.count, ))
+
+            family("openbmc_response_bytes_total", "counter",
+                   "Bytes of response bodies received.")
+            for ((method, endpoint), size) in sorted(
+                    self.response_bytes.items()):
+                lines.append("openbmc_response_bytes_total%s %d" % (
+                    _labels(method=method, endpoint=endpoint),
+                    size, ))
+
+            family("openbmc_host_requests_total", "counter",
+                   "Requests made to each BMC.")
+            for (hostname, count) in sorted(self.host_requests.items()):
+                lines.append("openbmc_host_requests_total%s %d" % (
+                    _labels(hostname=hostname),
+                    count, ))
+
+            family("openbmc_logins_total", "counter",
+                   "Logins to each BMC.")
+            for (hostname, count) in sorted(self.logins.items()):
+                lines.append("openbmc_logins_total%s %d" % (
+                    _labels(hostname=hostname),
+                    count, ))
+
+        return "\n".join(lines) + "\n"
+
+    def to_summary(self):
+        """Return a table of the endpoints which took the most time"""
+
+        lines = ["%-6s %-50s %8s %9s %9s %6s %10s" % (
+            "method", "endpoint", "requests", "seconds", "mean ms", "share",
+            "bytes", )]
+        for row in self.endpoints():
+            lines.append("%-6s %-50s %8d %9.3f %9.1f %5.1f%% %10d" % (
+                row["method"],
+                row["endpoint"],
+                row["requests"],
+                row["seconds"],
+                row["mean"] * 1000,
+                row["share"] * 100,
+                row["bytes"], ))
+        return "\n".join(lines) + "\n"
+
+    def write(self, fp, metrics_format="prometheus"):
+        """Write the metrics to fp in one of FORMATS"""
+
+        if metrics_format == "json":
+            fp.write(self.to_json() + "\n")
+        elif metrics_format == "summary":
+            fp.write(self.to_summary())
+        else:
+            fp.write(self.to_prometheus())
@@ -0,0 +1,854 @@
+#!/usr/bin/env python
+
+"""
+A local HTTPS server which behaves like an OpenBMC controller.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-instance-attributes
+# What is with [invalid-name] Invalid variable name "fp"
+# pylint: disable=invalid-name
+
+from __future__ import print_function
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import ssl
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+# The default inventory looks like a two socket machine fully populated
+DEFAULT_DIMMS = 32
+DEFAULT_CPUS = 2
+DEFAULT_EVENTS = 20
+
+# Paths of the objects actions are posted to
+CHASSIS_PATH = "/org/openbmc/control/chassis0"
+BMC_PATH = "/org/openbmc/control/bmc0"
+SYSTEM_PATH = "/org/openbmc/managers/System"
+POWER_PATH = "/org/openbmc/control/power0"
+BOOT_PROGRESS_PATH = "/org/openbmc/sensors/host/BootProgress"
+EVENTS_PATH = "/org/openbmc/records/events/"
+FLASH_BIOS_PATH = "/org/openbmc/control/flash/bios"
+UPLOAD_PATH = "/upload/image/"
+
+# Where uploaded images are said to be stored
+IMAGE_DIRECTORY = "/tmp/images/"
+
+_WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def make_certificate(directory):
+    """Write a throwaway self-signed certificate and key into directory
+
+    Returns (certificate filename, key filename).  The openssl command
+    does the work, as Python has no way to make one by itself.
+    """
+
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+
+    with open(os.devnull, "w") as devnull:
+        subprocess.check_call(["openssl", "req", "-x509",
+                               "-newkey", "rsa:2048",
+                               "-nodes",
+                               "-keyout", keyfile,
+                               "-out", certfile,
+                               "-days", "1",
+                               "-subj", "/CN=localhost"],
+                              stdout=devnull,
+                              stderr=devnull)
+
+    return (certfile, keyfile)
+
+
+def build_objects(dimms=DEFAULT_DIMMS,
+                  cpus=DEFAULT_CPUS,
+                  events=DEFAULT_EVENTS):
+    """Return the {path: properties} tree of a freshly booted BMC"""
+
+    objects = {
+        POWER_PATH: {"pgood": 0,
+                     "poll_interval": 3000,
+                     "pgood_timeout": 10,
+                     "state": 0},
+        CHASSIS_PATH: {"reboot": 0,
+                       "uuid": "24340d83aa784d858468993286b390a5"},
+        BMC_PATH: {},
+        "/org/openbmc/control/flash/bmc": {"version": "v1.99.0-mock",
+                                           "status": "Idle"},
+        FLASH_BIOS_PATH: {"version": "open-power-0.1",
+                          "status": "Idle"},
+        BOOT_PROGRESS_PATH: {"units": "", "value": "Off", "error": 0},
+        "/org/openbmc/sensors/host/cpu0/OccActive": {"units": "",
+                                                     "value": False,
+                                                     "error": 0},
+        "/org/openbmc/sensors/temperature/ambient": {"units": "C",
+                                                     "value": 24.5,
+                                                     "error": 0},
+    }
+
+    motherboard = "/org/openbmc/inventory/system/chassis/motherboard/"
+    for i in range(cpus):
+        objects["%scpu%d" % (motherboard, i, )] = {"fru_type": "CPU",
+                                                   "is_fru": 1,
+                                                   "present": "True",
+                                                   "fault": "False",
+                                                   "version": ""}
+    for i in range(dimms):
+        path = "%sdimm%d" % (motherboard, i, )
+        properties = {"fru_type": "DIMM",
+                      "is_fru": 1,
+                      "present": "True",
+                      "fault": "False",
+                      "version": "",
+                      "Asset Tag": "",
+                      "FRU File ID": "",
+                      "Manufacturer": "0xce80",
+                      "Model Number": "M393B2G70DB0-YK0  ",
+                      "Name": "0x0b",
+                      "Serial Number": "0x%08x" % (0x02bb5800 + i, ),
+                      "Version": "0x0000"}
+        for field in range(1, 9):
+            properties["Custom Field %d" % (field, )] = ""
+        objects[path] = properties
+        objects[path + "/event"] = {}
+
+    for i in range(1, events + 1):
+        objects["%s%d" % (EVENTS_PATH, i, )] = event_record(i)
+
+    return objects
+
+
+def event_record(number):
+    """Return a made up event record"""
+
+    return {"associations": [
+        ["fru",
+         "event",
+         "/org/openbmc/inventory/system/chassis/motherboard/dimm%d" % (
+             number % 4, )]],
+            "severity": "Info",
+            "reported_by": "Test",
+            "debug_data": [48, 0, 19, 127, 136, 255],
+            "time": "2016:09:20 12:57:%02d" % (number % 60, ),
+            "message": "A Test event log just happened"}
+
+
+class _CountingFile(object):
+    """Count the bytes going through a socket file"""
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.count = 0
+
+    def read(self, *args):
+        data = self.fp.read(*args)
+        self.count += len(data)
+        return data
+
+    def readline(self, *args):
+        data = self.fp.readline(*args)
+        self.count += len(data)
+        return data
+
+    def write(self, data):
+        self.count += len(data)
+        return self.fp.write(data)
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+    def __getattr__(self, name):
+        return getattr(self.fp, name)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answer one connection's requests from the server's MockOpenBMC"""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, and the delayed ACK
+    # would otherwise add 40ms to every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, *_):
+        pass
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.rfile = _CountingFile(self.rfile)
+        self.wfile = _CountingFile(self.wfile)
+
+    def handle_one_request(self):
+        (received, sent) = (self.rfile.count, self.wfile.count)
+        self.command = None
+        BaseHTTPRequestHandler.handle_one_request(self)
+        if self.command is not None:
+            self.server.mock.count(self.command,
+                                   self.rfile.count - received,
+                                   self.wfile.count - sent)
+
+    def reply(self, status_code, data, cookie=None):
+        """Send data wrapped the way the BMC does"""
+
+        body = json.dumps({"status": "ok" if status_code == 200 else "error",
+                           "message": "%d" % (status_code, ),
+                           "data": data}).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if cookie is not None:
+            self.send_header("Set-Cookie", "sid=%s; Path=/; Secure" % (
+                cookie, ))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def skip_body(self):
+        """Read and throw away the request body"""
+
+        length = int(self.headers.get("Content-Length") or 0)
+        while length > 0:
+            chunk = self.rfile.read(min(length, 65536))
+            if not chunk:
+                break
+            length -= len(chunk)
+
+    def read_body(self):
+        """Return the JSON posted, or None"""
+
+        length = int(self.headers.get("Content-Length") or 0)
+        content = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(content.decode("utf-8"))
+        except ValueError:
+            return None
+
+    def session(self):
+        """Return the session ID the request carries, or None"""
+
+        match = re.search(r"\bsid=([^;\s]+)", self.headers.get("Cookie", ""))
+        if match is None:
+            return None
+        return match.group(1)
+
+    def _path(self):
+        return re.sub("/+", "/", self.path.split("?", 1)[0])
+
+    def _prologue(self):
+        """Delay, inject errors, check the session; True to carry on"""
+
+        mock = self.server.mock
+        path = self._path()
+
+        mock.delay()
+
+        status_code = mock.injected_error()
+        if status_code is not None:
+            self.skip_body()
+            self.reply(status_code, "Injected error")
+            return False
+
+        if path == "/login":
+            return True
+
+        if not mock.has_session(self.session()):
+            self.skip_body()
+            self.reply(401, "Login required")
+            return False
+
+        return True
+
+    def do_GET(self):
+        """Answer objects, listings, enumerations and /subscribe"""
+
+        if not self._prologue():
+            return
+
+        mock = self.server.mock
+        path = self._path()
+
+        if path == "/subscribe":
+            self.subscribe()
+            return
+
+        (found, data) = mock.lookup(path)
+        if not found:
+            self.reply(404, "Not found")
+            return
+        self.reply(200, data)
+
+    def do_POST(self):
+        """Answer /login and /action/* requests"""
+
+        if not self._prologue():
+            return
+
+        mock = self.server.mock
+        path = self._path()
+        body = self.read_body()
+
+        if path == "/login":
+            data = (body or {}).get("data") or []
+            if data != [mock.user, mock.password]:
+                self.reply(401, "Invalid username or password")
+                return
+            self.reply(200,
+                       "User '%s' logged in" % (mock.user, ),
+                       cookie=mock.new_session())
+            return
+
+        if path == "/logout":
+            mock.end_session(self.session())
+            self.reply(200, "User logged out")
+            return
+
+        (found, data) = mock.action(path, (body or {}).get("data"))
+        if not found:
+            self.reply(404, "Not found")
+            return
+        self.reply(200, data)
+
+    def do_PUT(self):
+        """Store firmware images PUT to /upload/image/NAME"""
+
+        if not self._prologue():
+            return
+
+        mock = self.server.mock
+        path = self._path()
+
+        name = path[len(UPLOAD_PATH):]
+        if not path.startswith(UPLOAD_PATH) or not name or "/" in name:
+            self.skip_body()
+            self.reply(404, "Not found")
+            return
+
+        # Only the size and digest are kept, however large the image
+        length = int(self.headers.get("Content-Length") or 0)
+        digest = hashlib.sha256()
+        size = 0
+        while size < length:
+            chunk = self.rfile.read(min(length - size, 65536))
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+
+        if size < length:
+            self.close_connection = True
+            return
+
+        self.reply(200, mock.add_image(name, size, digest.hexdigest()))
+
+    def subscribe(self):
+        """Push PropertiesChanged and InterfacesAdded over a websocket"""
+
+        key = self.headers.get("Sec-WebSocket-Key")
+        if key is None:
+            self.reply(400, "Not a websocket")
+            return
+
+        accept = base64.b64encode(hashlib.sha1(
+            (key + _WEBSOCKET_GUID).encode("ascii")).digest())
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept.decode("ascii"))
+        self.end_headers()
+        self.wfile.flush()
+
+        mock = self.server.mock
+        mock.add_subscriber(self)
+        try:
+            # The client's paths and anything after are not needed, so
+            # frames are read only to notice the connection going away
+            while read_frame(self.rfile) is not None:
+                pass
+        except (socket.error, ssl.SSLError):
+            pass
+        finally:
+            mock.remove_subscriber(self)
+            self.close_connection = True
+
+    def send_frame(self, text):
+        """Send text as one websocket frame"""
+
+        data = text.encode("utf-8")
+        if len(data) < 126:
+            header = struct.pack("!BB", 0x81, len(data))
+        elif len(data) < 65536:
+            header = struct.pack("!BBH", 0x81, 126, len(data))
+        else:
+            header = struct.pack("!BBQ", 0x81, 127, len(data))
+        self.wfile.write(header + data)
+        self.wfile.flush()
+
+
+def read_frame(fp):
+    """Return the payload of the next websocket frame, None at the end"""
+
+    header = bytearray(fp.read(2))
+    if len(header) < 2 or header[0] & 0x0f == 0x8:
+        return None
+
+    length = header[1] & 0x7f
+    if length == 126:
+        (length, ) = struct.unpack("!H", fp.read(2))
+    elif length == 127:
+        (length, ) = struct.unpack("!Q", fp.read(8))
+
+    mask = bytearray(fp.read(4)) if header[1] & 0x80 else None
+    payload = bytearray(fp.read(length))
+    if mask is not None:
+        for i in range(len(payload)):
+            payload[i] ^= mask[i % 4]
+
+    return bytes(payload)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    """Serve each connection from its own thread, TLS included"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, mock, context):
+        HTTPServer.__init__(self, address, _Handler)
+        self.mock = mock
+        self.context = context
+
+    def finish_request(self, request, client_address):
+        # The handshake is done here, on the connection's own thread,
+        # rather than on accept() where a slow one would hold up the rest
+        try:
+            request = self.context.wrap_socket(request, server_side=True)
+        except (socket.error, ssl.SSLError):
+            return
+        HTTPServer.finish_request(self, request, client_address)
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid request are expected
+        pass
+
+
+class MockOpenBMC(object):
+    """A stand-in for an OpenBMC controller, listening on localhost
+
+    It answers /login, GETs of objects, directory listings and
+    enumerations, the power, warm reset and system state actions, the
+    event records, /subscribe, firmware uploads to /upload/image/ and
+    flashing the BIOS from them, from an inventory of dimms DIMMs and
+    cpus CPUs and a log of events events.  Every request first waits
+    latency seconds (plus up to jitter more), and a fraction error_rate
+    of them are answered with error_status instead; fail_next() fails
+    the next few for certain.  Powering on or off, and flashing, take
+    transition seconds to show.  stats() counts the requests and bytes sent and
+    received, which is what the benchmarks measure.
+
+        with MockOpenBMC(latency=0.01) as mock:
+            ob = OpenBMC(mock.hostname, mock.user, mock.password, True)
+    """
+
+    def __init__(self,
+                 port=0,
+                 latency=0.0,
+                 jitter=0.0,
+                 error_rate=0.0,
+                 error_status=503,
+                 dimms=DEFAULT_DIMMS,
+                 cpus=DEFAULT_CPUS,
+                 events=DEFAULT_EVENTS,
+                 transition=0.0,
+                 user="root",
+                 password="0penBmc",
+                 certfile=None,
+                 keyfile=None,
+                 seed=None):
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.transition = transition
+        self.user = user
+        self.password = password
+        self.objects = build_objects(dimms, cpus, events)
+        self._certfile = certfile
+        self._keyfile = keyfile
+        self._certificate_directory = None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._sessions = set()
+        self._subscribers = []
+        self._failures = []
+        # (state, when) of a power change yet to show
+        self._pending_power = None
+        # When a flash in progress is done
+        self._pending_flash = None
+        # name -> {"size": bytes, "sha256": digest} of uploaded images
+        self.images = {}
+        self._server = None
+        self._thread = None
+        self.reset_stats()
+
+    @property
+    def hostname(self):
+        """What to pass to OpenBMC() as the hostname"""
+
+        return "127.0.0.1:%d" % (self.port, )
+
+    def start(self):
+        """Listen and answer requests from a background thread"""
+
+        if self._certfile is None:
+            self._certificate_directory = tempfile.mkdtemp(
+                prefix="mockopenbmc")
+            (self._certfile, self._keyfile) = make_certificate(
+                self._certificate_directory)
+
+        protocol = getattr(ssl, "PROTOCOL_TLS_SERVER", ssl.PROTOCOL_SSLv23)
+        context = ssl.SSLContext(protocol)
+        context.load_cert_chain(self._certfile, self._keyfile)
+
+        self._server = _Server(("127.0.0.1", self.port), self, context)
+        self.port = self._server.server_address[1]
+
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="mockopenbmc-%d" % (self.port, ))
+        self._thread.daemon = True
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        """Stop listening"""
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
+
+        if self._certificate_directory is not None:
+            shutil.rmtree(self._certificate_directory, ignore_errors=True)
+            self._certificate_directory = None
+            self._certfile = None
+            self._keyfile = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *_):
+        self.stop()
+
+    def delay(self):
+        """Wait as long as the BMC is meant to take"""
+
+        delay = self.latency
+        if self.jitter:
+            with self._lock:
+                delay += self._random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def fail_next(self, count=1, status_code=None):
+        """Answer the next count requests with status_code"""
+
+        if status_code is None:
+            status_code = self.error_status
+        with self._lock:
+            self._failures.extend([status_code] * count)
+
+    def injected_error(self):
+        """Return the status code to fail this request with, or None"""
+
+        with self._lock:
+            if self._failures:
+                status_code = self._failures.pop(0)
+            elif self.error_rate and self._random.random() < self.error_rate:
+                status_code = self.error_status
+            else:
+                return None
+            self._stats["errors"] += 1
+            return status_code
+
+    def new_session(self):
+        """Return the ID of a new login session"""
+
+        sid = base64.b16encode(os.urandom(12)).decode("ascii").lower()
+        with self._lock:
+            self._sessions.add(sid)
+            self._stats["logins"] += 1
+        return sid
+
+    def has_session(self, sid):
+        """Return whether sid is logged in"""
+
+        with self._lock:
+            return sid in self._sessions
+
+    def end_session(self, sid):
+        """Log sid out"""
+
+        with self._lock:
+            self._sessions.discard(sid)
+
+    def expire_sessions(self):
+        """Forget every session, as a rebooted BMC would"""
+
+        with self._lock:
+            self._sessions.clear()
+
+    def _settle(self):
+        """Apply power changes and flashes once they have had time to"""
+
+        if (self._pending_flash is not None and
+                time.time() >= self._pending_flash):
+            self._pending_flash = None
+            self.objects[FLASH_BIOS_PATH] = dict(
+                self.objects[FLASH_BIOS_PATH], status="Flash Done")
+
+        pending = self._pending_power
+        if pending is None or time.time() < pending[1]:
+            return
+        self._pending_power = None
+
+        state = pending[0]
+        changes = {POWER_PATH: {"state": state, "pgood": state},
+                   BOOT_PROGRESS_PATH: {
+                       "value": "FW Progress, Starting OS" if state
+                                else "Off"},
+                   "/org/openbmc/sensors/host/cpu0/OccActive": {
+                       "value": bool(state)}}
+        for (path, properties) in changes.items():
+            self.objects[path] = dict(self.objects[path], **properties)
+            self._notify({"event": "PropertiesChanged",
+                          "path": path,
+                          "interface": "org.openbmc.Mock",
+                          "properties": properties})
+
+    def set_power(self, state):
+        """Power the mock host on (1) or off (0) straight away"""
+
+        with self._lock:
+            self._pending_power = (state, 0)
+            self._settle()
+
+    def add_event(self, record=None):
+        """Log a new event; return its path"""
+
+        with self._lock:
+            numbers = [int(path[len(EVENTS_PATH):])
+                       for path in self.objects
+                       if path.startswith(EVENTS_PATH)]
+            number = max(numbers or [0]) + 1
+            path = "%s%d" % (EVENTS_PATH, number, )
+            self.objects[path] = record or event_record(number)
+            self._notify({"event": "InterfacesAdded",
+                          "path": path,
+                          "interfaces": {"org.openbmc.record": {}}})
+        return path
+
+    def add_image(self, name, size, digest):
+        """Remember an uploaded image; return the path it is stored at"""
+
+        with self._lock:
+            self.images[name] = {"size": size, "sha256": digest}
+        return IMAGE_DIRECTORY + name
+
+    def lookup(self, path):
+        """Return (found, data) for a GET of path"""
+
+        with self._lock:
+            self._settle()
+
+            if path.endswith("/enumerate"):
+                prefix = path[:-len("enumerate")]
+                found = dict((key, value)
+                             for (key, value) in self.objects.items()
+                             if key.startswith(prefix))
+                return (bool(found), found)
+
+            if path in self.objects:
+                return (True, self.objects[path])
+
+            # A directory lists the paths one level below it
+            prefix = path.rstrip("/") + "/"
+            children = set()
+            for key in self.objects:
+                if key.startswith(prefix):
+                    children.add(prefix + key[len(prefix):].split("/")[0])
+            if children:
+                return (True, sorted(children))
+            return (False, None)
+
+    def action(self, path, arguments=None):
+        """Return (found, data) for a POST of arguments to path"""
+
+        (target, _, name) = path.partition("/action/")
+
+        with self._lock:
+            self._settle()
+
+            if name in ("powerOn", "powerOff") and target in (CHASSIS_PATH,
+                                                               BMC_PATH):
+                state = 1 if name == "powerOn" else 0
+                self._pending_power = (state, time.time() + self.transition)
+                self._settle()
+                return (True, None)
+            if name == "getPowerState" and target == CHASSIS_PATH:
+                return (True, self.objects[POWER_PATH]["state"])
+            if name == "warmReset" and target == BMC_PATH:
+                return (True, None)
+            if name == "update" and target == FLASH_BIOS_PATH:
+                filename = (arguments or [""])[0]
+                if (filename.startswith(IMAGE_DIRECTORY) and
+                        filename[len(IMAGE_DIRECTORY):] in self.images):
+                    status = "Flashing"
+                    self._pending_flash = time.time() + self.transition
+                else:
+                    status = "Error: %s not found" % (filename, )
+                self.objects[FLASH_BIOS_PATH] = dict(
+                    self.objects[FLASH_BIOS_PATH], status=status)
+                self._settle()
+                return (True, None)
+            if name == "getSystemState" and target == SYSTEM_PATH:
+                if self.objects[POWER_PATH]["state"]:
+                    return (True, "HOST_BOOTED")
+                return (True, "HOST_POWERED_OFF")
+
+        return (False, None)
+
+    def add_subscriber(self, handler):
+        """Send notifications to handler's websocket"""
+
+        with self._lock:
+            self._subscribers.append(handler)
+
+    def remove_subscriber(self, handler):
+        """Stop sending notifications to handler"""
+
+        with self._lock:
+            if handler in self._subscribers:
+                self._subscribers.remove(handler)
+
+    def _notify(self, notification):
+        text = json.dumps(notification)
+        for handler in list(self._subscribers):
+            try:
+                handler.send_frame(text)
+            except (socket.error, ssl.SSLError, ValueError):
+                self._subscribers.remove(handler)
+
+    def count(self, method, received, sent):
+        """Account for one request"""
+
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats[method] = self._stats.get(method, 0) + 1
+            self._stats["bytes_received"] += received
+            self._stats["bytes_sent"] += sent
+
+    def stats(self):
+        """Return the requests, logins, errors and bytes so far
+
+        Bytes are counted above TLS, so they are those of the HTTP
+        requests and responses themselves.
+        """
+
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        """Start counting from zero"""
+
+        with self._lock:
+            self._stats = {"requests": 0,
+                           "logins": 0,
+                           "errors": 0,
+                           "bytes_received": 0,
+                           "bytes_sent": 0}
+
+
+def main():
+    """Run a MockOpenBMC until interrupted"""
+
+    parser = argparse.ArgumentParser(
+        description="Pretend to be an OpenBMC controller")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds every request takes")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="up to this many more seconds at random")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        dest="error_rate",
+                        help="fraction of requests to fail")
+    parser.add_argument("--error-status", type=int, default=503,
+                        dest="error_status",
+                        help="status code failed requests get")
+    parser.add_argument("--dimms", type=int, default=DEFAULT_DIMMS)
+    parser.add_argument("--cpus", type=int, default=DEFAULT_CPUS)
+    parser.add_argument("--events", type=int, default=DEFAULT_EVENTS)
+    parser.add_argument("--transition", type=float, default=0.0,
+                        help="seconds powering on or off, or flashing,"
+                             " takes")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="0penBmc")
+    args = parser.parse_args()
+
+    mock = MockOpenBMC(port=args.port,
+                       latency=args.latency,
+                       jitter=args.jitter,
+                       error_rate=args.error_rate,
+                       error_status=args.error_status,
+                       dimms=args.dimms,
+                       cpus=args.cpus,
+                       events=args.events,
+                       transition=args.transition,
+                       user=args.user,
+                       password=args.password)
+    mock.start()
+    print("Listening on %s" % (mock.hostname, ))
+
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pass
+
+    mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -42,15 +42,100 @@ Object library to interact with an OpenBMC controller.
 
 from __future__ import print_function
 
+import atexit
+import binascii
+import collections
+import contextlib
+import hashlib
 import json
 import os
+import random
+import re
 import sys
-import requests
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from openbmc.Inventory import Inventory
+from openbmc.JsonCodec import decode
+from openbmc.JsonStream import iter_chunks, iter_members, path_matcher
+from openbmc.Records import CONTROL_RECORDS, control_records, events, frus
+from openbmc.ResponseStore import ResponseStore
+from openbmc.StateWaiter import wait_until
 
 # Sadly a way to fit the line into 78 characters mainly
 JSON_HEADERS = {"Content-Type": "application/json"}
+IMAGE_HEADERS = {"Content-Type": "application/octet-stream"}
 DEBUG = False
 
+# Seconds to wait for a connection and then for each read from the BMC
+TIMEOUT = (5, 60)
+# How many more times to try an idempotent GET, and the base backoff
+RETRIES = 2
+RETRY_BACKOFF = 0.5
+RETRY_MAX_BACKOFF = 10
+# GET responses which are worth trying again
+RETRY_STATUS_CODES = (502, 503, 504)
+# Send a second copy of a GET which has not been answered after this
+# many seconds (None never does)
+HEDGE_AFTER = None
+
+# Fail fast on a BMC after this many consecutive transport failures ...
+CIRCUIT_FAILURES = 3
+# ... until this many seconds have passed
+CIRCUIT_RESET = 60
+
+# Where state that outlives one run (login sessions, ...) is kept
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "openbmc")
+
+# How many connections to keep open to each BMC
+DEFAULT_POOL_MAXSIZE = 10
+# How many BMCs to keep connections open to, the least recently used
+# being closed beyond that
+DEFAULT_POOL_HOSTS = 128
+
+# How long a saved login session is trusted before logging in again
+DEFAULT_SESSION_TTL = 20 * 60
+
+# How long an enumeration of /org/openbmc/control is reused
+DEFAULT_CONTROL_CACHE_TTL = 5
+
+# The control objects whose paths are remembered by a TopologyCache
+TOPOLOGY_FILTERS = ["control/power", "control/chassis", "control/bmc"]
+
+# The control object whose version property is the firmware version
+FIRMWARE_VERSION_PATH = "/org/openbmc/control/flash/bmc"
+
+# Where the filters given to filter_control_items are looked for
+OPENBMC_ROOT = "/org/openbmc/"
+
+# What get_inventory() indexes by default
+INVENTORY_PATH = "/org/openbmc/inventory/system/"
+
+# Where the event log is kept
+EVENTS_PATH = "/org/openbmc/records/events/"
+
+# Where firmware images are PUT, and the object which flashes the BIOS
+UPLOAD_PATH = "/upload/image/"
+FLASH_BIOS_PATH = "/org/openbmc/control/flash/bios"
+
+
+def _requests():
+    """Return the requests module
+
+    It is only imported once a session needs it, so that loading this
+    module for its constants or caches (as openBmcTool --help does)
+    does not pay for the HTTP stack.
+    """
+
+    import requests
+
+    return requests
+
 
 def set_debug(value):
     """Set the debugging level"""
@@ -60,6 +145,141 @@ def set_debug(value):
     DEBUG = value
 
 
+def set_timeouts(connect, read):
+    """Set the connect and read timeouts for sessions created from now on"""
+
+    global TIMEOUT
+
+    TIMEOUT = (connect, read)
+
+
+def set_retries(retries, backoff=None):
+    """Set how often sessions created from now on retry a GET"""
+
+    global RETRIES
+    global RETRY_BACKOFF
+
+    RETRIES = retries
+    if backoff is not None:
+        RETRY_BACKOFF = backoff
+
+
+def set_hedge_after(value):
+    """Hedge GETs unanswered after value seconds (None to stop)"""
+
+    global HEDGE_AFTER
+
+    HEDGE_AFTER = value
+
+
+# Called with a RequestInfo after every request (see add_request_hook)
+_REQUEST_HOOKS = ()
+_REQUEST_HOOKS_LOCK = threading.Lock()
+
+
+def add_request_hook(hook):
+    """Call hook(RequestInfo) after every request sessions make"""
+
+    global _REQUEST_HOOKS
+
+    with _REQUEST_HOOKS_LOCK:
+        _REQUEST_HOOKS = _REQUEST_HOOKS + (hook, )
+
+
+def remove_request_hook(hook):
+    """Stop calling hook after requests"""
+
+    global _REQUEST_HOOKS
+
+    with _REQUEST_HOOKS_LOCK:
+        _REQUEST_HOOKS = tuple(other for other in _REQUEST_HOOKS
+                               if other is not hook)
+
+
+def report_request(method, url, latency, status_code, **kwargs):
+    """Call the request hooks with a RequestInfo about a request
+
+    kwargs are the rest of RequestInfo's fields.
+    """
+
+    hooks = _REQUEST_HOOKS
+    if not hooks:
+        return
+
+    info = RequestInfo(method, url, status_code, latency, **kwargs)
+    for hook in hooks:
+        try:
+            hook(info)
+        except Exception as ex:  # pylint: disable=broad-except
+            print("Request hook %r failed: %s" % (hook, ex, ),
+                  file=sys.stderr)
+
+
+def endpoint_of(url):
+    """Return the path of url with numbers in it replaced by {id}
+
+    For example https://bmc//org/openbmc/records/events/17 becomes
+    /org/openbmc/records/events/{id}, so that requests for different
+    records count as one endpoint.
+    """
+
+    path = url.split("://", 1)[-1]
+    path = "/" + path.split("/", 1)[1] if "/" in path else "/"
+    path = re.sub("/+", "/", path.split("?", 1)[0])
+    return re.sub("/[0-9]+(?=/|$)", "/{id}", path)
+
+
+class RequestInfo(object):
+    """What one request did, as given to request hooks
+
+    latency is in seconds and size is the number of bytes of the
+    response body (None when replaying an already decoded response).
+    Online, cache is always "miss" as the BMC was asked.  Offline, it
+    is "hit" when a recorded response was found and "miss" otherwise.
+    When there was no response at all status_code is None and error
+    names the exception raised, or is "NotRecorded" for an offline miss.
+    """
+
+    __slots__ = ("method", "url", "status_code", "latency", "size",
+                 "online", "cache", "error")
+
+    def __init__(self,
+                 method,
+                 url,
+                 status_code,
+                 latency,
+                 size=None,
+                 online=True,
+                 cache="miss",
+                 error=None):
+        self.method = method
+        self.url = url
+        self.status_code = status_code
+        self.latency = latency
+        self.size = size
+        self.online = online
+        self.cache = cache
+        self.error = error
+
+    @property
+    def hostname(self):
+        """The host[:port] the request went to"""
+
+        return url_prefix(self.url).split("://", 1)[1].rstrip("/")
+
+    @property
+    def endpoint(self):
+        """The request's path, see endpoint_of()"""
+
+        return endpoint_of(self.url)
+
+    def __repr__(self):
+        return "RequestInfo(%s %s, %s, %.3fs)" % (self.method,
+                                                  self.url,
+                                                  self.status_code,
+                                                  self.latency, )
+
+
 class HTTPError(Exception):
     """Custom HTTP error exception"""
 
@@ -88,84 +308,438 @@ class HTTPError(Exception):
         return self.status_code
 
 
-def safe_filename(filename):
-    """Turn a URL into a safe filename"""
+class CircuitOpenError(Exception):
+    """The BMC failed recently and is not being tried again yet"""
+
+    def __init__(self, prefix, retry_in):
+        super(CircuitOpenError, self).__init__(
+            "%s is not answering, not retrying for %d seconds" % (prefix,
+                                                                 retry_in, ))
+        self.prefix = prefix
+        self.retry_in = retry_in
+
+
+class CircuitBreaker(object):
+    """Fail fast on BMCs which keep failing
+
+    After failures consecutive requests against a BMC got no answer (a
+    connection error or timeout on every attempt, retries included),
+    requests to it raise CircuitOpenError straight away for reset
+    seconds.  Then a single request is let through: if it succeeds the
+    BMC is trusted again, otherwise it is shut out for another reset
+    seconds.  Requests made within bypassed() skip the breaker.  One
+    instance may be shared between threads.
+    """
+
+    def __init__(self, failures=CIRCUIT_FAILURES, reset=CIRCUIT_RESET):
+        self.failures = failures
+        self.reset = reset
+        # prefix -> [consecutive failures, time the circuit opened]
+        self._state = {}
+        self._lock = threading.Lock()
+        self._bypass = threading.local()
+
+    @contextlib.contextmanager
+    def bypassed(self):
+        """Let this thread's requests through and not count their failures
+
+        For waiting on a BMC which is expected not to answer for a
+        while, such as one rebooting, and should be seen as soon as it
+        is back.
+        """
+
+        previous = getattr(self._bypass, "active", False)
+        self._bypass.active = True
+        try:
+            yield
+        finally:
+            self._bypass.active = previous
 
-    filename = filename.replace(':', "%"+hex(ord(':')))
-    filename = filename.replace('/', "%"+hex(ord('/')))
-    return filename
+    def _bypassed(self):
+        return getattr(self._bypass, "active", False)
 
+    def before(self, prefix):
+        """Raise CircuitOpenError if prefix should not be tried now"""
 
-def load_response_from_file(filename,
-                            url,
-                            verify,
-                            headers,
-                            data=None):
-    """Loads a response from a saved file"""
+        if self._bypassed():
+            return
 
-    if DEBUG:
-        print("load_response_from_file (%s)" % (filename, ))
+        with self._lock:
+            state = self._state.get(prefix)
+            if state is None or state[1] is None:
+                return
 
-    # import pdb
-    # pdb.set_trace()
+            waited = time.time() - state[1]
+            if waited < self.reset:
+                raise CircuitOpenError(prefix, self.reset - waited)
 
-    if os.path.isfile(filename):
-        saved = None
+            # Let this request through as a trial and keep everyone
+            # else out until it is over
+            state[1] = time.time()
 
-        with open(filename, "r") as fp:
-            json_data = fp.read()
-            saved = json.loads(json_data)
+    def success(self, prefix):
+        """Record that prefix answered"""
 
-        if ((data is not None) and
-                (saved["data"] != data)):
-            return None
+        with self._lock:
+            self._state.pop(prefix, None)
 
-        if (saved["url"] == url and
-                saved["verify"] == verify and
-                saved["headers"] == headers):
-            response = CachedResponse(saved["status_code"],
-                                      saved["json_struct"])
+    def failure(self, prefix):
+        """Record that a request to prefix got no answer"""
 
-            return response
+        if self._bypassed():
+            return
 
-    return None
+        with self._lock:
+            state = self._state.setdefault(prefix, [0, None])
+            state[0] += 1
+            if state[0] >= self.failures:
+                state[1] = time.time()
 
 
-def write_response_to_file(filename,
-                           url,
-                           verify,
-                           headers,
-                           status_code,
-                           json_struct,
-                           data=None):
-    """Saves a file containing the response"""
+_CIRCUIT_BREAKER = CircuitBreaker()
+
+
+def get_circuit_breaker():
+    """Return the process wide CircuitBreaker"""
+
+    return _CIRCUIT_BREAKER
+
+
+def private_directory(path):
+    """Create path, readable only by the owner, if it does not exist"""
+
+    if not os.path.isdir(path):
+        try:
+            os.makedirs(path, 0o700)
+        except OSError:
+            # Someone else may have just created it
+            if not os.path.isdir(path):
+                raise
+
+    return path
+
+
+def write_private_file(filename, contents):
+    """Atomically replace filename with contents, readable only by us"""
+
+    private_directory(os.path.dirname(filename))
+
+    tmp_filename = "%s.%d.%d.tmp" % (filename,
+                                     os.getpid(),
+                                     threading.current_thread().ident, )
+    fd = os.open(tmp_filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as fp:
+        fp.write(contents)
+    os.rename(tmp_filename, filename)
+
+
+class ConnectionPoolManager(object):
+    """Process wide HTTP connection pools, one per BMC
+
+    Every CachedSession talking to the same BMC mounts the same requests
+    HTTPAdapter, so kept-alive connections (and their TLS sessions) are
+    reused across OpenBMC instances while each session keeps its own
+    cookies.  With pool_block set, callers wait for a free connection
+    instead of opening more than pool_maxsize to one BMC.  Only the
+    max_hosts BMCs used most recently keep their pools, so sweeping a
+    large fleet does not run out of file descriptors.
+    """
+
+    def __init__(self,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 pool_block=False,
+                 max_hosts=DEFAULT_POOL_HOSTS):
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.max_hosts = max_hosts
+        self._adapters = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, pool_maxsize=None, pool_block=None, max_hosts=None):
+        """Change the settings used for pools created from now on"""
+
+        with self._lock:
+            if pool_maxsize is not None:
+                self.pool_maxsize = pool_maxsize
+            if pool_block is not None:
+                self.pool_block = pool_block
+            if max_hosts is not None:
+                self.max_hosts = max_hosts
+
+    def adapter_for(self, prefix):
+        """Return the adapter shared by requests to prefix
+
+        Sessions should ask again before each request, since the adapter
+        is replaced once it has been closed for want of room.
+        """
+
+        evicted = []
+
+        with self._lock:
+            adapter = self._adapters.pop(prefix, None)
+            if adapter is None:
+                adapter = _requests().adapters.HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=self.pool_maxsize,
+                    pool_block=self.pool_block)
+            self._adapters[prefix] = adapter
+            while len(self._adapters) > max(self.max_hosts, 1):
+                evicted.append(self._adapters.popitem(last=False)[1])
+
+        for old in evicted:
+            old.close()
+
+        return adapter
+
+    def clear(self):
+        """Close every pooled connection"""
+
+        with self._lock:
+            adapters = list(self._adapters.values())
+            self._adapters = collections.OrderedDict()
+
+        for adapter in adapters:
+            adapter.close()
+
+
+_POOL_MANAGER = ConnectionPoolManager()
+
 
-    to_save = {}
-    to_save["url"] = url
-    if data is not None:
-        to_save["data"] = data
-    to_save["verify"] = verify
-    to_save["headers"] = headers
-    to_save["status_code"] = status_code
-    to_save["json_struct"] = json_struct
+def get_pool_manager():
+    """Return the process wide ConnectionPoolManager"""
 
-    json_data = json.dumps(to_save)
+    return _POOL_MANAGER
 
-    msg = "write_response_to_file: json_data = %s" % (json_data, )
-    if DEBUG:
-        print(msg)
 
-    # What is with [invalid-name] Invalid variable name "fp"
-    with open(filename, "w") as fp:
-        fp.write(json_data)
+def url_prefix(url):
+    """Return the scheme://host[:port]/ part of url"""
+
+    (scheme, rest) = url.split("://", 1)
+    return "%s://%s/" % (scheme, rest.split("/", 1)[0], )
+
+
+_DEFAULT_STORE = []
+_DEFAULT_STORE_LOCK = threading.Lock()
+
+
+def default_response_store():
+    """Return the process wide store of recorded responses"""
+
+    with _DEFAULT_STORE_LOCK:
+        if not _DEFAULT_STORE:
+            filename = os.path.join(private_directory(CACHE_DIR),
+                                    "responses.db")
+            store = ResponseStore(filename)
+            # Save when the responses of this run were last used
+            atexit.register(store.flush)
+            _DEFAULT_STORE.append(store)
+        return _DEFAULT_STORE[0]
+
+
+def filter_control_items(items, filter_list, verbose=False):
+    """Group enumerated /org/openbmc/control items by filter entry
+
+    items is an Inventory or (item_key, item_value) pairs.  Returns
+    { ident: { filter: (item_key, item_value) } } where ident is whatever
+    follows the filter in item_key (for example "0" for
+    /org/openbmc/control/power0).
+    """
+
+    prefixes = [(fltr, OPENBMC_ROOT + fltr) for fltr in filter_list]
+
+    if isinstance(items, Inventory):
+        found = [(fltr, prefix, item)
+                 for (fltr, prefix) in prefixes
+                 for item in items.prefix(prefix)]
+    else:
+        # Indexing items which are only looked through once would cost
+        # more than one pass over them
+        found = [(fltr, prefix, (item_key, item_value))
+                 for (item_key, item_value) in items
+                 for (fltr, prefix) in prefixes
+                 if item_key.startswith(prefix)]
+
+    mappings = {}
+
+    for (fltr, prefix, (item_key, item_value)) in found:
+        if verbose:
+            print("Found:")
+            print(item_key)
+            print(item_value)
+
+        # Get the identity (the rest of the string)
+        ident = item_key[len(prefix):]
+        # Create a new map for the first time
+        if ident not in mappings:
+            mappings[ident] = {}
+        # Save both the full filename and map contents
+        mappings[ident][fltr] = (item_key, item_value)
+
+    return mappings
 
 
 class CachedSession(object):
-    """online or offline support for a requests.Session()"""
+    """online or offline support for a requests.Session()
+
+    Online, every response is recorded in store (by default the process
+    wide default_response_store()).  Offline, responses are replayed
+    from it instead of talking to the BMC.
+
+    A Cassette can be given as well.  Online it records every response
+    in order along with its latency, and offline responses are played
+    back from it rather than from the store.
+    """
 
-    def __init__(self, online):
-        self.session = requests.Session()
+    def __init__(self,
+                 online,
+                 store=None,
+                 cassette=None,
+                 pool_manager=None,
+                 circuit_breaker=None):
+        self.session = _requests().Session()
         self.online = online
+        if store is None:
+            store = default_response_store()
+        self.store = store
+        self.cassette = cassette
+        if pool_manager is None:
+            pool_manager = get_pool_manager()
+        self.pool_manager = pool_manager
+        if circuit_breaker is None:
+            circuit_breaker = get_circuit_breaker()
+        self.circuit_breaker = circuit_breaker
+        self.timeout = TIMEOUT
+        self.retries = RETRIES
+        self.retry_backoff = RETRY_BACKOFF
+        self.hedge_after = HEDGE_AFTER
+        # prefix -> the adapter mounted for it
+        self._mounted = {}
+
+    def _use_pool(self, url):
+        """Send requests for url's host through the shared pool"""
+
+        prefix = url_prefix(url)
+        adapter = self.pool_manager.adapter_for(prefix)
+        if self._mounted.get(prefix) is not adapter:
+            self.session.mount(prefix, adapter)
+            self._mounted[prefix] = adapter
+
+    def get_cookies(self):
+        """Return the session cookies as a dictionary"""
+
+        return _requests().utils.dict_from_cookiejar(self.session.cookies)
+
+    def set_cookies(self, cookies, domain=""):
+        """Replace the session cookies with the cookies dictionary
+
+        Giving the domain the BMC's own cookies are kept under lets the
+        next login replace them rather than add to them.
+        """
+
+        self.session.cookies.clear()
+        for (name, value) in cookies.items():
+            self.session.cookies.set_cookie(
+                _requests().cookies.create_cookie(name,
+                                                  value,
+                                                  domain=domain))
+
+    def _report(self, method, url, latency, status_code, **kwargs):
+        """Tell the request hooks about a request"""
+
+        report_request(method,
+                       url,
+                       latency,
+                       status_code,
+                       online=self.online,
+                       **kwargs)
+
+    def _send(self, method, url, data, verify, headers):
+        """Send the request, guarding against dead and slow BMCs
+
+        Every attempt is bounded by self.timeout.  GETs are idempotent,
+        so they are retried with jittered exponential backoff after a
+        transport error or a RETRY_STATUS_CODES answer, and may be
+        hedged.  POSTs are sent exactly once.
+        """
+
+        prefix = url_prefix(url)
+        self._use_pool(url)
+
+        attempts = 1
+        if method == "GET":
+            attempts += self.retries
+
+        for attempt in range(attempts):
+            if attempt > 0:
+                delay = min(RETRY_MAX_BACKOFF,
+                            self.retry_backoff * (2 ** (attempt - 1)))
+                time.sleep(random.uniform(0, delay))
+
+            self.circuit_breaker.before(prefix)
+
+            try:
+                if method == "GET" and self.hedge_after is not None:
+                    response = self._hedged_get(url, verify, headers)
+                else:
+                    response = self.session.request(method,
+                                                    url,
+                                                    data=data,
+                                                    verify=verify,
+                                                    headers=headers,
+                                                    timeout=self.timeout)
+            except (_requests().exceptions.ConnectionError,
+                    _requests().exceptions.Timeout):
+                # The request as a whole, not each attempt, counts
+                # against the BMC
+                if attempt == attempts - 1:
+                    self.circuit_breaker.failure(prefix)
+                    raise
+                continue
+
+            self.circuit_breaker.success(prefix)
+
+            if (response.status_code not in RETRY_STATUS_CODES or
+                    attempt == attempts - 1):
+                return response
+
+    def _hedged_get(self, url, verify, headers):
+        """GET url, sending a second copy if the first is slow to answer"""
+
+        answers = queue.Queue()
+
+        def attempt():
+            """Send one copy of the request"""
+            try:
+                answers.put((True, self.session.get(url,
+                                                    verify=verify,
+                                                    headers=headers,
+                                                    timeout=self.timeout)))
+            except Exception as ex:  # pylint: disable=broad-except
+                answers.put((False, ex))
+
+        def start():
+            """Start a copy in the background"""
+            thread = threading.Thread(target=attempt)
+            thread.daemon = True
+            thread.start()
+
+        start()
+        outstanding = 0
+        try:
+            (ok, value) = answers.get(timeout=self.hedge_after)
+        except queue.Empty:
+            start()
+            outstanding = 1
+            (ok, value) = answers.get()
+
+        # Use the other copy if the first one to finish failed
+        if not ok and outstanding:
+            (ok, value) = answers.get()
+
+        if not ok:
+            raise value
+
+        return value
 
     def post(self, url, data, verify, headers):
         """Replaces session.post()"""
@@ -175,23 +749,54 @@ class CachedSession(object):
         if DEBUG:
             print(msg)
 
-        filename = safe_filename(url)
-
         ret = None
 
+        start = time.time()
+
         if self.online:
-            response = self.session.post(url,
-                                         data=data,
-                                         verify=verify,
-                                         headers=headers)
+            try:
+                response = self._send("POST", url, data, verify, headers)
+            except Exception as ex:
+                self._report("POST",
+                             url,
+                             time.time() - start,
+                             None,
+                             error=type(ex).__name__)
+                raise
+            latency = time.time() - start
+            self._report("POST",
+                         url,
+                         latency,
+                         response.status_code,
+                         size=len(response.content))
 
             ret = CachedResponse(response)
+
+            self.store.put("POST",
+                           url,
+                           data,
+                           response.status_code,
+                           response.content)
+            if self.cassette is not None:
+                self.cassette.record("POST",
+                                     url,
+                                     data,
+                                     response.status_code,
+                                     response.content,
+                                     latency)
         else:
-            ret = load_response_from_file(filename,
-                                          url,
-                                          verify,
-                                          headers,
-                                          data)
+            if self.cassette is not None:
+                saved = self.cassette.play("POST", url, data)
+            else:
+                saved = self.store.get("POST", url, data)
+            self._report("POST",
+                         url,
+                         time.time() - start,
+                         saved[0] if saved is not None else None,
+                         cache="hit" if saved is not None else "miss",
+                         error=None if saved is not None else "NotRecorded")
+            if saved is not None:
+                ret = CachedResponse(*saved)
 
         if ret is None:
             raise Exception("Danger Will Robinson!")
@@ -200,17 +805,108 @@ class CachedSession(object):
         if DEBUG:
             print(msg)
 
-        if self.online:
-            write_response_to_file(filename,
-                                   url,
-                                   verify,
-                                   headers,
-                                   response.status_code,
-                                   response.json(),
-                                   data)
+        return ret
+
+    def put(self, url, data, verify, headers):
+        """PUT data, which may be a stream, to url
+
+        Uploads are neither recorded nor retried, so this only works
+        online.
+        """
+
+        msg = ("CachedSession:put:IN: url = %s, verify = %s,"
+               " headers = %s") % (url, verify, headers, )
+        if DEBUG:
+            print(msg)
+
+        if not self.online:
+            raise Exception("Uploads can not be replayed offline")
+
+        start = time.time()
+
+        try:
+            response = self._send("PUT", url, data, verify, headers)
+        except Exception as ex:
+            self._report("PUT",
+                         url,
+                         time.time() - start,
+                         None,
+                         error=type(ex).__name__)
+            raise
+        self._report("PUT",
+                     url,
+                     time.time() - start,
+                     response.status_code,
+                     size=len(response.content))
+
+        ret = CachedResponse(response)
+
+        msg = "CachedSession:put:OUT: ret = %s" % (ret, )
+        if DEBUG:
+            print(msg)
 
         return ret
 
+    def get_content(self, url, verify, headers):
+        """GET url and return (status_code, raw content) undecoded"""
+
+        msg = ("CachedSession:get_content:IN: url = %s, verify = %s,"
+               " headers = %s") % (url, verify, headers, )
+        if DEBUG:
+            print(msg)
+
+        saved = None
+        start = time.time()
+
+        if self.online:
+            try:
+                response = self._send("GET", url, None, verify, headers)
+            except Exception as ex:
+                self._report("GET",
+                             url,
+                             time.time() - start,
+                             None,
+                             error=type(ex).__name__)
+                raise
+            latency = time.time() - start
+            self._report("GET",
+                         url,
+                         latency,
+                         response.status_code,
+                         size=len(response.content))
+
+            saved = (response.status_code, response.content)
+
+            self.store.put("GET",
+                           url,
+                           None,
+                           response.status_code,
+                           response.content)
+            if self.cassette is not None:
+                self.cassette.record("GET",
+                                     url,
+                                     None,
+                                     response.status_code,
+                                     response.content,
+                                     latency)
+        else:
+            if self.cassette is not None:
+                saved = self.cassette.play_content("GET", url)
+            else:
+                saved = self.store.get_content("GET", url)
+            self._report("GET",
+                         url,
+                         time.time() - start,
+                         saved[0] if saved is not None else None,
+                         size=len(saved[1]) if saved is not None else None,
+                         cache="hit" if saved is not None else "miss",
+                         error=None if saved is not None else "NotRecorded")
+
+        if saved is None:
+            raise Exception("Danger Will Farrel!")
+
+        return saved
+
     def get(self, url, verify, headers):
         """Replaces session.get()"""
 
@@ -219,20 +915,25 @@ class CachedSession(object):
         if DEBUG:
             print(msg)
 
-        filename = safe_filename(url)
         ret = None
 
         if self.online:
-            response = self.session.get(url,
-                                        verify=verify,
-                                        headers=headers)
-
-            ret = CachedResponse(response)
+            (status_code, content) = self.get_content(url, verify, headers)
+            ret = CachedResponse(status_code, decode(content))
         else:
-            ret = load_response_from_file(filename,
-                                          url,
-                                          verify,
-                                          headers)
+            start = time.time()
+            if self.cassette is not None:
+                saved = self.cassette.play("GET", url)
+            else:
+                saved = self.store.get("GET", url)
+            self._report("GET",
+                         url,
+                         time.time() - start,
+                         saved[0] if saved is not None else None,
+                         cache="hit" if saved is not None else "miss",
+                         error=None if saved is not None else "NotRecorded")
+            if saved is not None:
+                ret = CachedResponse(*saved)
 
         if ret is None:
             raise Exception("Danger Will Farrel!")
@@ -241,19 +942,17 @@ class CachedSession(object):
         if DEBUG:
             print(msg)
 
-        if self.online:
-            write_response_to_file(filename,
-                                   url,
-                                   verify,
-                                   headers,
-                                   response.status_code,
-                                   response.json())
-
         return ret
 
 
 class CachedResponse(object):
-    """online or offline support for a session response object"""
+    """online or offline support for a session response object
+
+    Only status_code, json_struct and json() are offered, and __slots__
+    keeps every other attribute out without a per-instance __dict__.
+    """
+
+    __slots__ = ("status_code", "json_struct")
 
     def __init__(self, *args, **_):
         # args -- tuple of anonymous arguments
@@ -262,10 +961,12 @@ class CachedResponse(object):
         self.json_struct = None
 
         if len(args) == 1:
-            if isinstance(args[0], requests.models.Response):
+            if isinstance(args[0], _requests().models.Response):
                 response = args[0]
                 self.status_code = response.status_code
-                self.json_struct = response.json()
+                # Decode the bytes as they came, once, with the codec
+                # in use rather than through response.json()
+                self.json_struct = decode(response.content)
         elif len(args) == 2:
             if (isinstance(args[0],
                            int) and
@@ -277,21 +978,170 @@ class CachedResponse(object):
         if self.status_code is None or self.json_struct is None:
             raise Exception("ruhroh")
 
-    def __getattribute__(self, name):
-        # We may need to call the base's getattribute to return
-        # stuff we support because we are limiting what you can
-        # ask for here.
-        if name in ['status_code', 'json', 'json_struct']:
-            return object.__getattribute__(self, name)
-        else:
-            raise AttributeError(name)
-
     def json(self):
         """Return the JSON data"""
 
         return self.json_struct
 
 
+class PrivateJsonFile(object):
+    """A dictionary saved as JSON in a file only readable by the owner
+
+    Every change rewrites the file atomically.  One instance may be
+    shared between threads.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.filename, "r") as fp:
+                return json.loads(fp.read())
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _prune(self, contents):
+        """Drop stale entries from contents before it is saved"""
+
+        pass
+
+    def read(self, key):
+        """Return the entry saved under key or None"""
+
+        with self._lock:
+            return self._read().get(key)
+
+    def update(self, key, entry):
+        """Save entry under key (None removes it)"""
+
+        with self._lock:
+            contents = self._read()
+            self._prune(contents)
+            if entry is None:
+                contents.pop(key, None)
+            else:
+                contents[key] = entry
+            write_private_file(self.filename, json.dumps(contents))
+
+
+class SessionCache(PrivateJsonFile):
+    """Login session cookies saved between runs
+
+    Sessions are kept per (hostname, user) in a file only readable by
+    the owner and are forgotten after ttl seconds.  Passwords are never
+    saved, only a salted hash of the credentials a session was opened
+    with, so that a run with another password logs in itself instead of
+    riding on the saved session.
+    """
+
+    def __init__(self, filename=None, ttl=DEFAULT_SESSION_TTL):
+        if filename is None:
+            filename = os.path.join(CACHE_DIR, "sessions.json")
+        super(SessionCache, self).__init__(filename)
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(hostname, user):
+        return "%s@%s" % (user, hostname, )
+
+    @staticmethod
+    def _credentials(hostname, user, password, salt):
+        # Python 2 passes the command line as bytes, which must not be
+        # decoded as ASCII along the way
+        parts = []
+        for part in (salt, hostname, user, password):
+            if not isinstance(part, bytes):
+                part = part.encode("utf-8")
+            parts.append(part)
+        return hashlib.sha256(b"\0".join(parts)).hexdigest()
+
+    def _prune(self, contents):
+        now = time.time()
+        for (key, entry) in list(contents.items()):
+            if entry["expires"] < now:
+                del contents[key]
+
+    def load(self, hostname, user, password):
+        """Return the saved cookies for hostname and user or None
+
+        None is returned as well when the session was opened with a
+        different password.
+        """
+
+        entry = self.read(self._key(hostname, user))
+
+        if entry is None or entry["expires"] < time.time():
+            return None
+
+        # Sessions saved before credentials were checked have no salt
+        salt = entry.get("salt")
+        if salt is None:
+            return None
+        if entry["credentials"] != self._credentials(hostname,
+                                                     user,
+                                                     password,
+                                                     salt):
+            return None
+
+        return entry["cookies"]
+
+    def save(self, hostname, user, password, cookies):
+        """Save the cookies of a fresh login with password"""
+
+        salt = binascii.hexlify(os.urandom(16)).decode("ascii")
+        entry = {"cookies": cookies,
+                 "expires": time.time() + self.ttl,
+                 "salt": salt,
+                 "credentials": self._credentials(hostname,
+                                                  user,
+                                                  password,
+                                                  salt)}
+        self.update(self._key(hostname, user), entry)
+
+    def forget(self, hostname, user):
+        """Remove any saved session for hostname and user"""
+
+        self.update(self._key(hostname, user), None)
+
+
+class TopologyCache(PrivateJsonFile):
+    """Object paths of each host's control hardware saved between runs
+
+    Remembers where the power, chassis and bmc objects live under
+    /org/openbmc/control for each hostname along with the firmware
+    version they were found on, so that power operations can go straight
+    to the right object instead of enumerating the control tree first.
+    """
+
+    def __init__(self, filename=None):
+        if filename is None:
+            filename = os.path.join(CACHE_DIR, "topology.json")
+        super(TopologyCache, self).__init__(filename)
+
+    def load(self, hostname):
+        """Return (version, { ident: { filter: path } }) or None"""
+
+        entry = self.read(hostname)
+
+        if entry is None:
+            return None
+
+        return (entry["version"], entry["mappings"])
+
+    def save(self, hostname, version, mappings):
+        """Remember the control object paths found on hostname"""
+
+        self.update(hostname, {"version": version,
+                               "mappings": mappings})
+
+    def forget(self, hostname):
+        """Forget what was remembered about hostname"""
+
+        self.update(hostname, None)
+
+
 class OpenBMC(object):
     """Operations against a controller running OpenBMC"""
 
@@ -299,20 +1149,56 @@ class OpenBMC(object):
                  hostname,
                  user,
                  password,
-                 online):
-        self.session = None
+                 online,
+                 session_cache=None,
+                 topology_cache=None,
+                 store=None,
+                 cassette=None):
         self.hostname = hostname
         self.verbose = False
-
-        session = CachedSession(online)
-
-        # Log in with a special URL and JSON data structure
-        url = "https://%s/login" % (hostname, )
-        login_data = json.dumps({"data": [user, password]})
-        response = session.post(url,
-                                data=login_data,
-                                verify=False,
-                                headers=JSON_HEADERS)
+        self.session = CachedSession(online, store=store, cassette=cassette)
+        self.session_cache = None
+        self.topology_cache = None
+        self.control_cache_ttl = DEFAULT_CONTROL_CACHE_TTL
+        self._control_items = None
+        self._control_time = None
+        self._inventories = {}
+        self._user = user
+        self._password = password
+        # Threads sharing this instance log in again one at a time
+        self._login_lock = threading.Lock()
+        self._logins = 0
+        # Whether the firmware version has been checked since logging in
+        self._firmware_checked = True
+
+        # Remembered paths would change which requests are made, and
+        # those must match what was recorded when replaying offline.
+        if online:
+            self.topology_cache = topology_cache
+
+        # Saved sessions only make sense against a live BMC
+        if online and session_cache is not None:
+            self.session_cache = session_cache
+
+            cookies = session_cache.load(hostname, user, password)
+            if cookies is not None:
+                # If the BMC has since dropped the session then the first
+                # request is rejected and we log in again at that point.
+                self.session.set_cookies(cookies,
+                                         domain=hostname.split(":")[0])
+                return
+
+        self._login()
+
+    def _login(self):
+        """Log in with a special URL and JSON data structure"""
+
+        url = "https://%s/login" % (self.hostname, )
+        login_data = json.dumps({"data": [self._user, self._password]})
+        response = self.session.post(url,
+                                     data=login_data,
+                                     verify=False,
+                                     headers=JSON_HEADERS)
 
         if response.status_code != 200:
             err_str = ("Error: Response code to login is not 200!"
@@ -323,7 +1209,106 @@ class OpenBMC(object):
                             response.status_code,
                             data=login_data)
 
-        self.session = session
+        self._logins += 1
+
+        if self.session_cache is not None:
+            self.session_cache.save(self.hostname,
+                                    self._user,
+                                    self._password,
+                                    self.session.get_cookies())
+
+        # A new session may mean the BMC rebooted into different
+        # firmware, which can move the control objects around.  That is
+        # checked the next time the remembered paths are about to be used.
+        self._firmware_checked = False
+
+    def _relogin(self, logins=None):
+        """Log in again after the BMC rejected our session
+
+        logins is how many logins there had been when the rejected
+        request was sent.  If another thread has logged in since then
+        its session is used instead of logging in once more.
+        """
+
+        with self._login_lock:
+            if logins is not None and logins != self._logins:
+                return
+
+            # A saved session loaded under a different domain than the
+            # BMC gives its cookie would otherwise be sent alongside the
+            # new one.
+            self.session.set_cookies({})
+            self._login()
+
+    def _check_firmware_version(self):
+        """Forget the remembered topology if the firmware has changed"""
+
+        saved = self.topology_cache.load(self.hostname)
+        if saved is None:
+            return
+
+        url = "https://%s%s" % (self.hostname, FIRMWARE_VERSION_PATH, )
+        response = self.session.get(url,
+                                    verify=False,
+                                    headers=JSON_HEADERS)
+
+        version = None
+        if response.status_code == 200:
+            version = response.json()["data"].get("version")
+
+        if version != saved[0]:
+            self.topology_cache.forget(self.hostname)
+
+    def _session_get(self, url):
+        """GET url, logging in again if the BMC rejects our session"""
+
+        logins = self._logins
+        response = self.session.get(url,
+                                    verify=False,
+                                    headers=JSON_HEADERS)
+
+        if response.status_code == 401:
+            self._relogin(logins)
+            response = self.session.get(url,
+                                        verify=False,
+                                        headers=JSON_HEADERS)
+
+        return response
+
+    def _session_get_content(self, url):
+        """GET url undecoded, logging in again if the session is rejected"""
+
+        logins = self._logins
+        (status_code, content) = self.session.get_content(url,
+                                                          verify=False,
+                                                          headers=JSON_HEADERS)
+
+        if status_code == 401:
+            self._relogin(logins)
+            (status_code, content) = self.session.get_content(
+                url,
+                verify=False,
+                headers=JSON_HEADERS)
+
+        return (status_code, content)
+
+    def _session_post(self, url, jdata):
+        """POST url, logging in again if the BMC rejects our session"""
+
+        logins = self._logins
+        response = self.session.post(url,
+                                     data=jdata,
+                                     verify=False,
+                                     headers=JSON_HEADERS)
+
+        if response.status_code == 401:
+            self._relogin(logins)
+            response = self.session.post(url,
+                                         data=jdata,
+                                         verify=False,
+                                         headers=JSON_HEADERS)
+
+        return response
 
     def set_verbose(self, value):
         """Set the verbosity to value"""
@@ -331,8 +1316,168 @@ class OpenBMC(object):
         self.verbose = value
         set_debug(value)
 
+    def set_control_cache_ttl(self, value):
+        """Reuse /org/openbmc/control enumerations for value seconds
+
+        0 turns the cache off and None keeps entries until they are
+        invalidated.
+        """
+
+        self.control_cache_ttl = value
+
+    def invalidate_control_cache(self):
+        """Forget the cached /org/openbmc/control enumeration"""
+
+        self._control_items = None
+        self._control_time = None
+
+    def invalidate_inventory(self):
+        """Forget the inventories get_inventory() has built"""
+
+        self._inventories = {}
+
+    def get_inventory(self, key=INVENTORY_PATH, refresh=False):
+        """Return an Inventory of everything under key
+
+        It is built on the first call and shared by later ones, unless
+        refresh is True or the power has been switched or the BMC reset
+        since.
+        """
+
+        if refresh or key not in self._inventories:
+            self._inventories[key] = Inventory(self.iter_enumerate(key))
+
+        return self._inventories[key]
+
+    def get_frus(self, key=INVENTORY_PATH):
+        """Return a compact Fru record for every FRU under key
+
+        The enumeration is streamed, so only the records are ever held.
+        """
+
+        return frus(self.iter_enumerate(key))
+
+    def get_control_records(self):
+        """Return a PowerControl or Chassis record for each control object
+
+        Unlike the power operations this always asks the BMC.
+        """
+
+        prefixes = tuple(prefix for (prefix, _) in CONTROL_RECORDS)
+        return control_records(self.iter_enumerate("/org/openbmc/control/",
+                                                   prefix=prefixes))
+
+    def get_event_records(self):
+        """Return an Event record for every event log entry, oldest first"""
+
+        return events(self.iter_enumerate(EVENTS_PATH))
+
+    def _enumerate_control(self, refresh=False):
+        """Enumerate /org/openbmc/control, reusing a recent answer"""
+
+        if refresh or self.control_cache_ttl == 0:
+            self.invalidate_control_cache()
+
+        if self._control_items is not None:
+            age = time.time() - self._control_time
+            if self.control_cache_ttl is None or age < self.control_cache_ttl:
+                if self.verbose:
+                    print("Reusing /org/openbmc/control from %.1fs ago" % (
+                        age, ))
+                return self._control_items
+
+        # Only the control objects we act on, and the firmware version
+        # the topology cache is keyed on, are worth decoding
+        prefixes = tuple(OPENBMC_ROOT + fltr for fltr in TOPOLOGY_FILTERS)
+        items = Inventory(self.iter_enumerate(
+            "/org/openbmc/control/",
+            match=lambda path: (path == FIRMWARE_VERSION_PATH or
+                                path.startswith(prefixes))))
+
+        self._control_items = items
+        self._control_time = time.time()
+
+        if self.topology_cache is not None:
+            self._remember_topology(items)
+
+        return items
+
+    def _remember_topology(self, items):
+        """Save the control object paths found in items if they changed"""
+
+        version = items.get(FIRMWARE_VERSION_PATH, {}).get("version")
+
+        mappings = {}
+        found = filter_control_items(items, TOPOLOGY_FILTERS)
+        for (ident, ident_mappings) in found.items():
+            mappings[ident] = {}
+            for (fltr, (item_key, _)) in ident_mappings.items():
+                mappings[ident][fltr] = item_key
+
+        if self.topology_cache.load(self.hostname) != (version, mappings):
+            self.topology_cache.save(self.hostname, version, mappings)
+
+    def _control_topology(self, filter_list, refresh=False):
+        """Find the control objects in filter_list
+
+        Returns (mappings, remembered) where mappings is laid out like the
+        result of _filter_org_openbmc_control.  When the paths come from
+        the topology cache remembered is True and the object contents are
+        None, since nothing was fetched.
+        """
+
+        if self.topology_cache is not None and not refresh:
+            if not self._firmware_checked:
+                self._firmware_checked = True
+                self._check_firmware_version()
+
+            saved = self.topology_cache.load(self.hostname)
+            if saved is not None:
+                (_, saved_mappings) = saved
+
+                mappings = {}
+                for (ident, ident_mappings) in saved_mappings.items():
+                    for fltr in filter_list:
+                        if fltr in ident_mappings:
+                            if ident not in mappings:
+                                mappings[ident] = {}
+                            mappings[ident][fltr] = (ident_mappings[fltr],
+                                                     None)
+
+                return (mappings, True)
+
+        return (self._filter_org_openbmc_control(filter_list, refresh),
+                False)
+
+    def _with_control_topology(self, filter_list, do):
+        """Call do(mappings) on the control objects in filter_list
+
+        If remembered object paths turn out to be gone (404) then the
+        control tree is discovered again and do is called once more.
+        """
+
+        (mappings, remembered) = self._control_topology(filter_list)
+
+        try:
+            return do(mappings)
+        except HTTPError as ex:
+            if not remembered or ex.get_status_code() != 404:
+                raise
+
+        if self.verbose:
+            print("Rediscovering /org/openbmc/control on %s" % (
+                self.hostname, ))
+
+        self.topology_cache.forget(self.hostname)
+        (mappings, _) = self._control_topology(filter_list, refresh=True)
+
+        return do(mappings)
+
     def enumerate(self, key):
-        """Enumerate the provided key"""
+        """Enumerate the provided key
+
+        As with get(), copy the result before changing it.
+        """
 
         if key.startswith("/"):
             path = key[1:]
@@ -346,8 +1491,48 @@ class OpenBMC(object):
 
         return self.get(path)
 
+    def iter_enumerate(self, key, prefix=None, suffix=None, match=None):
+        """Yield (path, properties) for everything under the provided key
+
+        Unlike enumerate() the response is decoded a piece at a time and
+        only the paths starting with prefix, ending with suffix and
+        accepted by match(path) (each may be left out) are built, so
+        large trees can be searched without holding all of them.
+        """
+
+        if key.startswith("/"):
+            path = key[1:]
+        else:
+            path = key
+
+        if path.endswith("/"):
+            path = path + "enumerate"
+        else:
+            path = path + "/enumerate"
+
+        url = "https://%s/%s" % (self.hostname, path, )
+
+        if self.verbose:
+            print("GET %s" % (url, ))
+
+        (status_code, content) = self._session_get_content(url)
+
+        if status_code != 200:
+            err_str = ("Error: Response code to get %s enumerate is not 200!"
+                       " (%d)" % (key, status_code, ))
+            print(err_str, file=sys.stderr)
+
+            raise HTTPError(url, status_code)
+
+        return iter_members(iter_chunks(content),
+                            want=path_matcher(prefix, suffix, match))
+
     def get(self, key):
-        """Get the value for the provided key"""
+        """Get the value for the provided key
+
+        Offline, the value is shared with every other caller replaying
+        the same response from the store, so copy it before changing it.
+        """
 
         if key.startswith("/"):
             path = key[1:]
@@ -359,9 +1544,7 @@ class OpenBMC(object):
         if self.verbose:
             print("GET %s" % (url, ))
 
-        response = self.session.get(url,
-                                    verify=False,
-                                    headers=JSON_HEADERS)
+        response = self._session_get(url)
 
         if response.status_code != 200:
             err_str = ("Error: Response code to get %s enumerate is not 200!"
@@ -372,14 +1555,21 @@ class OpenBMC(object):
 
         return response.json()["data"]
 
-    def _filter_org_openbmc_control(self, filter_list):
-        """Filter /org/openbmc/control against the provided filter list"""
+    def _filter_org_openbmc_control(self, filter_list, refresh=False):
+        """Filter /org/openbmc/control against the provided filter list
 
-        # Enumerate the inventory of the system's control hardware
-        mappings = {}
+        A recent enumeration is reused unless refresh is True.
+        """
 
+        # Enumerate the inventory of the system's control hardware
         try:
-            items = self.enumerate("/org/openbmc/control/").items()
+            if all(fltr in TOPOLOGY_FILTERS for fltr in filter_list):
+                items = self._enumerate_control(refresh)
+            else:
+                # The cached enumeration only holds TOPOLOGY_FILTERS
+                prefixes = tuple(OPENBMC_ROOT + fltr for fltr in filter_list)
+                items = self.iter_enumerate("/org/openbmc/control/",
+                                            prefix=prefixes)
         except HTTPError as ex:
             if ex.get_status_code() == 404:
                 # @BUG
@@ -390,35 +1580,16 @@ class OpenBMC(object):
             else:
                 raise
 
-        # Loop through the returned map items
-        for (item_key, item_value) in items:
-            # We only care about filter entries
-            if not any(x in item_key for x in filter_list):
-                continue
-
-            if self.verbose:
-                print("Found:")
-                print(item_key)
-                print(item_value)
-
-            # Add the entry into our mappings
-            for fltr in filter_list:
-                idx = item_key.find(fltr)
-                if idx > -1:
-                    # Get the identity (the rest of the string)
-                    ident = item_key[idx+len(fltr):]
-                    # Create a new map for the first time
-                    if ident not in mappings:
-                        mappings[ident] = {}
-                    # Save both the full filename and map contents
-                    mappings[ident][fltr] = (item_key, item_value)
-
-        return mappings
+        return filter_control_items(items, filter_list, self.verbose)
 
     def _power_common(self, with_state_do):
         # Query /org/openbmc/control for power and chassis entries
         filter_list = ["control/power", "control/chassis"]
-        mappings = self._filter_org_openbmc_control(filter_list)
+        return self._with_control_topology(
+            filter_list,
+            lambda mappings: self._power_mappings(mappings, with_state_do))
+
+    def _power_mappings(self, mappings, with_state_do):
         if mappings is None:
             return False
 
@@ -445,6 +1616,10 @@ class OpenBMC(object):
             (power_url, power_mapping) = ident_mappings["control/power"]
             (chassis_url, _) = ident_mappings["control/chassis"]
 
+            if power_mapping is None:
+                # Only the path was remembered, so fetch just this object
+                power_mapping = self.get(power_url)
+
             if self.verbose:
                 msg = "Current state of %s is %s" % (power_url,
                                                      power_mapping["state"], )
@@ -460,10 +1635,12 @@ class OpenBMC(object):
             if self.verbose:
                 print("POST %s with %s" % (url, jdata, ))
 
-            response = self.session.post(url,
-                                         data=jdata,
-                                         verify=False,
-                                         headers=JSON_HEADERS)
+            response = self._session_post(url, jdata)
+
+            # The action changes what the control tree and the
+            # inventory say
+            self.invalidate_control_cache()
+            self.invalidate_inventory()
 
             if response.status_code != 200:
                 err_str = ("Error: Response code to PUT is not 200!"
@@ -524,7 +1701,10 @@ class OpenBMC(object):
 
         # Query /org/openbmc/control for power and chassis entries
         filter_list = ["control/chassis"]
-        mappings = self._filter_org_openbmc_control(filter_list)
+        return self._with_control_topology(filter_list,
+                                           self._get_power_state_mappings)
+
+    def _get_power_state_mappings(self, mappings):
         if mappings is None:
             return False
 
@@ -540,10 +1720,7 @@ class OpenBMC(object):
             if self.verbose:
                 print("POST %s with %s" % (url, jdata, ))
 
-            response = self.session.post(url,
-                                         data=jdata,
-                                         verify=False,
-                                         headers=JSON_HEADERS)
+            response = self._session_post(url, jdata)
 
             if response.status_code != 200:
                 err_str = ("Error: Response code to PUT is not 200!"
@@ -560,7 +1737,10 @@ class OpenBMC(object):
         """Force a warm reset"""
 
         filter_list = ["control/bmc"]
-        mappings = self._filter_org_openbmc_control(filter_list)
+        return self._with_control_topology(filter_list,
+                                           self._warm_reset_mappings)
+
+    def _warm_reset_mappings(self, mappings):
         if mappings is None:
             return False
 
@@ -576,10 +1756,12 @@ class OpenBMC(object):
             if self.verbose:
                 print("POST %s with %s" % (url, jdata, ))
 
-            response = self.session.post(url,
-                                         data=jdata,
-                                         verify=False,
-                                         headers=JSON_HEADERS)
+            response = self._session_post(url, jdata)
+
+            # The action changes what the control tree and the
+            # inventory say
+            self.invalidate_control_cache()
+            self.invalidate_inventory()
 
             if response.status_code != 200:
                 err_str = ("Error: Response code to PUT is not 200!"
@@ -593,7 +1775,66 @@ class OpenBMC(object):
     def get_flash_bios(self):
         """Get the flash BIOS"""
 
-        return self.get("/org/openbmc/control/flash/bios")
+        return self.get(FLASH_BIOS_PATH)
+
+    def upload_image(self, image, name):
+        """Upload a firmware image as name; return where the BMC put it
+
+        image is bytes or a stream with a length, such as a
+        Firmware.FirmwareImage's stream(), which is sent as it is read.
+        """
+
+        url = "https://%s%s%s" % (self.hostname, UPLOAD_PATH, name, )
+
+        if self.verbose:
+            print("PUT %s" % (url, ))
+
+        logins = self._logins
+        response = self.session.put(url,
+                                    image,
+                                    verify=False,
+                                    headers=IMAGE_HEADERS)
+
+        if response.status_code == 401 and hasattr(image, "seek"):
+            self._relogin(logins)
+            image.seek(0)
+            response = self.session.put(url,
+                                        image,
+                                        verify=False,
+                                        headers=IMAGE_HEADERS)
+
+        if response.status_code != 200:
+            err_str = ("Error: Response code to PUT is not 200!"
+                       " (%d)" % (response.status_code, ))
+            print(err_str, file=sys.stderr)
+
+            raise HTTPError(url, response.status_code)
+
+        return response.json()["data"]
+
+    def update_flash_bios(self, filename):
+        """Start flashing the BIOS from an uploaded image
+
+        The progress shows in get_flash_bios()["status"].
+        """
+
+        url = "https://%s%s/action/update" % (self.hostname,
+                                              FLASH_BIOS_PATH, )
+        jdata = json.dumps({"data": [filename]})
+
+        if self.verbose:
+            print("POST %s with %s" % (url, jdata, ))
+
+        response = self._session_post(url, jdata)
+
+        if response.status_code != 200:
+            err_str = ("Error: Response code to PUT is not 200!"
+                       " (%d)" % (response.status_code, ))
+            print(err_str, file=sys.stderr)
+
+            raise HTTPError(url, response.status_code, data=jdata)
+
+        return True
 
     def get_bmc_state(self):
         """Get the state of the OpenBMC controller"""
@@ -606,10 +1847,7 @@ class OpenBMC(object):
         if self.verbose:
             print("POST %s with %s" % (url, jdata, ))
 
-        response = self.session.post(url,
-                                     data=jdata,
-                                     verify=False,
-                                     headers=JSON_HEADERS)
+        response = self._session_post(url, jdata)
 
         if response.status_code != 200:
             err_str = ("Error: Response code to PUT is not 200!"
@@ -619,3 +1857,41 @@ class OpenBMC(object):
             raise HTTPError(url, response.status_code, data=jdata)
 
         return response.json()["data"]
+
+    def wait_for_power_state(self, state, timeout, **kwargs):
+        """Wait up to timeout seconds for the power state to become state
+
+        Returns True if it did.  Extra arguments tune the polling, see
+        StateWaiter.
+        """
+
+        def check():
+            """Poll even while the circuit breaker has given up on the BMC"""
+            with self.session.circuit_breaker.bypassed():
+                return self.get_power_state()
+
+        result = wait_until(check,
+                            lambda value: value == state,
+                            timeout,
+                            **kwargs)
+
+        return result.reached
+
+    def wait_for_bmc_state(self, state, timeout, **kwargs):
+        """Wait up to timeout seconds for the BMC state to become state
+
+        Returns True if it did.  Extra arguments tune the polling, see
+        StateWaiter.
+        """
+
+        def check():
+            """Poll even while the circuit breaker has given up on the BMC"""
+            with self.session.circuit_breaker.bypassed():
+                return self.get_bmc_state()
+
+        result = wait_until(check,
+                            lambda value: value == state,
+                            timeout,
+                            **kwargs)
+
+        return result.reached
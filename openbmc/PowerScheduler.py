@@ -0,0 +1,378 @@
+#!/usr/bin/env python
+
+"""
+Switch the power of many OpenBMC controllers in waves, within a budget.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-instance-attributes
+# pylint: disable=broad-except
+# What is with [invalid-name] Invalid variable name "fp"
+# pylint: disable=invalid-name
+
+from __future__ import print_function
+
+import json
+import os
+import threading
+import time
+
+from openbmc.Fleet import run_fleet
+
+# How many hosts may be switching at once
+DEFAULT_CONCURRENCY = 8
+
+# How long one host may take, from its first attempt to its last check
+DEFAULT_DEADLINE = 600
+
+# Seconds before the first retry of a host, doubled for each later one
+DEFAULT_RETRY_DELAY = 5
+
+
+def _power_on(ob):
+    return ob.power_on()
+
+
+def _power_off(ob):
+    return ob.power_off()
+
+
+def _warm_reset(ob):
+    return ob.trigger_warm_reset()
+
+
+# name -> (the action, the power state which shows it worked or None)
+OPERATIONS = {"on": (_power_on, 1),
+              "off": (_power_off, 0),
+              "reset": (_warm_reset, None)}
+
+# Operations which must not be sent again after an attempt raised, as
+# the BMC may have acted on the first one before the error
+NOT_IDEMPOTENT = frozenset(["reset"])
+
+
+class _MaybeSent(Exception):
+    """The action raised after possibly reaching the BMC"""
+
+
+class PowerResult(object):
+    """How an operation went on one host"""
+
+    def __init__(self,
+                 hostname,
+                 operation,
+                 ok,
+                 attempts=0,
+                 error=None,
+                 elapsed=0.0,
+                 skipped=False):
+        self.hostname = hostname
+        self.operation = operation
+        self.ok = ok
+        self.attempts = attempts
+        self.error = error
+        self.elapsed = elapsed
+        self.skipped = skipped
+
+    def __repr__(self):
+        return "PowerResult(%s, %s, ok=%s, attempts=%d, error=%s)" % (
+            self.hostname,
+            self.operation,
+            self.ok,
+            self.attempts,
+            self.error, )
+
+    def to_dict(self):
+        """Return the result as a JSON serializable dictionary"""
+
+        result = {"hostname": self.hostname,
+                  "operation": self.operation,
+                  "ok": self.ok,
+                  "attempts": self.attempts,
+                  "elapsed": self.elapsed}
+        if self.error is not None:
+            result["error"] = self.error
+        if self.skipped:
+            result["skipped"] = True
+        return result
+
+
+class PowerJournal(object):
+    """The results of a rollout, appended to a file as they come in
+
+    One JSON object is written per line and synced to disk, so that a
+    rollout which is interrupted can be started again and skip the
+    hosts which it already finished.  One instance may be shared between
+    threads.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()
+
+    def finished(self, operation):
+        """Return the hostnames which operation succeeded on"""
+
+        hostnames = set()
+        try:
+            with open(self.filename, "r") as fp:
+                for line in fp:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # The last line of an interrupted run
+                        continue
+                    if entry.get("operation") == operation:
+                        if entry.get("ok"):
+                            hostnames.add(entry["hostname"])
+                        else:
+                            hostnames.discard(entry["hostname"])
+        except (IOError, OSError):
+            pass
+        return hostnames
+
+    def record(self, result):
+        """Append result"""
+
+        line = json.dumps(dict(result.to_dict(), time=time.time())) + "\n"
+        with self._lock:
+            with open(self.filename, "ab+") as fp:
+                # Finish off a line an interrupted run left half written,
+                # rather than losing this result by appending to it
+                fp.seek(0, os.SEEK_END)
+                if fp.tell() > 0:
+                    fp.seek(-1, os.SEEK_END)
+                    if fp.read(1) != b"\n":
+                        line = "\n" + line
+                fp.write(line.encode("utf-8"))
+                fp.flush()
+                os.fsync(fp.fileno())
+
+
+class PowerScheduler(object):
+    """Run a power operation across many hosts without tripping the budget
+
+    connect(hostname) returns a logged in OpenBMC, and operation is one
+    of OPERATIONS.  Hosts are taken wave_size at a time (all at once when
+    None) and a wave only starts once the one before has finished, and
+    wave_pause seconds have passed.  Within a wave at most concurrency
+    hosts are being worked on, and no two actions, retries included,
+    start less than start_interval seconds apart across the rollout.
+
+    For on and off the power state is then polled until it changes.  A
+    host which fails is tried again up to retries times, after
+    retry_delay seconds and twice as long each time after that, as long
+    as its deadline (seconds since its first attempt) has not passed.
+    A reset which raised is not retried, since it may have been carried
+    out.  Once more than max_failures hosts have failed no new host is
+    started, in this wave or any later one.  The hosts in journal which
+    already succeeded are skipped.
+    """
+
+    def __init__(self,
+                 connect,
+                 operation,
+                 concurrency=DEFAULT_CONCURRENCY,
+                 wave_size=None,
+                 wave_pause=0,
+                 start_interval=0,
+                 deadline=DEFAULT_DEADLINE,
+                 retries=0,
+                 retry_delay=DEFAULT_RETRY_DELAY,
+                 max_failures=None,
+                 journal=None):
+        if operation not in OPERATIONS:
+            raise ValueError("Unknown operation %s" % (operation, ))
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1 (%s)" % (
+                concurrency, ))
+        if wave_size is not None and wave_size < 1:
+            raise ValueError("wave_size must be at least 1 (%s)" % (
+                wave_size, ))
+        self.connect = connect
+        self.operation = operation
+        self.concurrency = concurrency
+        self.wave_size = wave_size
+        self.wave_pause = wave_pause
+        self.start_interval = start_interval
+        self.deadline = deadline
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.max_failures = max_failures
+        self.journal = journal
+        self._start_lock = threading.Lock()
+        self._next_start = 0.0
+        self._failures_lock = threading.Lock()
+        self._failures = 0
+
+    def _failed(self):
+        """Count one more host as failed"""
+
+        with self._failures_lock:
+            self._failures += 1
+
+    def _too_many_failures(self):
+        return (self.max_failures is not None and
+                self._failures > self.max_failures)
+
+    def _not_started(self, hostname):
+        return PowerResult(hostname,
+                           self.operation,
+                           False,
+                           error="not started after %d failures" % (
+                               self._failures, ),
+                           skipped=True)
+
+    def _wait_to_start(self, give_up):
+        """Wait for this action's turn; return False if give_up comes first"""
+
+        with self._start_lock:
+            start = max(time.time(), self._next_start)
+            if start > give_up:
+                return False
+            self._next_start = start + self.start_interval
+
+        delay = start - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+    def _attempt(self, hostname, give_up):
+        """Do the operation once; return None or what went wrong"""
+
+        (action, state) = OPERATIONS[self.operation]
+
+        ob = self.connect(hostname)
+
+        if not self._wait_to_start(give_up):
+            return "deadline passed waiting to start"
+
+        try:
+            done = action(ob)
+        except Exception as ex:
+            if self.operation in NOT_IDEMPOTENT:
+                raise _MaybeSent("%s" % (ex, ))
+            raise
+
+        if not done:
+            # power_on() and power_off() do nothing to a machine which is
+            # already in that state
+            if state is None or ob.get_power_state() != state:
+                return "%s failed" % (self.operation, )
+            return None
+
+        if state is not None:
+            remaining = give_up - time.time()
+            if not ob.wait_for_power_state(state, max(remaining, 0)):
+                return "timed out waiting for power %s" % (self.operation, )
+
+        return None
+
+    def _run_host(self, hostname):
+        """Do the operation on hostname, retrying until the deadline"""
+
+        if self._too_many_failures():
+            return self._not_started(hostname)
+
+        start = time.time()
+        give_up = start + self.deadline
+        attempts = 0
+        error = None
+
+        while True:
+            attempts += 1
+            try:
+                error = self._attempt(hostname, give_up)
+            except _MaybeSent as ex:
+                error = "%s" % (ex, )
+                break
+            except Exception as ex:
+                error = "%s" % (ex, )
+
+            if error is None or attempts > self.retries:
+                break
+
+            delay = self.retry_delay * 2 ** (attempts - 1)
+            if time.time() + delay >= give_up:
+                break
+            time.sleep(delay)
+
+        if error is not None:
+            self._failed()
+
+        return PowerResult(hostname,
+                           self.operation,
+                           error is None,
+                           attempts=attempts,
+                           error=error,
+                           elapsed=time.time() - start)
+
+    def _waves(self, hostnames):
+        size = self.wave_size or max(len(hostnames), 1)
+        return [hostnames[i:i + size]
+                for i in range(0, len(hostnames), size)]
+
+    def run(self, hostnames):
+        """Run the operation on every host, yielding each PowerResult
+
+        Results come back as the hosts finish.  Hosts the journal shows
+        as done are yielded straight away as skipped, and so are those
+        never started because too many failed.
+        """
+
+        finished = set()
+        if self.journal is not None:
+            finished = self.journal.finished(self.operation)
+
+        todo = []
+        for hostname in hostnames:
+            if hostname in finished:
+                yield PowerResult(hostname, self.operation, True,
+                                  skipped=True)
+            else:
+                todo.append(hostname)
+
+        self._failures = 0
+        waves = self._waves(todo)
+
+        for (number, wave) in enumerate(waves):
+            if self._too_many_failures():
+                for hostname in [hostname for rest in waves[number:]
+                                 for hostname in rest]:
+                    yield self._not_started(hostname)
+                return
+
+            if number > 0 and self.wave_pause:
+                time.sleep(self.wave_pause)
+
+            for fleet_result in run_fleet(wave,
+                                          self._run_host,
+                                          workers=min(self.concurrency,
+                                                      len(wave))):
+                if fleet_result.ok():
+                    result = fleet_result.value
+                else:
+                    self._failed()
+                    result = PowerResult(fleet_result.hostname,
+                                         self.operation,
+                                         False,
+                                         error=fleet_result.error,
+                                         elapsed=fleet_result.elapsed)
+
+                if self.journal is not None and not result.skipped:
+                    self.journal.record(result)
+
+                yield result
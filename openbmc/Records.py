@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+
+"""
+Compact records for the objects OpenBMC controllers report.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-few-public-methods
+# pylint: disable=too-many-instance-attributes
+
+from __future__ import print_function
+
+# Strings which recur across objects and hosts (property names, paths,
+# FRU types, model numbers) are kept once.  intern() cannot be used as
+# Python 2 refuses unicode strings.
+_INTERNED = {}
+
+
+def intern_string(value):
+    """Return the shared copy of the string value"""
+
+    return _INTERNED.setdefault(value, value)
+
+
+def _flag(value):
+    """Return a "True"/"False" flag as a boolean, or None"""
+
+    if value in (True, "True", "true", 1):
+        return True
+    if value in (False, "False", "false", 0):
+        return False
+    return None
+
+
+def _extra(properties, known):
+    """Return the properties not in known that have a value, or None"""
+
+    extra = None
+    for (name, value) in properties.items():
+        if name in known or value == "" or value is None:
+            continue
+        if extra is None:
+            extra = {}
+        extra[intern_string(name)] = value
+    return extra
+
+
+class Record(object):
+    """An object reported by the BMC, stored without a __dict__
+
+    Each subclass lists the properties it keeps in FIELDS, as
+    (property name, slot name, conversion) tuples.  Properties which are
+    missing or empty are left as None, and any other non-empty property
+    is kept in extra (None when there are none).
+    """
+
+    __slots__ = ("path", "extra")
+
+    FIELDS = ()
+
+    def __init__(self, path, **values):
+        self.path = intern_string(path)
+        self.extra = values.pop("extra", None)
+        for (_, slot, _) in self.FIELDS:
+            setattr(self, slot, values.pop(slot, None))
+        if values:
+            raise TypeError("Unknown fields %s" % (", ".join(values), ))
+
+    @classmethod
+    def from_properties(cls, path, properties):
+        """Build a record from a path and its enumerated properties"""
+
+        values = {}
+        known = set()
+        for (name, slot, convert) in cls.FIELDS:
+            known.add(name)
+            value = properties.get(name)
+            if value == "" or value is None:
+                continue
+            values[slot] = convert(value)
+
+        values["extra"] = _extra(properties, known)
+
+        return cls(path, **values)
+
+    def to_properties(self):
+        """Return the non-empty properties as a dictionary"""
+
+        properties = dict(self.extra or {})
+        for (name, slot, _) in self.FIELDS:
+            value = getattr(self, slot)
+            if value is not None:
+                properties[name] = value
+        return properties
+
+    def __eq__(self, other):
+        return (type(self) is type(other) and
+                self.path == other.path and
+                self.to_properties() == other.to_properties())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "%s(%r, %r)" % (type(self).__name__,
+                               self.path,
+                               self.to_properties(), )
+
+
+def _identity(value):
+    return value
+
+
+def _shared(value):
+    if isinstance(value, (type(u""), str)):
+        return intern_string(value.strip())
+    return value
+
+
+class PowerControl(Record):
+    """A /org/openbmc/control/powerN object"""
+
+    __slots__ = ("state", "pgood", "poll_interval", "pgood_timeout")
+
+    FIELDS = (("state", "state", int),
+              ("pgood", "pgood", int),
+              ("poll_interval", "poll_interval", int),
+              ("pgood_timeout", "pgood_timeout", int))
+
+
+class Chassis(Record):
+    """A /org/openbmc/control/chassisN object"""
+
+    __slots__ = ("uuid", "reboot")
+
+    FIELDS = (("uuid", "uuid", _identity),
+              ("reboot", "reboot", int))
+
+
+class Fru(Record):
+    """A field replaceable unit, such as a DIMM, from the inventory
+
+    present and fault are booleans, and model and serial numbers lose the
+    padding some FRUs report them with.
+    """
+
+    __slots__ = ("fru_type", "is_fru", "present", "fault", "model",
+                 "serial", "manufacturer", "name", "version")
+
+    FIELDS = (("fru_type", "fru_type", _shared),
+              ("is_fru", "is_fru", int),
+              ("present", "present", _flag),
+              ("fault", "fault", _flag),
+              ("Model Number", "model", _shared),
+              ("Serial Number", "serial", lambda value: value.strip()),
+              ("Manufacturer", "manufacturer", _shared),
+              ("Name", "name", _shared),
+              ("version", "version", _shared))
+
+    def to_properties(self):
+        properties = Record.to_properties(self)
+        # Put the flags back the way the BMC reports them
+        for name in ("present", "fault"):
+            if name in properties:
+                properties[name] = str(properties[name])
+        return properties
+
+
+class Event(Record):
+    """An event record from /org/openbmc/records/events"""
+
+    __slots__ = ("severity", "message", "time", "reported_by",
+                 "associations", "debug_data")
+
+    FIELDS = (("severity", "severity", _shared),
+              ("message", "message", _identity),
+              ("time", "time", _identity),
+              ("reported_by", "reported_by", _shared),
+              ("associations", "associations",
+               lambda value: tuple(tuple(_shared(item) for item in entry)
+                                   for entry in value)),
+              ("debug_data", "debug_data", bytearray))
+
+    def to_properties(self):
+        properties = Record.to_properties(self)
+        if "associations" in properties:
+            properties["associations"] = [list(entry) for entry
+                                          in properties["associations"]]
+        if "debug_data" in properties:
+            properties["debug_data"] = list(properties["debug_data"])
+        return properties
+
+
+# Which record each object under /org/openbmc/control becomes
+CONTROL_RECORDS = (("/org/openbmc/control/power", PowerControl),
+                   ("/org/openbmc/control/chassis", Chassis))
+
+
+def frus(items):
+    """Return a Fru for every FRU among (path, properties) items"""
+
+    return [Fru.from_properties(path, properties)
+            for (path, properties) in items
+            if isinstance(properties, dict) and "fru_type" in properties]
+
+
+def events(items):
+    """Return an Event for every event record among (path, properties) items
+
+    Event records are the paths ending in a number, in that order.
+    """
+
+    records = []
+    for (path, properties) in items:
+        ident = path.rstrip("/").rsplit("/", 1)[-1]
+        if ident.isdigit() and isinstance(properties, dict):
+            records.append((int(ident),
+                            Event.from_properties(path, properties)))
+    records.sort(key=lambda record: record[0])
+    return [record for (_, record) in records]
+
+
+def control_records(items):
+    """Return a record for every power and chassis control object"""
+
+    records = []
+    for (path, properties) in items:
+        for (prefix, cls) in CONTROL_RECORDS:
+            if path.startswith(prefix) and isinstance(properties, dict):
+                records.append(cls.from_properties(path, properties))
+                break
+    return records
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+
+"""
+An indexed, compressed store of recorded OpenBMC responses.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-many-arguments
+
+from __future__ import print_function
+
+import collections
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from openbmc.JsonCodec import decode
+
+# Evict the least recently used responses beyond this many bytes
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# How many decoded responses to keep in memory
+DEFAULT_LRU_SIZE = 256
+# When a response was last used is written out in batches, once this many
+# are waiting or the oldest has waited this many seconds
+USED_BATCH_SIZE = 256
+USED_BATCH_SECONDS = 30
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS responses (
+           method TEXT NOT NULL,
+           url TEXT NOT NULL,
+           body_hash TEXT NOT NULL,
+           status_code INTEGER NOT NULL,
+           encoding TEXT NOT NULL,
+           content BLOB NOT NULL,
+           size INTEGER NOT NULL,
+           used REAL NOT NULL,
+           PRIMARY KEY (method, url, body_hash))""",
+    """CREATE INDEX IF NOT EXISTS responses_used ON responses (used)""",
+]
+
+
+# What a login's password is replaced by before its body is hashed
+REDACTED = "<redacted>"
+
+
+def _redact_login(data):
+    """Return the login body data with the password replaced by REDACTED"""
+
+    try:
+        (user, _) = decode(data)["data"]
+    except (ValueError, TypeError, KeyError):
+        return data
+    return json.dumps({"data": [user, REDACTED]})
+
+
+def body_hash(data, url=None):
+    """Return a short digest identifying a request body
+
+    An unsalted digest of a password is easily reversed, so the password
+    in the body of a POST to a /login url is left out of it.
+    """
+
+    if data is None:
+        return ""
+    if url is not None and url.split("?", 1)[0].rstrip("/").endswith(
+            "/login"):
+        data = _redact_login(data)
+    if not isinstance(data, bytes):
+        data = data.encode("utf-8")
+    return hashlib.sha1(data).hexdigest()
+
+
+class ResponseStore(object):
+    """Recorded responses kept in a single SQLite file
+
+    Responses are keyed by (method, url, body hash), so different POST
+    bodies to the same URL are kept apart.  Bodies are saved as the raw
+    bytes the BMC sent, zlib compressed.  Recently decoded responses are
+    kept in memory, and once the file holds more than max_bytes of bodies
+    the least recently used ones are evicted.  The size of the bodies is
+    kept as a running total, resummed from the file only when it passes
+    max_bytes (so as to see what other processes wrote), and when each
+    response was last used is saved in batches rather than on every read.
+    Call flush() (or close()) to save the last of those.  One instance
+    may be shared between threads.
+
+    Decoded responses are shared between callers and must not be
+    modified.
+    """
+
+    def __init__(self,
+                 filename,
+                 max_bytes=DEFAULT_MAX_BYTES,
+                 lru_size=DEFAULT_LRU_SIZE,
+                 compress=True):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.lru_size = lru_size
+        self.compress = compress
+        self._lru = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(filename,
+                                   timeout=60,
+                                   check_same_thread=False)
+        # Several processes may replay or record at once
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        self._db.commit()
+
+        # key -> when it was last used, not yet written
+        self._used = {}
+        self._used_since = None
+        self._total = self._sum()
+        self._closed = False
+
+    def close(self):
+        """Save when responses were last used and close the database"""
+
+        with self._lock:
+            if self._closed:
+                return
+            self._write_used()
+            self._db.commit()
+            self._db.close()
+            self._closed = True
+
+    def flush(self):
+        """Save when responses were last used"""
+
+        with self._lock:
+            if self._closed:
+                return
+            self._write_used()
+            self._db.commit()
+
+    def _sum(self):
+        (total, ) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return total
+
+    def _touch(self, key):
+        """Note that key was used, saving the batch when it is due"""
+
+        now = time.time()
+        self._used[key] = now
+        if self._used_since is None:
+            self._used_since = now
+        if (len(self._used) >= USED_BATCH_SIZE or
+                now - self._used_since >= USED_BATCH_SECONDS):
+            self._write_used()
+            self._db.commit()
+
+    def _write_used(self):
+        """Write out the batch of last used times, without committing"""
+
+        if not self._used:
+            return
+        self._db.executemany(
+            "UPDATE responses SET used = ?"
+            " WHERE method = ? AND url = ? AND body_hash = ?",
+            [(used, ) + key for (key, used) in self._used.items()])
+        self._used = {}
+        self._used_since = None
+
+    def _remember(self, key, value):
+        self._lru[key] = value
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _content(self, key):
+        """Return (status_code, raw content) for key or None"""
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status_code, encoding, content FROM responses"
+                " WHERE method = ? AND url = ? AND body_hash = ?",
+                key).fetchone()
+            if row is None:
+                return None
+
+            self._touch(key)
+
+        (status_code, encoding, content) = row
+        content = bytes(content)
+        if encoding == "zlib":
+            content = zlib.decompress(content)
+
+        return (status_code, content)
+
+    def get(self, method, url, data=None):
+        """Return (status_code, json_struct) for the request or None"""
+
+        key = (method, url, body_hash(data, url))
+
+        with self._lock:
+            if key in self._lru:
+                value = self._lru.pop(key)
+                self._lru[key] = value
+                self._touch(key)
+                return value
+
+        saved = self._content(key)
+        if saved is None:
+            return None
+
+        (status_code, content) = saved
+        value = (status_code, decode(content))
+
+        with self._lock:
+            self._remember(key, value)
+
+        return value
+
+    def get_content(self, method, url, data=None):
+        """Return (status_code, raw content) for the request or None
+
+        Unlike get() nothing is decoded, so this suits callers that parse
+        large responses themselves.
+        """
+
+        return self._content((method, url, body_hash(data, url)))
+
+    def put(self, method, url, data, status_code, content):
+        """Save the raw response body content for the request"""
+
+        key = (method, url, body_hash(data, url))
+
+        encoding = "identity"
+        if self.compress:
+            content = zlib.compress(content)
+            encoding = "zlib"
+
+        with self._lock:
+            self._lru.pop(key, None)
+            self._used.pop(key, None)
+            row = self._db.execute(
+                "SELECT size FROM responses"
+                " WHERE method = ? AND url = ? AND body_hash = ?",
+                key).fetchone()
+            if row is not None:
+                self._total -= row[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (method, url, body_hash, status_code, encoding, content,"
+                " size, used) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                key + (status_code,
+                       encoding,
+                       sqlite3.Binary(content),
+                       len(content),
+                       time.time()))
+            self._total += len(content)
+            if self._total > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Drop the least recently used responses beyond max_bytes"""
+
+        # Other processes may have added or evicted responses as well
+        self._write_used()
+        total = self._sum()
+        if total <= self.max_bytes:
+            self._total = total
+            return
+
+        rows = self._db.execute(
+            "SELECT method, url, body_hash, size FROM responses"
+            " ORDER BY used").fetchall()
+        for (method, url, digest, size) in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute(
+                "DELETE FROM responses"
+                " WHERE method = ? AND url = ? AND body_hash = ?",
+                (method, url, digest))
+            self._lru.pop((method, url, digest), None)
+            total -= size
+        self._total = total
@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+
+"""
+Sample the sensors of many OpenBMC controllers into compact ring buffers.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-instance-attributes
+# What is with [invalid-name] Invalid variable name "fp"
+# pylint: disable=invalid-name
+
+from __future__ import print_function
+
+import array
+import json
+import math
+import numbers
+import os
+import sys
+import threading
+import time
+
+from openbmc.Fleet import DEFAULT_WORKERS, run_fleet
+from openbmc.OpenBMC import HTTPError, private_directory
+
+SENSORS_PATH = "/org/openbmc/sensors/"
+
+# The name the power state is recorded under
+POWER_STATE_SENSOR = "power/state"
+
+# A day of one minute samples
+DEFAULT_CAPACITY = 24 * 60
+DEFAULT_INTERVAL = 60
+
+_NAN = float("nan")
+
+
+def _is_number(value):
+    """Booleans count as numbers too"""
+
+    return isinstance(value, numbers.Real)
+
+
+class HostSamples(object):
+    """The last capacity samples of every sensor of one host
+
+    Each sample is a time and, for every sensor, a value stored as a
+    32 bit float in a fixed size array, with NaN where a sensor had no
+    reading.  Once the buffers are full the oldest samples are
+    overwritten.  Sensors whose readings are strings (BootProgress, say)
+    store the index of the string in the Sampler's table of categories.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = array.array("d", [_NAN]) * capacity
+        self.values = {}
+        # Where the next sample goes, and how many are held
+        self.head = 0
+        self.count = 0
+
+    def add(self, when, readings):
+        """Store the {sensor: float} readings taken at when"""
+
+        slot = self.head
+
+        self.times[slot] = when
+        for (sensor, buf) in self.values.items():
+            buf[slot] = readings.get(sensor, _NAN)
+        for (sensor, value) in readings.items():
+            if sensor not in self.values:
+                buf = array.array("f", [_NAN]) * self.capacity
+                buf[slot] = value
+                self.values[sensor] = buf
+
+        self.head = (slot + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def slots(self):
+        """Return the slots holding samples, oldest first"""
+
+        start = (self.head - self.count) % self.capacity
+        return [(start + i) % self.capacity for i in range(self.count)]
+
+    def samples(self, sensor, start=None, end=None):
+        """Return [(time, value)] of sensor between start and end
+
+        Samples where the sensor had no reading are left out.
+        """
+
+        buf = self.values.get(sensor)
+        if buf is None:
+            return []
+
+        found = []
+        for slot in self.slots():
+            when = self.times[slot]
+            if start is not None and when < start:
+                continue
+            if end is not None and when > end:
+                continue
+            value = buf[slot]
+            if not math.isnan(value):
+                found.append((when, value))
+        return found
+
+    def nbytes(self):
+        """Return how many bytes the buffers take"""
+
+        return (self.times.itemsize * len(self.times) +
+                sum(buf.itemsize * len(buf) for buf in self.values.values()))
+
+
+class Sampler(object):
+    """Scrape sensors from many hosts on a schedule
+
+    sample() reads every sensor under /org/openbmc/sensors (and, with
+    power_state set, the power state) of each OpenBMC it is given, a
+    number of hosts at once, and stores the readings in a HostSamples per
+    host.  Numbers are stored as they are, booleans as 0 or 1, and
+    strings as categories.  window() then summarizes any sensor over a
+    span of time, and the samples can be exported as CSV or as columns.
+    """
+
+    def __init__(self,
+                 capacity=DEFAULT_CAPACITY,
+                 power_state=True,
+                 workers=DEFAULT_WORKERS,
+                 timeout=None):
+        self.capacity = capacity
+        self.power_state = power_state
+        self.workers = workers
+        self.timeout = timeout
+        self.hosts = {}
+        # sensor -> [string, ...] for sensors which report strings
+        self.categories = {}
+        self._category_index = {}
+        self._lock = threading.Lock()
+
+    def _encode(self, sensor, value):
+        """Return value as a float to store for sensor"""
+
+        with self._lock:
+            if sensor in self.categories or not _is_number(value):
+                if sensor not in self.categories:
+                    self.categories[sensor] = []
+                    self._category_index[sensor] = {}
+                index = self._category_index[sensor]
+                if not isinstance(value, (type(u""), str)):
+                    value = json.dumps(value)
+                if value not in index:
+                    index[value] = len(self.categories[sensor])
+                    self.categories[sensor].append(value)
+                return float(index[value])
+
+        return float(value)
+
+    def decode(self, sensor, value):
+        """Return a stored value as it was read"""
+
+        if sensor in self.categories:
+            return self.categories[sensor][int(value)]
+        return value
+
+    def record(self, hostname, when, readings):
+        """Store the {sensor: value} readings of hostname taken at when"""
+
+        encoded = dict((sensor, self._encode(sensor, value))
+                       for (sensor, value) in readings.items()
+                       if value is not None)
+
+        with self._lock:
+            host = self.hosts.get(hostname)
+            if host is None:
+                host = self.hosts[hostname] = HostSamples(self.capacity)
+
+        host.add(when, encoded)
+
+    def read(self, ob):
+        """Return the current {sensor: value} readings of ob"""
+
+        readings = {}
+
+        for (path, properties) in ob.iter_enumerate(SENSORS_PATH):
+            if isinstance(properties, dict) and "value" in properties:
+                readings[path[len(SENSORS_PATH):]] = properties["value"]
+
+        if self.power_state:
+            try:
+                readings[POWER_STATE_SENSOR] = ob.get_power_state()
+            except HTTPError:
+                pass
+
+        return readings
+
+    def sample(self, obs):
+        """Read and record the sensors of every OpenBMC in obs once
+
+        Returns the FleetResults of the hosts which could not be read.
+        """
+
+        by_hostname = dict((ob.hostname, ob) for ob in obs)
+
+        def sample_one(hostname):
+            """Read one host's sensors"""
+            ob = by_hostname[hostname]
+            readings = self.read(ob)
+            self.record(hostname, time.time(), readings)
+
+        failed = []
+        for result in run_fleet(sorted(by_hostname),
+                                sample_one,
+                                workers=self.workers,
+                                timeout=self.timeout):
+            if not result.ok():
+                failed.append(result)
+
+        return failed
+
+    def run(self, obs, interval=DEFAULT_INTERVAL, rounds=None):
+        """sample() every interval seconds, rounds times or forever"""
+
+        start = time.time()
+        done = 0
+
+        while rounds is None or done < rounds:
+            for result in self.sample(obs):
+                print("Could not sample %s: %s" % (result.hostname,
+                                                   result.error, ),
+                      file=sys.stderr)
+            done += 1
+
+            if rounds is not None and done >= rounds:
+                break
+
+            # Keep to the schedule however long sampling took
+            delay = start + done * interval - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+    def window(self, hostname, sensor, start=None, end=None):
+        """Summarize sensor on hostname between start and end
+
+        Returns a dictionary with the count of samples and, for numeric
+        sensors, their min, max and mean and the rate of change per
+        second from the first to the last.  For sensors which report
+        strings, the values seen and the last one are given instead.
+        """
+
+        host = self.hosts.get(hostname)
+        samples = host.samples(sensor, start, end) if host else []
+
+        summary = {"hostname": hostname,
+                   "sensor": sensor,
+                   "count": len(samples)}
+        if not samples:
+            return summary
+
+        values = [value for (_, value) in samples]
+
+        if sensor in self.categories:
+            summary["values"] = sorted(set(self.decode(sensor, value)
+                                           for value in values))
+            summary["last"] = self.decode(sensor, values[-1])
+            return summary
+
+        summary["min"] = min(values)
+        summary["max"] = max(values)
+        summary["mean"] = sum(values) / len(values)
+        ((first_time, first), (last_time, last)) = (samples[0], samples[-1])
+        if last_time > first_time:
+            summary["rate"] = (last - first) / (last_time - first_time)
+        else:
+            summary["rate"] = 0.0
+        return summary
+
+    def series(self):
+        """Return every (hostname, sensor) sampled, sorted"""
+
+        return sorted((hostname, sensor)
+                      for (hostname, host) in self.hosts.items()
+                      for sensor in host.values)
+
+    def export_csv(self, fp):
+        """Write hostname,sensor,time,value lines for every sample"""
+
+        fp.write("hostname,sensor,time,value\n")
+        for (hostname, sensor) in self.series():
+            for (when, value) in self.hosts[hostname].samples(sensor):
+                value = self.decode(sensor, value)
+                if isinstance(value, float):
+                    # The buffers only hold single precision
+                    value = "%.7g" % (value, )
+                else:
+                    value = '"%s"' % (value.replace('"', '""'), )
+                fp.write("%s,%s,%.3f,%s\n" % (hostname, sensor, when, value))
+
+    def export_columns(self, directory):
+        """Write every sample to directory as one binary file per column
+
+        series.bin (uint32), time.bin (float64) and value.bin (float32)
+        hold one entry per sample in the machine's byte order, readable
+        with array.fromfile() or numpy.fromfile().  columns.json names
+        each series number's hostname and sensor, the categories of
+        sensors reporting strings, and the layout of the files.
+        """
+
+        private_directory(directory)
+
+        series_column = array.array("I")
+        time_column = array.array("d")
+        value_column = array.array("f")
+        names = []
+
+        for (number, (hostname, sensor)) in enumerate(self.series()):
+            names.append([hostname, sensor])
+            for (when, value) in self.hosts[hostname].samples(sensor):
+                series_column.append(number)
+                time_column.append(when)
+                value_column.append(value)
+
+        for (name, column) in (("series", series_column),
+                               ("time", time_column),
+                               ("value", value_column)):
+            with open(os.path.join(directory, name + ".bin"), "wb") as fp:
+                column.tofile(fp)
+
+        layout = {"byteorder": sys.byteorder,
+                  "rows": len(time_column),
+                  "columns": {"series": {"file": "series.bin",
+                                         "typecode": "I"},
+                              "time": {"file": "time.bin",
+                                       "typecode": "d"},
+                              "value": {"file": "value.bin",
+                                        "typecode": "f"}},
+                  "series": names,
+                  "categories": self.categories}
+
+        with open(os.path.join(directory, "columns.json"), "w") as fp:
+            json.dump(layout, fp, sort_keys=True, indent=4)
+
+    def nbytes(self):
+        """Return how many bytes the sample buffers take"""
+
+        return sum(host.nbytes() for host in self.hosts.values())
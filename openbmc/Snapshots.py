@@ -0,0 +1,514 @@
+#!/usr/bin/env python
+
+"""
+Keep snapshots of OpenBMC trees as a base and the changes since.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-few-public-methods
+# What is with [invalid-name] Invalid variable name "fp"
+# pylint: disable=invalid-name
+
+from __future__ import print_function
+
+import json
+import os
+import threading
+import time
+
+from openbmc.OpenBMC import CACHE_DIR, private_directory, write_private_file
+
+# The trees snapshot when none are given
+DEFAULT_SNAPSHOT_KEYS = ["/org/openbmc/inventory/system/",
+                         "/org/openbmc/control/"]
+
+# Stands for a property an object does not have
+_ABSENT = object()
+
+
+def empty_changes():
+    """Return a set of changes in which nothing changed"""
+
+    return {"added": {}, "removed": {}, "changed": {}}
+
+
+def diff_objects(old, new):
+    """Return how the properties of an object changed, or None
+
+    The result holds the "added" and "removed" properties with their
+    values and the "changed" ones as [old value, new value].
+    """
+
+    changes = {"added": {}, "removed": {}, "changed": {}}
+
+    for (name, value) in new.items():
+        if name not in old:
+            changes["added"][name] = value
+        elif old[name] != value:
+            changes["changed"][name] = [old[name], value]
+    for (name, value) in old.items():
+        if name not in new:
+            changes["removed"][name] = value
+
+    if not any(changes.values()):
+        return None
+    return changes
+
+
+def diff_trees(old, new):
+    """Return the changes between two {path: properties} trees
+
+    Added and removed objects are given with all their properties, and
+    changed ones as diff_objects() describes them, so the changes can be
+    applied in either direction.
+    """
+
+    changes = empty_changes()
+
+    for (path, properties) in new.items():
+        if path not in old:
+            changes["added"][path] = properties
+        else:
+            changed = diff_objects(old[path], properties)
+            if changed is not None:
+                changes["changed"][path] = changed
+    for (path, properties) in old.items():
+        if path not in new:
+            changes["removed"][path] = properties
+
+    return changes
+
+
+def apply_changes(tree, changes):
+    """Apply changes to the {path: properties} tree in place"""
+
+    for path in changes["removed"]:
+        del tree[path]
+    for (path, properties) in changes["added"].items():
+        tree[path] = properties
+    for (path, changed) in changes["changed"].items():
+        properties = dict(tree[path])
+        for name in changed["removed"]:
+            del properties[name]
+        properties.update(changed["added"])
+        for (name, (_, value)) in changed["changed"].items():
+            properties[name] = value
+        tree[path] = properties
+
+
+def invert_changes(changes):
+    """Return the changes which undo changes"""
+
+    inverted = empty_changes()
+    inverted["added"] = dict(changes["removed"])
+    inverted["removed"] = dict(changes["added"])
+    for (path, changed) in changes["changed"].items():
+        inverted["changed"][path] = {
+            "added": dict(changed["removed"]),
+            "removed": dict(changed["added"]),
+            "changed": dict((name, [new, old])
+                            for (name, (old, new))
+                            in changed["changed"].items())}
+    return inverted
+
+
+class _History(object):
+    """What a run of changes did to one object"""
+
+    def __init__(self):
+        # Whether the object existed before the first change and after
+        # the last one
+        self.existed = None
+        self.exists = None
+        # Property values before and after, _ABSENT if it had none.  Once
+        # the whole object before is known the missing properties were
+        # absent.
+        self.before = {}
+        self.before_whole = False
+        self.after = {}
+
+    def record_before(self, name, value):
+        """Remember value unless an earlier change already showed one"""
+
+        if name not in self.before and not self.before_whole:
+            self.before[name] = value
+
+    def add(self, properties):
+        """The object was created with properties"""
+
+        if self.existed is None:
+            self.existed = False
+            self.before_whole = True
+        self.exists = True
+        self.after = dict(properties)
+
+    def remove(self, properties):
+        """The object, with properties, was removed"""
+
+        if self.existed is None:
+            self.existed = True
+        for (name, value) in properties.items():
+            self.record_before(name, value)
+        self.before_whole = True
+        self.exists = False
+        self.after = {}
+
+    def change(self, changed):
+        """Some properties of the object changed"""
+
+        if self.existed is None:
+            self.existed = True
+        self.exists = True
+        for (name, value) in changed["added"].items():
+            self.record_before(name, _ABSENT)
+            self.after[name] = value
+        for (name, value) in changed["removed"].items():
+            self.record_before(name, value)
+            self.after[name] = _ABSENT
+        for (name, (old, new)) in changed["changed"].items():
+            self.record_before(name, old)
+            self.after[name] = new
+
+    def properties_before(self):
+        """Return the properties the object started with"""
+
+        return dict((name, value) for (name, value) in self.before.items()
+                    if value is not _ABSENT)
+
+    def properties_after(self):
+        """Return the properties the object ended up with"""
+
+        return dict((name, value) for (name, value) in self.after.items()
+                    if value is not _ABSENT)
+
+    def changed(self):
+        """Return how the object's properties changed overall, or None"""
+
+        # Properties no change touched are the same on both sides
+        return diff_objects(self.properties_before(),
+                            self.properties_after())
+
+
+def compose_changes(runs):
+    """Return the overall changes made by a sequence of changes
+
+    Only the objects mentioned in runs are looked at, so this takes time
+    in proportion to what changed rather than to the size of the tree.
+    """
+
+    histories = {}
+
+    for changes in runs:
+        for (path, properties) in changes["removed"].items():
+            histories.setdefault(path, _History()).remove(properties)
+        for (path, properties) in changes["added"].items():
+            histories.setdefault(path, _History()).add(properties)
+        for (path, changed) in changes["changed"].items():
+            histories.setdefault(path, _History()).change(changed)
+
+    overall = empty_changes()
+
+    for (path, history) in histories.items():
+        if history.existed and history.exists:
+            changed = history.changed()
+            if changed is not None:
+                overall["changed"][path] = changed
+        elif history.exists:
+            overall["added"][path] = history.properties_after()
+        elif history.existed:
+            overall["removed"][path] = history.properties_before()
+
+    return overall
+
+
+def _append_line(filename, line):
+    """Append line to filename; return the offset it starts at
+
+    A last line left half written by an interrupted run is ended first,
+    so that it can be skipped rather than swallowing this one.
+    """
+
+    private_directory(os.path.dirname(filename))
+    fd = os.open(filename, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+    try:
+        offset = os.lseek(fd, 0, os.SEEK_END)
+        if offset > 0:
+            os.lseek(fd, offset - 1, os.SEEK_SET)
+            if os.read(fd, 1) != b"\n":
+                os.write(fd, b"\n")
+                offset += 1
+        os.write(fd, (line + "\n").encode("utf-8"))
+    finally:
+        os.close(fd)
+    return offset
+
+
+def _key_name(key):
+    """Return a file name for the tree under key"""
+
+    return key.strip("/").replace("/", "_") or "root"
+
+
+class SnapshotStore(object):
+    """Snapshots of the trees of many hosts, stored as changes
+
+    The first snapshot of a tree is saved whole as its base, and every
+    later one only as the changes since the one before, so keeping many
+    snapshots of a tree which rarely changes costs little.  Snapshots are
+    numbered from 0 (the base) and the changes between any two of them
+    are worked out from the stored changes alone.
+
+    The latest tree is kept whole as well, so taking a snapshot only
+    compares against it, and an index of where each run of changes
+    starts in the log lets diff() read just the runs it needs.  Both are
+    brought up to date from the log if a run was cut short.
+
+    Everything lives under directory (by default CACHE_DIR/snapshots),
+    one directory per host.  One instance may be shared between threads.
+    """
+
+    def __init__(self, directory=None):
+        if directory is None:
+            directory = os.path.join(CACHE_DIR, "snapshots")
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def _filenames(self, hostname, key):
+        prefix = os.path.join(self.directory, hostname, _key_name(key))
+        return (prefix + ".base.json", prefix + ".changes.ndjson")
+
+    def _index_filenames(self, hostname, key):
+        prefix = os.path.join(self.directory, hostname, _key_name(key))
+        return (prefix + ".latest.json", prefix + ".changes.index")
+
+    def _read_base(self, hostname, key):
+        (base_filename, _) = self._filenames(hostname, key)
+        try:
+            with open(base_filename, "r") as fp:
+                return json.load(fp)
+        except IOError:
+            return None
+
+    def _read_latest(self, hostname, key):
+        """Return {"time", "count", "tree"} as of count runs, or None"""
+
+        (latest_filename, _) = self._index_filenames(hostname, key)
+        try:
+            with open(latest_filename, "r") as fp:
+                return json.load(fp)
+        except (IOError, ValueError):
+            return None
+
+    def _read_index(self, hostname, key):
+        """Return [(time, offset)] for every run of changes in the log
+
+        Runs appended to the log but missing from the index, as after an
+        interrupted record() or by a version which kept no index, are
+        added to it first.
+        """
+
+        (_, changes_filename) = self._filenames(hostname, key)
+        (_, index_filename) = self._index_filenames(hostname, key)
+
+        index = []
+        try:
+            with open(index_filename, "r") as fp:
+                for line in fp:
+                    fields = line.split()
+                    if len(fields) != 2 or not line.endswith("\n"):
+                        continue
+                    try:
+                        index.append((float(fields[0]), int(fields[1])))
+                    except ValueError:
+                        continue
+        except IOError:
+            pass
+
+        try:
+            fp = open(changes_filename, "rb")
+        except IOError:
+            return index
+
+        missing = []
+        with fp:
+            covered = 0
+            if index:
+                fp.seek(index[-1][1])
+                covered = index[-1][1] + len(fp.readline())
+            fp.seek(covered)
+            while True:
+                offset = fp.tell()
+                line = fp.readline()
+                if not line:
+                    break
+                # Skip a line left half written
+                if not line.strip() or not line.endswith(b"\n"):
+                    continue
+                try:
+                    entry = json.loads(line.decode("utf-8"))
+                except ValueError:
+                    continue
+                missing.append((entry["time"], offset))
+
+        for (when, offset) in missing:
+            _append_line(index_filename, "%r %d" % (when, offset, ))
+        index.extend(missing)
+
+        return index
+
+    def _read_runs(self, hostname, key, index, start, end):
+        """Return the changes of runs start to end (exclusive) of index"""
+
+        if start >= end:
+            return []
+
+        (_, changes_filename) = self._filenames(hostname, key)
+        runs = []
+        with open(changes_filename, "rb") as fp:
+            # Runs need not follow each other, as a half written line
+            # may lie between two
+            for (_, offset) in index[start:end]:
+                fp.seek(offset)
+                entry = json.loads(fp.readline().decode("utf-8"))
+                runs.append(entry["changes"])
+        return runs
+
+    def _latest(self, hostname, key, index):
+        """Return the latest tree, or None when there is no base"""
+
+        latest = self._read_latest(hostname, key)
+        if latest is None or latest["count"] > len(index):
+            base = self._read_base(hostname, key)
+            if base is None:
+                return None
+            latest = {"count": 0, "tree": base["tree"]}
+
+        tree = latest["tree"]
+        for changes in self._read_runs(hostname, key, index,
+                                       latest["count"], len(index)):
+            apply_changes(tree, changes)
+        return tree
+
+    def times(self, hostname, key):
+        """Return when each snapshot of key was taken, oldest first"""
+
+        with self._lock:
+            base = self._read_base(hostname, key)
+            if base is None:
+                return []
+            return ([base["time"]] +
+                    [when for (when, _) in self._read_index(hostname, key)])
+
+    def tree(self, hostname, key, number=-1):
+        """Return the tree as it was in snapshot number
+
+        It is worked out from the base or from the latest tree,
+        whichever fewer runs of changes lie between.
+        """
+
+        with self._lock:
+            index = self._read_index(hostname, key)
+            number = self._number(number, len(index) + 1)
+
+            if number > len(index) // 2:
+                tree = self._latest(hostname, key, index)
+                if tree is None:
+                    raise KeyError("No snapshots of %s on %s" % (key,
+                                                                 hostname, ))
+                runs = self._read_runs(hostname, key, index, number,
+                                       len(index))
+                for changes in reversed(runs):
+                    apply_changes(tree, invert_changes(changes))
+                return tree
+
+            base = self._read_base(hostname, key)
+            if base is None:
+                raise KeyError("No snapshots of %s on %s" % (key, hostname, ))
+            tree = base["tree"]
+            for changes in self._read_runs(hostname, key, index, 0, number):
+                apply_changes(tree, changes)
+            return tree
+
+    @staticmethod
+    def _number(number, count):
+        if number < 0:
+            number += count
+        if number < 0 or number >= count:
+            raise IndexError("No snapshot %d (there are %d)" % (number,
+                                                               count, ))
+        return number
+
+    def record(self, hostname, key, tree, when=None):
+        """Save tree as the latest snapshot; return what changed"""
+
+        if when is None:
+            when = time.time()
+
+        (base_filename, changes_filename) = self._filenames(hostname, key)
+        (latest_filename, index_filename) = self._index_filenames(hostname,
+                                                                  key)
+
+        with self._lock:
+            index = self._read_index(hostname, key)
+            latest = self._latest(hostname, key, index)
+
+            if latest is None:
+                write_private_file(base_filename,
+                                   json.dumps({"time": when, "tree": tree}))
+                write_private_file(latest_filename,
+                                   json.dumps({"time": when,
+                                               "count": 0,
+                                               "tree": tree}))
+                changes = empty_changes()
+                changes["added"] = tree
+                return changes
+
+            changes = diff_trees(latest, tree)
+
+            offset = _append_line(changes_filename,
+                                  json.dumps({"time": when,
+                                              "changes": changes}))
+            _append_line(index_filename, "%r %d" % (when, offset, ))
+
+            write_private_file(latest_filename,
+                               json.dumps({"time": when,
+                                           "count": len(index) + 1,
+                                           "tree": tree}))
+
+        return changes
+
+    def take(self, ob, key):
+        """Snapshot the tree under key on ob; return what changed"""
+
+        return self.record(ob.hostname, key, ob.enumerate(key))
+
+    def diff(self, hostname, key, start=-2, end=-1):
+        """Return the changes from snapshot start to snapshot end
+
+        Only the runs of changes between the two snapshots are read, so
+        this takes as long as those changes rather than the whole history.
+        """
+
+        with self._lock:
+            index = self._read_index(hostname, key)
+
+            start = self._number(start, len(index) + 1)
+            end = self._number(end, len(index) + 1)
+
+            if start > end:
+                return invert_changes(compose_changes(
+                    self._read_runs(hostname, key, index, end, start)))
+            return compose_changes(
+                self._read_runs(hostname, key, index, start, end))
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+
+"""
+Wait for OpenBMC controllers to reach a state.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-many-arguments
+# pylint: disable=too-few-public-methods
+# pylint: disable=broad-except
+
+from __future__ import print_function
+
+import heapq
+import itertools
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# Poll quickly at first, since many transitions are fast, and then back
+# off so that slow ones do not hammer the BMC.
+POLL_INITIAL = 0.5
+POLL_FACTOR = 1.5
+POLL_MAXIMUM = 15
+
+# The most polls running at once
+DEFAULT_WORKERS = 32
+
+
+class WaitResult(object):
+    """How waiting for one host turned out"""
+
+    def __init__(self, name, reached, value, error, elapsed, polls):
+        self.name = name
+        self.reached = reached
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+        self.polls = polls
+
+    def __repr__(self):
+        return "WaitResult(%s, reached=%s, value=%s, polls=%d)" % (
+            self.name,
+            self.reached,
+            self.value,
+            self.polls, )
+
+
+class _Waiting(object):
+    """The state of one host being waited on"""
+
+    def __init__(self, name, check, done, interval):
+        self.name = name
+        self.check = check
+        self.done = done
+        self.interval = interval
+        self.value = None
+        self.error = None
+        self.polls = 0
+
+
+class StateWaiter(object):
+    """Wait for many hosts to reach a state
+
+    Add each host with a check function, which fetches its current
+    state, and a done function, which says whether that state is the one
+    wanted.  wait() then polls every host when it is due, starting every
+    initial seconds and backing off by factor up to maximum seconds, so
+    fast transitions are noticed quickly without hammering slow ones.
+
+    The polls run on up to workers threads, so a BMC which takes until
+    its read timeout to answer only holds up its own host.
+
+    A check that raises (the BMC is rebooting, say) counts as not done
+    yet and the host keeps being polled until the deadline.
+    """
+
+    def __init__(self,
+                 initial=POLL_INITIAL,
+                 factor=POLL_FACTOR,
+                 maximum=POLL_MAXIMUM,
+                 workers=DEFAULT_WORKERS):
+        self.initial = initial
+        self.factor = factor
+        self.maximum = maximum
+        self.workers = workers
+        self._waiting = []
+
+    def add(self, name, check, done):
+        """Wait for done(check()) to be true for name"""
+
+        self._waiting.append(_Waiting(name, check, done, self.initial))
+
+    def wait(self, timeout):
+        """Poll until every host is done or timeout seconds have passed
+
+        A WaitResult is yielded for each host as soon as it is done, and
+        for every remaining host once the time is up.  A poll started
+        before the deadline is still waited for.
+        """
+
+        start = time.time()
+        deadline = start + timeout
+        # Ties are broken by insertion order so hosts never get compared
+        counter = itertools.count()
+        due = [(start, next(counter), waiting) for waiting in self._waiting]
+        heapq.heapify(due)
+        self._waiting = []
+
+        polls = queue.Queue()
+        polled = queue.Queue()
+        threads = []
+        for _ in range(max(1, min(self.workers, len(due)))):
+            thread = threading.Thread(target=_poller, args=(polls, polled))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        timed_out = []
+        in_flight = 0
+
+        try:
+            while due or in_flight:
+                now = time.time()
+                while due and due[0][0] <= now:
+                    (_, _, waiting) = heapq.heappop(due)
+                    polls.put(waiting)
+                    in_flight += 1
+
+                if not in_flight:
+                    time.sleep(due[0][0] - now)
+                    continue
+
+                try:
+                    if due:
+                        (waiting, reached) = polled.get(
+                            timeout=max(0, due[0][0] - now))
+                    else:
+                        (waiting, reached) = polled.get()
+                except queue.Empty:
+                    continue
+                in_flight -= 1
+
+                if reached:
+                    yield WaitResult(waiting.name,
+                                     True,
+                                     waiting.value,
+                                     None,
+                                     time.time() - start,
+                                     waiting.polls)
+                    continue
+
+                now = time.time()
+                if now >= deadline:
+                    timed_out.append(waiting)
+                    continue
+
+                # The last poll happens right at the deadline
+                heapq.heappush(due, (min(now + waiting.interval, deadline),
+                                     next(counter),
+                                     waiting))
+                waiting.interval = min(self.maximum,
+                                       waiting.interval * self.factor)
+        finally:
+            # Polls still running finish on their own
+            for _ in threads:
+                polls.put(None)
+
+        for waiting in timed_out:
+            yield WaitResult(waiting.name,
+                             False,
+                             waiting.value,
+                             waiting.error,
+                             time.time() - start,
+                             waiting.polls)
+
+
+def _poller(polls, polled):
+    """Poll each host taken from polls and hand it back on polled"""
+
+    while True:
+        waiting = polls.get()
+        if waiting is None:
+            return
+
+        waiting.polls += 1
+
+        try:
+            waiting.value = waiting.check()
+            waiting.error = None
+            reached = waiting.done(waiting.value)
+        except Exception as ex:
+            waiting.error = ex
+            reached = False
+
+        polled.put((waiting, reached))
+
+
+def wait_until(check, done, timeout, **kwargs):
+    """Poll check() until done(check()) is true; return a WaitResult"""
+
+    kwargs.setdefault("workers", 1)
+    waiter = StateWaiter(**kwargs)
+    waiter.add(None, check, done)
+    return next(waiter.wait(timeout))
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+
+"""
+Push notifications of property changes and new events from OpenBMC.
+
+This needs the websocket-client package.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-instance-attributes
+# pylint: disable=broad-except
+# pylint: disable=protected-access
+
+from __future__ import print_function
+
+import json
+import random
+import ssl
+import sys
+import threading
+
+import websocket
+
+from openbmc.EventSync import EVENTS_PATH, EventSync
+from openbmc.OpenBMC import HTTPError
+
+# Paths watched when none are given
+DEFAULT_PATHS = ["/org/openbmc/control/power0",
+                 "/org/openbmc/sensors/host/BootProgress",
+                 EVENTS_PATH]
+
+# Back off between reconnects from this many seconds up to the maximum
+RECONNECT_INITIAL = 1
+RECONNECT_MAXIMUM = 60
+
+
+class Subscription(object):
+    """Deliver changes on a BMC as they happen instead of polling
+
+    Connects to the BMC's /subscribe websocket and asks for notifications
+    about paths.  on_change(path, properties) is called with the changed
+    properties of any watched object, and on_event(path, record) with
+    each new event record.
+
+    The current state is fetched when the subscription starts and again
+    after every reconnect, and anything that changed while disconnected
+    is delivered as well, so no change is lost across a dropped
+    connection.  Reconnects back off with jitter and log in again if the
+    BMC no longer accepts the session.
+    """
+
+    def __init__(self,
+                 ob,
+                 paths=None,
+                 on_change=None,
+                 on_event=None,
+                 event_sync=None):
+        if paths is None:
+            paths = DEFAULT_PATHS
+        self.ob = ob
+        self.paths = paths
+        self.on_change = on_change
+        self.on_event = on_event
+        if event_sync is None and on_event is not None:
+            event_sync = EventSync(ob)
+        self.event_sync = event_sync
+        self._known = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._ws = None
+
+    def _watches_events(self):
+        return any(path.startswith(EVENTS_PATH.rstrip("/"))
+                   for path in self.paths)
+
+    def _deliver_change(self, path, properties):
+        """Merge properties into what we know and report what changed"""
+
+        known = self._known.setdefault(path, {})
+        changed = {}
+        for (name, value) in properties.items():
+            if name not in known or known[name] != value:
+                changed[name] = value
+                known[name] = value
+
+        if changed and self.on_change is not None:
+            self.on_change(path, changed)
+
+    def _deliver_events(self):
+        if self.event_sync is None:
+            return
+        for (_, path, record) in self.event_sync.sync():
+            if self.on_event is not None:
+                self.on_event(path, record)
+
+    def resync(self):
+        """Fetch the watched objects and report what changed meanwhile"""
+
+        for path in self.paths:
+            if path.startswith(EVENTS_PATH.rstrip("/")):
+                continue
+            try:
+                properties = self.ob.get(path)
+            except HTTPError:
+                continue
+            if isinstance(properties, dict):
+                self._deliver_change(path, properties)
+
+        if self._watches_events():
+            self._deliver_events()
+
+    def _connect(self, relogin=True):
+        url = "wss://%s/subscribe" % (self.ob.hostname, )
+        cookies = self.ob.session.get_cookies()
+        cookie = "; ".join("%s=%s" % (name, value)
+                           for (name, value) in cookies.items())
+        logins = self.ob._logins
+
+        try:
+            ws = websocket.create_connection(
+                url,
+                cookie=cookie,
+                sslopt={"cert_reqs": ssl.CERT_NONE},
+                timeout=self.ob.session.timeout[0])
+        except websocket.WebSocketBadStatusException as ex:
+            if not relogin or getattr(ex, "status_code", None) != 401:
+                raise
+            # The session has expired, so log in and try once more
+            self.ob._relogin(logins)
+            return self._connect(relogin=False)
+
+        ws.send(json.dumps({"paths": self.paths}))
+
+        return ws
+
+    def _handle(self, message):
+        notification = json.loads(message)
+
+        path = notification.get("path", "")
+        if path.startswith(EVENTS_PATH.rstrip("/")):
+            # A new record appeared, which EventSync fetches in order
+            self._deliver_events()
+        elif notification.get("event") == "PropertiesChanged":
+            self._deliver_change(path, notification.get("properties", {}))
+
+    def run(self):
+        """Deliver notifications until stop() is called"""
+
+        delay = RECONNECT_INITIAL
+
+        while not self._stop.is_set():
+            try:
+                self._ws = self._connect()
+                # Anything which changed before the subscription was in
+                # place would otherwise be missed
+                self.resync()
+                delay = RECONNECT_INITIAL
+
+                # Wake up now and then to notice stop()
+                self._ws.settimeout(1)
+                while not self._stop.is_set():
+                    try:
+                        message = self._ws.recv()
+                    except websocket.WebSocketTimeoutException:
+                        continue
+                    if not message:
+                        raise websocket.WebSocketConnectionClosedException()
+                    self._handle(message)
+            except Exception as ex:
+                if self._stop.is_set():
+                    break
+                print("Subscription to %s lost (%s), reconnecting" % (
+                    self.ob.hostname,
+                    ex, ), file=sys.stderr)
+                self._stop.wait(random.uniform(0, delay))
+                delay = min(RECONNECT_MAXIMUM, delay * 2)
+            finally:
+                if self._ws is not None:
+                    self._ws.close()
+                    self._ws = None
+
+    def start(self):
+        """Deliver notifications from a background thread"""
+
+        self._thread = threading.Thread(target=self.run,
+                                        name="subscription-%s" % (
+                                            self.ob.hostname, ))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop delivering notifications"""
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -15,9 +15,41 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from distutils.core import setup
+import sys
+
+try:
+    from setuptools import setup
+except ImportError:
+    from distutils.core import setup
 
 VERSION = "1.2"
+
+MODULES = ["openbmc/__init__",
+           "openbmc/Cassette",
+           "openbmc/Daemon",
+           "openbmc/EventSync",
+           "openbmc/Firmware",
+           "openbmc/Fleet",
+           "openbmc/Inventory",
+           "openbmc/InventoryDatabase",
+           "openbmc/JsonCodec",
+           "openbmc/JsonStream",
+           "openbmc/Metrics",
+           "openbmc/MockOpenBMC",
+           "openbmc/OpenBMC",
+           "openbmc/PowerScheduler",
+           "openbmc/Records",
+           "openbmc/ResponseStore",
+           "openbmc/Sampler",
+           "openbmc/Snapshots",
+           "openbmc/StateWaiter",
+           "openbmc/Subscription"]
+
+# The asyncio client is written with async def, which Python 2 cannot
+# even byte-compile.
+if sys.version_info >= (3, 5):
+    MODULES.append("openbmc/AsyncOpenBMC")
+
 setup(name="openbmc",
       version=VERSION,
       description="library for OpenBMC calls",
@@ -26,9 +58,13 @@ setup(name="openbmc",
       url="https://github.com/hamzy/openbmc",
       download_url="https://github.com/hamzy/OpenBMC/tarball/v"+VERSION,
       keywords = ["OpenBMC"],
-      py_modules=["openbmc/__init__", "openbmc/OpenBMC"],
+      py_modules=MODULES,
       scripts=["openbmc/openBmcTool"],
       install_requires=[
           "requests",
       ],
+      extras_require={
+          "async": ["aiohttp"],
+          "watch": ["websocket-client"],
+      },
      )
@@ -0,0 +1,143 @@
+"""
+Fixtures shared by the tests.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=redefined-outer-name
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+TOOL = os.path.join(ROOT, "openbmc", "openBmcTool")
+
+# The asyncio tests are written with async def, which Python 2 cannot even
+# parse, as AsyncOpenBMC is
+collect_ignore = []
+if sys.version_info < (3, 5):
+    collect_ignore.append("test_async_openbmc.py")
+
+# pylint: disable=wrong-import-position
+from openbmc.MockOpenBMC import MockOpenBMC
+from openbmc.OpenBMC import add_request_hook, remove_request_hook
+from openbmc.ResponseStore import ResponseStore
+
+
+@pytest.fixture
+def bmc():
+    """A MockOpenBMC answering on a free port"""
+
+    mock = MockOpenBMC(events=4).start()
+    yield mock
+    mock.stop()
+
+
+@pytest.fixture
+def store(tmpdir):
+    """An empty ResponseStore, instead of the one under ~/.cache"""
+
+    response_store = ResponseStore(str(tmpdir.join("responses.db")))
+    yield response_store
+    response_store.close()
+
+
+@pytest.fixture
+def requests_seen():
+    """The RequestInfo of every request made during the test"""
+
+    seen = []
+    add_request_hook(seen.append)
+    yield seen
+    remove_request_hook(seen.append)
+
+
+def python2():
+    """Return an interpreter which can run openBmcTool, or None"""
+
+    if sys.version_info[0] == 2:
+        return sys.executable
+    import shutil
+    for name in ("python2.7", "python2"):
+        path = shutil.which(name)
+        if path is None:
+            continue
+        if subprocess.call([path, "-c", "import requests"],
+                           stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL) == 0:
+            return path
+    return None
+
+
+class Tool(object):
+    """Run openBmcTool against a mock, with HOME in a scratch directory"""
+
+    def __init__(self, interpreter, home, mock):
+        self.interpreter = interpreter
+        self.home = home
+        self.mock = mock
+        self.env = dict(os.environ, HOME=home, PYTHONPATH=ROOT)
+        self.env.pop("OPENBMC_DAEMON", None)
+
+    def start(self, *args, **kwargs):
+        """Start the tool with args; return its subprocess.Popen
+
+        Unless login=False is given the mock's hostname, user and
+        password come first.
+        """
+
+        command = [self.interpreter, TOOL]
+        if kwargs.get("login", True):
+            command += ["--hostname", self.mock.hostname,
+                        "--user", self.mock.user,
+                        "--password", self.mock.password]
+        command += list(args)
+        env = dict(self.env, **kwargs.get("env", {}))
+
+        return subprocess.Popen(command,
+                                env=env,
+                                stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE)
+
+    def __call__(self, *args, **kwargs):
+        """Run the tool with args; return (stdout, stderr) as text
+
+        The exit status must be status (0 unless given), and stdin is
+        fed to the tool.  Otherwise the arguments are those of start().
+        """
+
+        process = self.start(*args, **kwargs)
+        stdin = kwargs.get("stdin")
+        if stdin is not None:
+            stdin = stdin.encode("utf-8")
+        (out, err) = process.communicate(stdin)
+        (out, err) = (out.decode("utf-8"), err.decode("utf-8"))
+        assert process.returncode == kwargs.get("status", 0), err
+        return (out, err)
+
+
+@pytest.fixture
+def tool(bmc, tmpdir):
+    """A Tool for the bmc fixture, skipping the test without Python 2"""
+
+    interpreter = python2()
+    if interpreter is None:
+        pytest.skip("openBmcTool needs Python 2 with requests")
+    return Tool(interpreter, str(tmpdir.join("home")), bmc)
@@ -0,0 +1,97 @@
+"""
+Tests for openbmc.AsyncOpenBMC, online against the mock and offline.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+# pylint: disable=wrong-import-position
+from openbmc import AsyncOpenBMC as async_openbmc
+from openbmc.AsyncOpenBMC import AsyncOpenBMC
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def connect(bmc, store, online=True):
+    return AsyncOpenBMC(bmc.hostname, bmc.user, bmc.password, online,
+                        store=store)
+
+
+def test_power(bmc, store):
+    async def main():
+        async with connect(bmc, store) as ob:
+            before = await ob.get_power_state()
+            await ob.power_on()
+            return (before, await ob.get_power_state())
+
+    assert run(main()) == (0, 1)
+    assert bmc.stats()["logins"] == 1
+
+
+def test_instances_share_one_pool(bmc, store):
+    async def main():
+        async with connect(bmc, store) as first:
+            async with connect(bmc, store) as second:
+                await asyncio.gather(first.get_power_state(),
+                                     second.get_power_state())
+                assert (first.session._connector is
+                        second.session._connector)
+                connector = first.session._connector
+            assert not connector.closed
+        assert connector.closed
+
+    run(main())
+    assert not async_openbmc._SHARED
+
+
+def test_finished_loops_are_released(bmc, store):
+    async def main():
+        async with connect(bmc, store) as ob:
+            return await ob.get_power_state()
+
+    for _ in range(3):
+        assert run(main()) == 0
+    assert not async_openbmc._SHARED
+
+
+def test_offline_replays_what_was_recorded(bmc, store):
+    async def main(online):
+        async with connect(bmc, store, online) as ob:
+            return await ob.get_power_state()
+
+    assert run(main(True)) == 0
+    bmc.stop()
+
+    assert run(main(False)) == 0
+
+
+def test_offline_without_recording(bmc, store):
+    async def main():
+        async with connect(bmc, store, False) as ob:
+            return await ob.get_power_state()
+
+    # As with OpenBMC, a request which was never recorded fails outright
+    with pytest.raises(Exception, match="Danger"):
+        run(main())
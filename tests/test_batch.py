@@ -0,0 +1,64 @@
+"""
+Tests for running several commands with one login using openBmcTool batch.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+POWER = "/org/openbmc/control/power0"
+
+
+def test_commands_share_one_login(bmc, tool):
+    (out, _) = tool("--online", "--no-session-cache", "batch",
+                    "get_power_state",
+                    "set_power on",
+                    "get_power_state",
+                    "is_power ?")
+
+    assert out.splitlines() == ["0", "1", "Power is on"]
+    assert bmc.stats()["logins"] == 1
+
+
+def test_commands_from_stdin(bmc, tool):
+    (out, _) = tool("--online", "batch", "get_power_state", "--file", "-",
+                    stdin="# Comments and blank lines are skipped\n"
+                          "\n"
+                          "set_power on\n"
+                          "get_power_state\n")
+
+    assert out.splitlines() == ["0", "1"]
+    assert bmc.objects[POWER]["state"] == 1
+
+
+def test_bad_command_runs_nothing(bmc, tool):
+    (_, err) = tool("--online", "batch", "set_power on", "bogus",
+                    status=2)
+
+    assert "unknown command bogus" in err
+    assert bmc.objects[POWER]["state"] == 0
+
+
+def test_failed_command(bmc, tool):
+    (_, err) = tool("--online", "batch", "is_power on", "set_power on",
+                    status=2)
+
+    assert "Failed: is_power on" in err
+    assert bmc.objects[POWER]["state"] == 1
+
+
+def test_stop_on_error(bmc, tool):
+    tool("--online", "batch", "--stop-on-error", "is_power on",
+         "set_power on",
+         status=2)
+
+    assert bmc.objects[POWER]["state"] == 0
@@ -0,0 +1,115 @@
+"""
+Tests for recording to and replaying from an openbmc.Cassette.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=redefined-outer-name
+
+import hashlib
+import json
+import sqlite3
+
+import pytest
+
+from openbmc.Cassette import RECORD, REPLAY, Cassette
+from openbmc.OpenBMC import OpenBMC
+
+
+def record_power_cycle(bmc, store, filename):
+    """Record switching the power on and off; return the states seen"""
+
+    cassette = Cassette(filename, RECORD)
+    try:
+        ob = OpenBMC(bmc.hostname, bmc.user, bmc.password, True,
+                     store=store, cassette=cassette)
+        states = [ob.get_power_state()]
+        ob.power_on()
+        states.append(ob.get_power_state())
+        ob.power_off()
+        states.append(ob.get_power_state())
+    finally:
+        cassette.close()
+    return states
+
+
+@pytest.mark.parametrize("name", ["cassette.ndjson", "cassette.ndjson.gz"])
+def test_replay_follows_the_recorded_states(bmc, store, tmpdir, name):
+    filename = str(tmpdir.join(name))
+    assert record_power_cycle(bmc, store, filename) == [0, 1, 0]
+
+    bmc.stop()
+
+    cassette = Cassette(filename, REPLAY)
+    ob = OpenBMC(bmc.hostname, bmc.user, bmc.password, False,
+                 store=store, cassette=cassette)
+    states = [ob.get_power_state()]
+    ob.power_on()
+    states.append(ob.get_power_state())
+    ob.power_off()
+    states.append(ob.get_power_state())
+    # Once a request's responses run out the last one is repeated
+    states.append(ob.get_power_state())
+
+    assert states == [0, 1, 0, 0]
+
+
+def test_recordings_do_not_hash_the_password(bmc, store, tmpdir):
+    filename = str(tmpdir.join("cassette.ndjson"))
+    record_power_cycle(bmc, store, filename)
+
+    login = json.dumps({"data": [bmc.user, bmc.password]})
+    digest = hashlib.sha1(login.encode("utf-8")).hexdigest()
+
+    with open(filename) as fp:
+        assert digest not in fp.read()
+    database = sqlite3.connect(store.filename)
+    try:
+        hashes = [row[0] for row in database.execute(
+            "SELECT body_hash FROM responses WHERE url LIKE '%/login'")]
+    finally:
+        database.close()
+    assert hashes and digest not in hashes
+
+    # Which is still enough to replay the login
+    cassette = Cassette(filename, REPLAY)
+    ob = OpenBMC(bmc.hostname, bmc.user, bmc.password, False,
+                 store=store, cassette=cassette)
+    assert ob.get_power_state() == 0
+
+
+def test_replay_does_not_fall_back_to_the_store(bmc, store, tmpdir):
+    filename = str(tmpdir.join("cassette.ndjson"))
+    record_power_cycle(bmc, store, filename)
+
+    cassette = Cassette(filename, REPLAY)
+    ob = OpenBMC(bmc.hostname, bmc.user, bmc.password, False,
+                 store=store, cassette=cassette)
+    # The store recorded the system state, the cassette did not
+    with pytest.raises(Exception):
+        ob.get("/org/openbmc/records/events/")
+
+
+def test_tool_replays_a_recording_made_with_warm_caches(bmc, tool, tmpdir):
+    filename = str(tmpdir.join("cassette.ndjson"))
+
+    # Leave a saved session and remembered topology behind, which must
+    # not stop the recording from holding the login and enumeration
+    (expected, _) = tool("--online", "get_power_state")
+    assert tool("--online", "--cassette", filename,
+                "get_power_state")[0] == expected
+
+    bmc.stop()
+
+    assert tool("--cassette", filename, "get_power_state")[0] == expected
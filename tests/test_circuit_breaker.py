@@ -0,0 +1,140 @@
+"""
+Tests for openbmc.OpenBMC.CircuitBreaker.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=redefined-outer-name
+
+import socket
+import time
+
+import pytest
+
+from openbmc.OpenBMC import CachedSession, CircuitBreaker, CircuitOpenError
+
+PREFIX = "https://bmc/"
+
+
+def closed_port_url():
+    """Return a URL which nothing is listening on"""
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return "https://127.0.0.1:%d/org/openbmc/" % (port, )
+
+
+def session(store, breaker, retries=0):
+    """Return an online CachedSession using breaker"""
+
+    cached = CachedSession(True, store=store, circuit_breaker=breaker)
+    cached.timeout = (1, 1)
+    cached.retries = retries
+    cached.retry_backoff = 0.001
+    cached.hedge_after = None
+    return cached
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failures=3, reset=60)
+    for _ in range(2):
+        breaker.before(PREFIX)
+        breaker.failure(PREFIX)
+    breaker.before(PREFIX)
+    breaker.failure(PREFIX)
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before(PREFIX)
+    # Other BMCs are not affected
+    breaker.before("https://other/")
+
+
+def test_a_success_resets_the_count():
+    breaker = CircuitBreaker(failures=2, reset=60)
+    breaker.failure(PREFIX)
+    breaker.success(PREFIX)
+    breaker.failure(PREFIX)
+    breaker.before(PREFIX)
+
+
+def test_one_trial_is_let_through_after_reset():
+    breaker = CircuitBreaker(failures=1, reset=0.05)
+    breaker.failure(PREFIX)
+    with pytest.raises(CircuitOpenError):
+        breaker.before(PREFIX)
+
+    time.sleep(0.06)
+    breaker.before(PREFIX)
+    # Everyone else waits while the trial is out
+    with pytest.raises(CircuitOpenError):
+        breaker.before(PREFIX)
+
+    # A failed trial shuts the BMC out again
+    breaker.failure(PREFIX)
+    with pytest.raises(CircuitOpenError):
+        breaker.before(PREFIX)
+
+    time.sleep(0.06)
+    breaker.before(PREFIX)
+    breaker.success(PREFIX)
+    breaker.before(PREFIX)
+    breaker.before(PREFIX)
+
+
+def test_bypassed_requests_neither_wait_nor_count():
+    breaker = CircuitBreaker(failures=1, reset=60)
+    with breaker.bypassed():
+        breaker.failure(PREFIX)
+    breaker.before(PREFIX)
+
+    breaker.failure(PREFIX)
+    with breaker.bypassed():
+        breaker.before(PREFIX)
+    with pytest.raises(CircuitOpenError):
+        breaker.before(PREFIX)
+
+
+def test_retries_count_as_one_failure(store):
+    breaker = CircuitBreaker(failures=2, reset=60)
+    cached = session(store, breaker, retries=3)
+    url = closed_port_url()
+
+    with pytest.raises(Exception) as info:
+        cached.get(url, False, {})
+    assert not isinstance(info.value, CircuitOpenError)
+
+    with pytest.raises(Exception) as info:
+        cached.get(url, False, {})
+    assert not isinstance(info.value, CircuitOpenError)
+
+    with pytest.raises(CircuitOpenError):
+        cached.get(url, False, {})
+
+
+def test_a_bmc_which_answers_is_trusted_again(bmc, store):
+    breaker = CircuitBreaker(failures=1, reset=0.05)
+    cached = session(store, breaker)
+    url = "https://%s/org/openbmc/" % (bmc.hostname, )
+    prefix = "https://%s/" % (bmc.hostname, )
+
+    breaker.failure(prefix)
+    with pytest.raises(CircuitOpenError):
+        cached.get(url, False, {})
+
+    time.sleep(0.06)
+    # Not logged in, but any answer shows the BMC is up
+    assert cached.get(url, False, {}).status_code == 401
+    assert cached.get(url, False, {}).status_code == 401
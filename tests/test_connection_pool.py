@@ -0,0 +1,71 @@
+"""
+Tests for sharing connection pools with openbmc.OpenBMC.ConnectionPoolManager.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from openbmc.MockOpenBMC import MockOpenBMC
+from openbmc.OpenBMC import ConnectionPoolManager, OpenBMC
+
+
+def test_one_adapter_per_host():
+    manager = ConnectionPoolManager(pool_maxsize=4)
+
+    first = manager.adapter_for("https://bmc1/")
+    assert manager.adapter_for("https://bmc1/") is first
+    assert manager.adapter_for("https://bmc2/") is not first
+    assert first._pool_maxsize == 4
+
+
+def test_least_recently_used_hosts_lose_their_pool():
+    manager = ConnectionPoolManager(max_hosts=2)
+
+    first = manager.adapter_for("https://bmc1/")
+    second = manager.adapter_for("https://bmc2/")
+    # Using bmc1 again makes bmc2 the one to go
+    manager.adapter_for("https://bmc1/")
+    manager.adapter_for("https://bmc3/")
+
+    assert manager.adapter_for("https://bmc1/") is first
+    assert manager.adapter_for("https://bmc2/") is not second
+
+
+def test_configure_affects_new_pools():
+    manager = ConnectionPoolManager()
+    manager.configure(pool_maxsize=2, pool_block=True)
+
+    adapter = manager.adapter_for("https://bmc1/")
+    assert adapter._pool_maxsize == 2
+    assert adapter._pool_block
+
+
+def test_instances_share_a_pool_per_bmc(bmc, store):
+    other = MockOpenBMC().start()
+    try:
+        first = OpenBMC(bmc.hostname, bmc.user, bmc.password, True,
+                        store=store)
+        second = OpenBMC(bmc.hostname, bmc.user, bmc.password, True,
+                         store=store)
+        third = OpenBMC(other.hostname, other.user, other.password, True,
+                        store=store)
+    finally:
+        other.stop()
+
+    def adapter(ob):
+        return ob.session.session.get_adapter("https://%s/" % (ob.hostname, ))
+
+    assert adapter(first) is adapter(second)
+    assert adapter(first) is not adapter(third)
+    # Each still logged in with a session of its own
+    assert first.session.get_cookies() != second.session.get_cookies()
@@ -0,0 +1,77 @@
+"""
+Tests for reusing /org/openbmc/control enumerations in openbmc.OpenBMC.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=redefined-outer-name
+
+import time
+
+import pytest
+
+from openbmc.OpenBMC import OpenBMC
+
+ENUMERATE = "/org/openbmc/control/enumerate"
+
+
+@pytest.fixture
+def ob(bmc, store):
+    return OpenBMC(bmc.hostname, bmc.user, bmc.password, True, store=store)
+
+
+def enumerations(seen):
+    return len([info for info in seen
+                if info.method == "GET" and info.endpoint == ENUMERATE])
+
+
+def test_enumeration_is_reused(ob, requests_seen):
+    assert ob.get_power_state() == 0
+    assert ob.get_power_state() == 0
+    assert enumerations(requests_seen) == 1
+
+
+def test_ttl_zero_turns_cache_off(ob, requests_seen):
+    ob.set_control_cache_ttl(0)
+    ob.get_power_state()
+    ob.get_power_state()
+    assert enumerations(requests_seen) == 2
+
+
+def test_enumeration_expires(ob, requests_seen):
+    ob.set_control_cache_ttl(0.2)
+    ob.get_power_state()
+    ob.get_power_state()
+    time.sleep(0.3)
+    ob.get_power_state()
+    assert enumerations(requests_seen) == 2
+
+
+def test_ttl_none_keeps_until_invalidated(ob, requests_seen):
+    ob.set_control_cache_ttl(None)
+    ob.get_power_state()
+    ob.get_power_state()
+    assert enumerations(requests_seen) == 1
+    ob.invalidate_control_cache()
+    ob.get_power_state()
+    assert enumerations(requests_seen) == 2
+
+
+def test_power_change_invalidates(ob, bmc, requests_seen):
+    assert ob.get_power_state() == 0
+    ob.power_on()
+    assert bmc.objects["/org/openbmc/control/power0"]["state"] == 1
+    seen = enumerations(requests_seen)
+    assert ob.get_power_state() == 1
+    assert enumerations(requests_seen) == seen + 1
@@ -0,0 +1,125 @@
+"""
+Tests for running openBmcTool commands in a resident openbmc.Daemon.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=redefined-outer-name
+
+import os
+import stat
+import threading
+
+import pytest
+
+from openbmc.Daemon import Daemon, forward
+
+
+@pytest.fixture
+def socket_path(tmpdir):
+    return str(tmpdir.join("daemon.sock"))
+
+
+def serve(daemon):
+    thread = threading.Thread(target=daemon.serve)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def test_forward_round_trip(socket_path):
+    def handler(request):
+        return {"rc": 3,
+                "stdout": " ".join(request["argv"]),
+                "stderr": request["cwd"]}
+
+    daemon = Daemon(handler, socket_path=socket_path).listen()
+    thread = serve(daemon)
+    try:
+        assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+        assert forward(["get_power_state", "x"], socket_path) == {
+            "rc": 3, "stdout": "get_power_state x", "stderr": os.getcwd()}
+    finally:
+        daemon.stop()
+        thread.join(5)
+
+    assert not os.path.exists(socket_path)
+
+
+def test_forward_without_daemon(socket_path):
+    assert forward(["get_power_state"], socket_path) is None
+
+
+def test_handler_failure_is_reported(socket_path):
+    def handler(request):
+        raise RuntimeError("broken %s" % (request["argv"][0], ))
+
+    daemon = Daemon(handler, socket_path=socket_path).listen()
+    thread = serve(daemon)
+    try:
+        reply = forward(["show_memory"], socket_path)
+    finally:
+        daemon.stop()
+        thread.join(5)
+
+    assert reply["rc"] == 1
+    assert "RuntimeError: broken show_memory" in reply["stderr"]
+
+
+def test_only_one_daemon_listens(socket_path):
+    daemon = Daemon(lambda request: {}, socket_path=socket_path).listen()
+    try:
+        with pytest.raises(OSError):
+            Daemon(lambda request: {}, socket_path=socket_path).listen()
+    finally:
+        daemon.stop()
+        daemon.serve()
+
+
+def test_idle_daemon_exits(socket_path):
+    daemon = Daemon(lambda request: {},
+                    socket_path=socket_path,
+                    idle_timeout=0.1)
+    thread = serve(daemon)
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert not os.path.exists(socket_path)
+
+
+def test_tool_commands_share_a_login(bmc, tool, socket_path):
+    daemon = tool.start("daemon", "--socket", socket_path,
+                        "--idle-timeout", "60",
+                        login=False)
+    try:
+        assert daemon.stdout.readline().decode("utf-8").startswith(
+            "Listening on")
+
+        env = {"OPENBMC_DAEMON": socket_path}
+        for _ in range(2):
+            (out, _) = tool("--online", "--no-session-cache",
+                            "get_power_state",
+                            env=env)
+            assert out.strip() == "0"
+        assert bmc.stats()["logins"] == 1
+
+        # A bad command comes back with its status
+        bmc.fail_next(2, 500)
+        tool("--online", "--no-session-cache", "get_power_state",
+             env=env, status=1)
+    finally:
+        daemon.terminate()
+        daemon.communicate()
+
+    assert not os.path.exists(socket_path)
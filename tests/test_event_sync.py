@@ -0,0 +1,108 @@
+"""
+Tests for copying event records with openbmc.EventSync.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=redefined-outer-name
+
+import json
+
+import pytest
+
+from openbmc.EventSync import EventSync
+from openbmc.MockOpenBMC import event_record
+from openbmc.OpenBMC import EVENTS_PATH, OpenBMC, PrivateJsonFile
+
+
+@pytest.fixture
+def sync(bmc, store, tmpdir):
+    ob = OpenBMC(bmc.hostname, bmc.user, bmc.password, True, store=store)
+    return EventSync(ob,
+                     log_filename=str(tmpdir.join("events.ndjson")),
+                     state_filename=str(tmpdir.join("events.json")))
+
+
+def ids(events):
+    return [ident for (ident, _, _) in events]
+
+
+def remove_events(bmc, numbers):
+    for number in numbers:
+        del bmc.objects["%s%d" % (EVENTS_PATH, number)]
+
+
+def clear_and_log(bmc, count):
+    """Clear the mock's event log and log count new, different events"""
+
+    remove_events(bmc, [int(path[len(EVENTS_PATH):])
+                        for path in list(bmc.objects)
+                        if path.startswith(EVENTS_PATH)])
+    for number in range(1, count + 1):
+        bmc.add_event(dict(event_record(number), message="After clearing"))
+
+
+def test_only_new_events_are_copied(bmc, sync):
+    assert ids(sync.sync()) == [1, 2, 3, 4]
+    assert sync.sync() == []
+
+    bmc.add_event()
+    assert ids(sync.sync()) == [5]
+    assert sync.last_seen() == 5
+
+    with open(sync.log_filename) as fp:
+        assert [json.loads(line)["id"] for line in fp] == [1, 2, 3, 4, 5]
+
+
+def test_cleared_log_below_last_seen(bmc, sync):
+    sync.sync()
+    clear_and_log(bmc, 2)
+
+    assert ids(sync.sync()) == [1, 2]
+
+
+def test_cleared_log_past_last_seen(bmc, sync):
+    sync.sync()
+    clear_and_log(bmc, 6)
+
+    events = sync.sync()
+    assert ids(events) == [1, 2, 3, 4, 5, 6]
+    assert events[0][2]["message"] == "After clearing"
+
+
+def test_cleared_log_with_lower_oldest(bmc, sync):
+    remove_events(bmc, [1, 2])
+    assert ids(sync.sync()) == [3, 4]
+
+    # The record at the highest ID copied is the same, but not the oldest
+    remove_events(bmc, [3, 4])
+    for number in range(1, 6):
+        bmc.add_event(event_record(number))
+
+    assert ids(sync.sync()) == [1, 2, 3, 4, 5]
+
+
+def test_full_log_dropping_old_records(bmc, sync):
+    sync.sync()
+    remove_events(bmc, [1, 2])
+    bmc.add_event()
+
+    assert ids(sync.sync()) == [5]
+
+
+def test_state_of_older_versions(bmc, sync):
+    # Only the highest ID used to be kept
+    PrivateJsonFile(sync.state.filename).update(bmc.hostname, 3)
+
+    assert ids(sync.sync()) == [4]
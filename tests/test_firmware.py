@@ -0,0 +1,112 @@
+"""
+Tests for uploading firmware images with openbmc.Firmware.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=redefined-outer-name
+
+import hashlib
+import json
+import os
+
+import pytest
+
+from openbmc.Firmware import FirmwareImage, UploadProgress, upload_fleet
+from openbmc.MockOpenBMC import MockOpenBMC
+from openbmc.OpenBMC import OpenBMC
+
+SIZE = 10000
+
+
+@pytest.fixture
+def image_file(tmpdir):
+    filename = str(tmpdir.join("bios.img"))
+    with open(filename, "wb") as fp:
+        fp.write(os.urandom(SIZE))
+    return filename
+
+
+def contents(filename):
+    with open(filename, "rb") as fp:
+        return fp.read()
+
+
+def test_stream_reads_the_image_in_pieces(image_file):
+    counted = []
+    with FirmwareImage(image_file) as image:
+        stream = image.stream(counted.append, chunk_size=3000)
+        assert len(stream) == SIZE
+
+        pieces = [bytes(piece) for piece in stream]
+        assert [len(piece) for piece in pieces] == [3000, 3000, 3000, 1000]
+        assert b"".join(pieces) == contents(image_file)
+
+        # Sending again after a retry is not counted again
+        stream.seek(0)
+        assert bytes(stream.read()) == contents(image_file)[:3000]
+        assert sum(counted) == SIZE
+
+    assert stream.read() == b""
+
+
+def test_empty_image_is_refused(tmpdir):
+    filename = str(tmpdir.join("empty.img"))
+    open(filename, "wb").close()
+
+    with pytest.raises(ValueError):
+        FirmwareImage(filename)
+
+
+def test_upload_fleet(bmc, image_file):
+    other = MockOpenBMC().start()
+    mocks = {bmc.hostname: bmc, other.hostname: other}
+
+    def connect(hostname):
+        return OpenBMC(hostname, bmc.user, bmc.password, True)
+
+    progress = UploadProgress()
+    try:
+        with FirmwareImage(image_file) as image:
+            results = list(upload_fleet(connect,
+                                        sorted(mocks),
+                                        image,
+                                        name="new.img",
+                                        update=True,
+                                        progress=progress,
+                                        chunk_size=4096))
+    finally:
+        other.stop()
+
+    digest = hashlib.sha256(contents(image_file)).hexdigest()
+    assert sorted(result.hostname for result in results) == sorted(mocks)
+    for result in results:
+        assert result.ok(), result.error
+        assert result.value["stored"] == "/tmp/images/new.img"
+        assert result.value["bytes"] == SIZE
+        assert mocks[result.hostname].images == {
+            "new.img": {"size": SIZE, "sha256": digest}}
+        assert mocks[result.hostname].objects[
+            "/org/openbmc/control/flash/bios"]["status"] == "Flash Done"
+    assert progress.sent == 2 * SIZE
+
+
+def test_tool_flash_bios(bmc, tool, image_file):
+    (out, _) = tool("--online", "flash_bios", image_file, "--upload-only")
+
+    (line, ) = [json.loads(text) for text in out.splitlines()]
+    assert line["hostname"] == bmc.hostname
+    assert line["stored"] == "/tmp/images/bios.img"
+    assert bmc.images["bios.img"]["size"] == SIZE
+    assert bmc.objects["/org/openbmc/control/flash/bios"]["status"] == "Idle"
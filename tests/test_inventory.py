@@ -0,0 +1,78 @@
+"""
+Tests for openbmc.Inventory and the show_memory command built on it.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from openbmc.Inventory import Inventory
+from openbmc.MockOpenBMC import build_objects
+from openbmc.OpenBMC import INVENTORY_PATH, OpenBMC
+
+BOARD = "/org/openbmc/inventory/system/chassis/motherboard/"
+
+
+def inventory():
+    return Inventory(build_objects(dimms=8).items())
+
+
+def test_prefix_suffix_and_glob():
+    objects = inventory()
+
+    dimms = [path for (path, _) in objects.glob(INVENTORY_PATH + "**/dimm*")]
+    assert dimms == sorted(BOARD + "dimm%d" % (i, ) for i in range(8))
+
+    assert [path for (path, _) in objects.prefix(BOARD + "dimm1")] == [
+        BOARD + "dimm1", BOARD + "dimm1/event"]
+    assert all(path.endswith("dimm3")
+               for (path, _) in objects.suffix("dimm3"))
+    assert objects.glob("/nothing/**") == []
+
+
+def test_find_by_flags_and_replacing_an_object():
+    objects = inventory()
+    objects.add(BOARD + "dimm2", dict(objects[BOARD + "dimm2"],
+                                      present="False"))
+    objects.add(BOARD + "dimm5", dict(objects[BOARD + "dimm5"],
+                                      fault="True"))
+
+    found = objects.find(glob=INVENTORY_PATH + "**/dimm*",
+                         present=True,
+                         fault=False)
+
+    assert [path for (path, _) in found] == [
+        BOARD + "dimm%d" % (i, ) for i in (0, 1, 3, 4, 6, 7)]
+    assert [path for (path, _) in objects.find(present=False)] == [
+        BOARD + "dimm2"]
+
+
+def test_get_inventory_is_shared_until_refreshed(bmc, store):
+    ob = OpenBMC(bmc.hostname, bmc.user, bmc.password, True, store=store)
+
+    first = ob.get_inventory()
+    assert ob.get_inventory() is first
+    assert ob.get_inventory(refresh=True) is not first
+    assert len(first) > 0
+
+
+def test_show_memory_leaves_out_absent_and_faulty_dimms(bmc, tool):
+    bmc.objects[BOARD + "dimm1"]["present"] = "False"
+    bmc.objects[BOARD + "dimm2"]["fault"] = "True"
+
+    (out, _) = tool("--online", "show_memory")
+
+    shown = [line for line in out.splitlines() if line.startswith("/")]
+    assert BOARD + "dimm0" in shown
+    assert BOARD + "dimm1" not in shown
+    assert BOARD + "dimm2" not in shown
+    assert all(not line.endswith("/event") for line in shown)
@@ -0,0 +1,108 @@
+"""
+Tests for openbmc.InventoryDatabase.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=redefined-outer-name
+
+import json
+
+import pytest
+
+from openbmc.InventoryDatabase import InventoryDatabase
+from openbmc.MockOpenBMC import build_objects
+
+BOARD = "/org/openbmc/inventory/system/chassis/motherboard/"
+
+
+@pytest.fixture
+def database(tmpdir):
+    inventory_database = InventoryDatabase(str(tmpdir.join("inventory.db")))
+    yield inventory_database
+    inventory_database.close()
+
+
+def fru_count(objects):
+    return len([properties for properties in objects.values()
+                if "fru_type" in properties])
+
+
+def test_ingest_counts_changes(database):
+    objects = build_objects(dimms=4, cpus=2, events=0)
+    counts = database.ingest("bmc1", objects.items())
+    assert counts == {"added": fru_count(objects), "changed": 0,
+                      "removed": 0, "unchanged": 0}
+
+    objects[BOARD + "dimm0"]["fault"] = "True"
+    del objects[BOARD + "dimm3"]
+    counts = database.ingest("bmc1", objects.items())
+    assert counts == {"added": 0, "changed": 1, "removed": 1,
+                      "unchanged": fru_count(objects) - 1}
+
+
+def test_query(database):
+    objects = build_objects(dimms=2, cpus=1, events=0)
+    database.ingest("bmc1", objects.items())
+    objects[BOARD + "dimm1"]["fault"] = "True"
+    database.ingest("bmc2", objects.items())
+
+    dimms = database.query(fru_type="DIMM")
+    assert [(fru["hostname"], fru["path"]) for fru in dimms] == [
+        ("bmc1", BOARD + "dimm0"),
+        ("bmc1", BOARD + "dimm1"),
+        ("bmc2", BOARD + "dimm0"),
+        ("bmc2", BOARD + "dimm1")]
+    # Padding is stripped from the columns but not the properties
+    assert dimms[0]["model"] == "M393B2G70DB0-YK0"
+    assert dimms[0]["properties"] == objects[BOARD + "dimm0"]
+
+    faulty = database.query(fault="True")
+    assert [(fru["hostname"], fru["path"]) for fru in faulty] == [
+        ("bmc2", BOARD + "dimm1")]
+
+    assert database.query(model="M393B*", hostname="bmc1", path="*dimm1") \
+        == [dimms[1]]
+    assert database.query(fru_type="GPU") == []
+
+    with pytest.raises(ValueError):
+        database.query(properties="*")
+
+
+def test_forget(database):
+    objects = build_objects(dimms=1, cpus=1, events=0)
+    database.ingest("bmc1", objects.items())
+    database.ingest("bmc2", objects.items())
+
+    database.forget("bmc1")
+    assert list(database.hosts()) == ["bmc2"]
+    assert set(fru["hostname"] for fru in database.query()) == set(["bmc2"])
+
+
+def test_tool_ingests_and_queries(bmc, tool, tmpdir):
+    filename = str(tmpdir.join("inventory.db"))
+
+    (out, _) = tool("--online", "ingest_inventory", "--database", filename)
+    assert out.strip() == "%d added, 0 changed, 0 removed, 0 unchanged" % (
+        fru_count(bmc.objects), )
+
+    (out, _) = tool("query_inventory", "--database", filename,
+                    "--fru-type", "DIMM", "--serial", "*01",
+                    login=False)
+    frus = [json.loads(line) for line in out.splitlines()]
+    assert [fru["path"] for fru in frus] == [BOARD + "dimm1"]
+
+    (out, _) = tool("query_inventory", "--database", filename,
+                    "--hosts-only", login=False)
+    assert out.split() == [bmc.hostname]
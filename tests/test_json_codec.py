@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for choosing a JSON library with openbmc.JsonCodec.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=redefined-outer-name
+
+import json
+
+import pytest
+
+from openbmc.JsonCodec import (CODECS, decode, encode, get_codec, make_codec,
+                               set_codec)
+from openbmc.OpenBMC import OpenBMC
+
+DOCUMENT = {"data": {"/org/openbmc/control/power0": {"state": 1,
+                                                      "pgood": 0.5,
+                                                      "name": u"näme"}},
+            "message": "200 OK",
+            "status": "ok"}
+
+
+@pytest.fixture(autouse=True)
+def restore_codec():
+    yield
+    set_codec(None)
+
+
+def installed(name):
+    try:
+        return make_codec(name)
+    except ValueError:
+        pytest.skip("%s is not installed" % (name, ))
+
+
+@pytest.mark.parametrize("name", CODECS)
+def test_codec_round_trip(name):
+    codec = installed(name)
+    text = json.dumps(DOCUMENT)
+
+    assert codec.loads(text) == DOCUMENT
+    assert codec.loads(text.encode("utf-8")) == DOCUMENT
+    assert json.loads(codec.dumps(DOCUMENT)) == DOCUMENT
+    assert isinstance(codec.dumps(DOCUMENT), type(json.dumps(DOCUMENT)))
+    # Paths are not escaped
+    assert "\\/" not in codec.dumps(DOCUMENT)
+
+    with pytest.raises(ValueError):
+        codec.loads(b'{"data": ')
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        make_codec("yaml")
+    with pytest.raises(ValueError):
+        set_codec("yaml")
+
+
+def test_set_codec():
+    set_codec("json")
+    assert get_codec().name == "json"
+    assert decode(b'{"a": [1]}') == {"a": [1]}
+    assert json.loads(encode({"a": [1]})) == {"a": [1]}
+
+    # None goes back to the fastest one installed
+    set_codec(None)
+    fastest = [name for name in CODECS if get_codec().name == name]
+    for name in CODECS[:CODECS.index(fastest[0])]:
+        with pytest.raises(ValueError):
+            make_codec(name)
+
+
+def test_responses_decode_the_same(bmc, store):
+    ob = OpenBMC(bmc.hostname, bmc.user, bmc.password, True, store=store)
+
+    answers = []
+    for name in CODECS:
+        try:
+            set_codec(name)
+        except ValueError:
+            continue
+        answers.append(ob.enumerate("/org/openbmc/control"))
+
+    assert answers[-1]["/org/openbmc/control/power0"]["state"] == 0
+    assert all(answer == answers[-1] for answer in answers)
+
+
+def test_tool_refuses_unknown_codec(tool):
+    (_, err) = tool("--online", "--json-codec", "yaml", "get_power_state",
+                    status=2)
+    assert "--json-codec: invalid choice: 'yaml'" in err
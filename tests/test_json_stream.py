@@ -0,0 +1,87 @@
+"""
+Tests for openbmc.JsonStream.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import pytest
+
+from openbmc.JsonStream import iter_chunks, iter_members, path_matcher
+
+DATA = {"/org/openbmc/control/power0": {"state": 1, "pgood": 1},
+        "/org/openbmc/control/chassis0": {"uuid": "24340d83",
+                                          "reboot": 0},
+        "/org/openbmc/control/flash/bios": {"status": "Idle",
+                                            "version": "v1.0"},
+        u"/org/openbmc/quoted\"{[": {"name": u"\\ \" } ] caf\u00e9",
+                                    "list": [1, [2.5, None], {"x": True}],
+                                    "empty": {}}}
+
+
+def document(data=None, before=None):
+    """Return the bytes of a response as the BMC sends it"""
+
+    response = {"data": DATA if data is None else data,
+                "message": "200 OK",
+                "status": "ok"}
+    text = json.dumps(response, indent=1)
+    if before is not None:
+        # Put another member ahead of data
+        text = '{"before": %s, %s' % (json.dumps(before), text[1:], )
+    return text.encode("utf-8")
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64 * 1024])
+def test_every_member_whatever_the_chunk_size(size):
+    assert dict(iter_members(iter_chunks(document(), size))) == DATA
+
+
+def test_members_before_data_are_skipped():
+    before = {"data": {"not": "this one"}, "list": ["}", "{"]}
+    members = iter_members(iter_chunks(document(before=before), 3))
+    assert dict(members) == DATA
+
+
+def test_only_wanted_entries_are_built():
+    want = path_matcher(prefix="/org/openbmc/control/",
+                        suffix=("0", "bios"),
+                        match=lambda path: "power" not in path)
+    members = iter_members(iter_chunks(document(), 5), want=want)
+    assert sorted(path for (path, _) in members) == [
+        "/org/openbmc/control/chassis0",
+        "/org/openbmc/control/flash/bios"]
+
+
+def test_path_matcher_without_tests_wants_everything():
+    assert path_matcher() is None
+
+
+def test_empty_data():
+    assert list(iter_members(iter_chunks(document(data={})))) == []
+    assert list(iter_members(iter_chunks(b"{}"))) == []
+
+
+def test_data_which_is_not_an_object_is_skipped():
+    assert list(iter_members(iter_chunks(document(data=[1, 2])))) == []
+
+
+@pytest.mark.parametrize("content", [b'{"data": {"a": 1',
+                                     b'{"data": {"a" 1}}',
+                                     b'["data"]',
+                                     b''])
+def test_bad_documents_raise_value_error(content):
+    with pytest.raises(ValueError):
+        list(iter_members(iter_chunks(content, 4)))
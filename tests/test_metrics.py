@@ -0,0 +1,116 @@
+"""
+Tests for request hooks and openbmc.Metrics.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=redefined-outer-name
+
+import json
+
+import pytest
+
+from openbmc.Metrics import Metrics
+from openbmc.OpenBMC import (EVENTS_PATH, OpenBMC, RequestInfo,
+                             add_request_hook, endpoint_of,
+                             remove_request_hook)
+
+
+@pytest.fixture
+def metrics():
+    installed = Metrics(buckets=(0.1, 1)).install()
+    yield installed
+    installed.uninstall()
+
+
+def test_endpoint_of():
+    assert endpoint_of("https://bmc//org/openbmc/records/events/17") == \
+        "/org/openbmc/records/events/{id}"
+    assert endpoint_of("https://bmc:8443/org/openbmc/control/power0") == \
+        "/org/openbmc/control/power0"
+    assert endpoint_of("https://bmc/login?x=1") == "/login"
+    assert endpoint_of("https://bmc") == "/"
+
+
+def test_counts_from_request_infos():
+    metrics = Metrics(buckets=(0.1, 1))
+    url = "https://bmc/org/openbmc/control/enumerate"
+    metrics(RequestInfo("GET", url, 200, 0.05, size=10))
+    metrics(RequestInfo("GET", url, 200, 0.5, size=20))
+    metrics(RequestInfo("GET", url, None, 2.0, error="ConnectionError"))
+    metrics(RequestInfo("POST", "https://bmc/login", 200, 0.01))
+
+    data = metrics.to_dict()
+    assert data["requests"][0] == {"method": "GET",
+                                   "endpoint": "/org/openbmc/control/enumerate",
+                                   "status": "200",
+                                   "cache": "miss",
+                                   "count": 2}
+    assert data["errors"][0]["error"] == "ConnectionError"
+    assert data["latency"][0]["buckets"] == [[0.1, 1], [1, 2]]
+    assert data["latency"][0]["count"] == 3
+    assert data["response_bytes"][0]["bytes"] == 30
+    assert data["host_requests"] == {"bmc": 4}
+    assert data["logins"] == {"bmc": 1}
+
+    text = metrics.to_prometheus()
+    assert ('openbmc_request_duration_seconds_bucket{endpoint='
+            '"/org/openbmc/control/enumerate",le="+Inf",method="GET"} 3'
+            in text.splitlines())
+    assert 'openbmc_logins_total{hostname="bmc"} 1' in text.splitlines()
+
+    rows = metrics.endpoints()
+    assert rows[0]["endpoint"] == "/org/openbmc/control/enumerate"
+    assert abs(sum(row["share"] for row in rows) - 1) < 1e-9
+    assert "/login" in metrics.to_summary()
+
+
+def test_requests_to_the_mock_are_counted(bmc, store, metrics):
+    ob = OpenBMC(bmc.hostname, bmc.user, bmc.password, True, store=store)
+    ob.get(EVENTS_PATH + "1")
+    ob.get(EVENTS_PATH + "2")
+    metrics.uninstall()
+    ob.get(EVENTS_PATH + "3")
+
+    data = metrics.to_dict()
+    assert data["logins"] == {bmc.hostname: 1}
+    assert [(row["endpoint"], row["count"]) for row in data["requests"]
+            if row["method"] == "GET"] == [
+                ("/org/openbmc/records/events/{id}", 2)]
+
+
+def test_a_failing_hook_does_not_fail_requests(bmc, store, requests_seen):
+    def broken(_):
+        raise RuntimeError("broken hook")
+
+    add_request_hook(broken)
+    try:
+        ob = OpenBMC(bmc.hostname, bmc.user, bmc.password, True,
+                     store=store)
+        assert ob.get_power_state() == 0
+    finally:
+        remove_request_hook(broken)
+
+    # The hooks after it were still called
+    assert [info.endpoint for info in requests_seen][0] == "/login"
+
+
+def test_tool_writes_metrics(bmc, tool, tmpdir):
+    filename = str(tmpdir.join("metrics.json"))
+    tool("--online", "--metrics", filename, "--metrics-format", "json",
+         "get_power_state")
+
+    with open(filename) as fp:
+        data = json.load(fp)
+    assert data["logins"] == {bmc.hostname: 1}
@@ -0,0 +1,200 @@
+"""
+Tests for openbmc.PowerScheduler against several MockOpenBMCs.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=redefined-outer-name
+
+import json
+import socket
+
+import pytest
+
+from openbmc.MockOpenBMC import MockOpenBMC
+from openbmc.OpenBMC import OpenBMC
+from openbmc.PowerScheduler import PowerJournal, PowerScheduler
+
+POWER_PATH = "/org/openbmc/control/power0"
+
+
+class Rack(object):
+    """Several mocks, some of which can be made to refuse the login"""
+
+    def __init__(self, count, store):
+        self.mocks = [MockOpenBMC().start() for _ in range(count)]
+        self.by_hostname = dict((mock.hostname, mock) for mock in self.mocks)
+        self.hostnames = [mock.hostname for mock in self.mocks]
+        self.store = store
+        self.broken = set()
+
+    def connect(self, hostname):
+        """Log in to hostname, with the wrong password if it is broken"""
+
+        mock = self.by_hostname[hostname]
+        password = mock.password
+        if hostname in self.broken:
+            password = "wrong"
+        return OpenBMC(hostname, mock.user, password, True, store=self.store)
+
+    def power(self, hostname):
+        """Return the power state of hostname's mock"""
+
+        return self.by_hostname[hostname].objects[POWER_PATH]["state"]
+
+    def stop(self):
+        for mock in self.mocks:
+            mock.stop()
+
+
+@pytest.fixture
+def rack(store):
+    """Four MockOpenBMCs"""
+
+    four = Rack(4, store)
+    yield four
+    four.stop()
+
+
+def scheduler(rack, operation="on", **kwargs):
+    kwargs.setdefault("concurrency", 2)
+    kwargs.setdefault("retry_delay", 0.01)
+    return PowerScheduler(rack.connect, operation, **kwargs)
+
+
+def test_every_host_is_switched(rack):
+    results = list(scheduler(rack, wave_size=2).run(rack.hostnames))
+
+    assert sorted(result.hostname for result in results) == sorted(
+        rack.hostnames)
+    assert all(result.ok and not result.skipped for result in results)
+    assert [rack.power(hostname) for hostname in rack.hostnames] == [1] * 4
+
+
+def test_a_failed_host_is_retried(rack):
+    rack.broken.add(rack.hostnames[0])
+
+    results = dict((result.hostname, result)
+                   for result in scheduler(rack, retries=2).run(
+                       rack.hostnames))
+
+    failed = results[rack.hostnames[0]]
+    assert not failed.ok
+    assert failed.attempts == 3
+    assert "401" in failed.error
+    assert rack.power(rack.hostnames[0]) == 0
+    assert all(results[hostname].ok for hostname in rack.hostnames[1:])
+
+
+def test_max_failures_stops_starting_hosts_within_a_wave(rack):
+    rack.broken.update(rack.hostnames[:2])
+
+    results = list(scheduler(rack,
+                             concurrency=1,
+                             max_failures=1).run(rack.hostnames))
+
+    assert [result.hostname for result in results] == rack.hostnames
+    assert [result.skipped for result in results] == [False, False,
+                                                      True, True]
+    assert not any(result.ok for result in results)
+    assert [rack.power(hostname) for hostname in rack.hostnames] == [0] * 4
+
+
+def test_max_failures_stops_later_waves(rack):
+    rack.broken.add(rack.hostnames[0])
+
+    results = list(scheduler(rack,
+                             concurrency=1,
+                             wave_size=1,
+                             max_failures=0).run(rack.hostnames))
+
+    assert [result.skipped for result in results] == [False, True,
+                                                      True, True]
+
+
+def test_a_reset_which_raised_is_not_sent_again(rack):
+    sent = []
+
+    def connect(hostname):
+        ob = rack.connect(hostname)
+        reset = ob.trigger_warm_reset
+
+        def trigger_warm_reset():
+            sent.append(hostname)
+            reset()
+            # The BMC took it but the answer was lost
+            raise socket.timeout("read timed out")
+
+        ob.trigger_warm_reset = trigger_warm_reset
+        return ob
+
+    results = list(PowerScheduler(connect,
+                                  "reset",
+                                  retries=3,
+                                  retry_delay=0.01).run(rack.hostnames[:1]))
+
+    assert len(results) == 1
+    assert not results[0].ok
+    assert results[0].attempts == 1
+    assert sent == rack.hostnames[:1]
+
+
+def test_an_interrupted_rollout_resumes_from_the_journal(rack, tmpdir):
+    journal = PowerJournal(str(tmpdir.join("journal.ndjson")))
+
+    # Stop after the first host, as if interrupted
+    for result in scheduler(rack,
+                            concurrency=1,
+                            wave_size=1,
+                            journal=journal).run(rack.hostnames):
+        assert result.ok
+        break
+
+    first = rack.hostnames[0]
+    assert journal.finished("on") == set([first])
+    assert [rack.power(hostname) for hostname in rack.hostnames] == [1, 0,
+                                                                     0, 0]
+    # A half written last line is ignored
+    with open(journal.filename, "a") as fp:
+        fp.write('{"hostname": "')
+
+    results = list(scheduler(rack, journal=journal).run(rack.hostnames))
+
+    skipped = [result.hostname for result in results if result.skipped]
+    assert skipped == [first]
+    assert all(result.ok for result in results)
+    assert journal.finished("on") == set(rack.hostnames)
+    assert journal.finished("off") == set()
+
+
+def test_a_host_which_failed_is_tried_again_next_run(rack, tmpdir):
+    journal = PowerJournal(str(tmpdir.join("journal.ndjson")))
+    broken = rack.hostnames[0]
+    rack.broken.add(broken)
+
+    list(scheduler(rack, journal=journal).run(rack.hostnames))
+    assert journal.finished("on") == set(rack.hostnames[1:])
+
+    rack.broken.clear()
+    results = list(scheduler(rack, journal=journal).run(rack.hostnames))
+
+    started = [result.hostname for result in results if not result.skipped]
+    assert started == [broken]
+    assert rack.power(broken) == 1
+    assert journal.finished("on") == set(rack.hostnames)
+
+    with open(journal.filename) as fp:
+        entries = [json.loads(line) for line in fp]
+    assert [entry["ok"] for entry in entries
+            if entry["hostname"] == broken] == [False, True]
@@ -0,0 +1,86 @@
+"""
+Tests for the compact records of openbmc.Records.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from openbmc.MockOpenBMC import build_objects, event_record
+from openbmc.OpenBMC import OpenBMC
+from openbmc.Records import (Chassis, Event, Fru, PowerControl,
+                             control_records, events, frus)
+
+BOARD = "/org/openbmc/inventory/system/chassis/motherboard/"
+
+
+def test_fru_round_trip():
+    objects = build_objects(dimms=2, cpus=0, events=0)
+    properties = objects[BOARD + "dimm1"]
+
+    fru = Fru.from_properties(BOARD + "dimm1", properties)
+    assert (fru.fru_type, fru.present, fru.fault) == ("DIMM", True, False)
+    assert fru.model == "M393B2G70DB0-YK0"
+    assert fru.serial == "0x02bb5801"
+    # Empty properties are dropped and the padding is gone
+    expected = dict((name, value) for (name, value) in properties.items()
+                    if value != "")
+    expected["Model Number"] = "M393B2G70DB0-YK0"
+    assert fru.to_properties() == expected
+
+
+def test_records_have_no_dict():
+    fru = Fru("/path", fru_type="DIMM")
+    with pytest.raises(AttributeError):
+        fru.colour = "green"
+    with pytest.raises(TypeError):
+        Fru("/path", colour="green")
+
+
+def test_strings_are_shared():
+    first = Fru.from_properties("/a", {"fru_type": "DI" + "MM"})
+    second = Fru.from_properties("/b", {"fru_type": "DIM" + "M"})
+    assert first.fru_type is second.fru_type
+
+
+def test_events_in_order():
+    items = [("/org/openbmc/records/events/10", event_record(10)),
+             ("/org/openbmc/records/events/9", event_record(9)),
+             ("/org/openbmc/records/events/", {})]
+
+    records = events(items)
+    assert [record.path for record in records] == [
+        "/org/openbmc/records/events/9",
+        "/org/openbmc/records/events/10"]
+    assert records[0].debug_data == bytearray([48, 0, 19, 127, 136, 255])
+    assert records[0].to_properties() == event_record(9)
+    assert records[0] == Event.from_properties(records[0].path,
+                                               event_record(9))
+    assert records[0] != records[1]
+
+
+def test_records_from_the_mock(bmc, store):
+    ob = OpenBMC(bmc.hostname, bmc.user, bmc.password, True, store=store)
+
+    controls = dict((type(record), record)
+                    for record in ob.get_control_records())
+    assert set(controls) == set([PowerControl, Chassis])
+    assert controls[PowerControl].state == 0
+    assert controls[Chassis].uuid == "24340d83aa784d858468993286b390a5"
+
+    assert len(ob.get_frus()) == len(frus(bmc.objects.items()))
+    assert [record.path for record in ob.get_event_records()] == [
+        "/org/openbmc/records/events/%d" % (number, )
+        for number in range(1, 5)]
+    assert control_records([("/org/openbmc/control/bmc0", {})]) == []
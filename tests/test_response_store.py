@@ -0,0 +1,135 @@
+"""
+Tests for openbmc.ResponseStore.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import time
+
+from openbmc.ResponseStore import ResponseStore, body_hash
+
+URL = "https://bmc/org/openbmc/control/enumerate"
+
+
+def body(number, size=100):
+    """Return a response body of size bytes"""
+
+    text = json.dumps({"data": {"n": number, "p": ""}})
+    text = text.replace('""', '"%s"' % ("x" * (size - len(text)), ))
+    return text.encode("utf-8")
+
+
+def url(number):
+    return "%s?%d" % (URL, number, )
+
+
+def fill(store, count):
+    """Put count responses, each used a little later than the one before"""
+
+    for number in range(count):
+        store.put("GET", url(number), None, 200, body(number))
+        time.sleep(0.01)
+
+
+def test_round_trip(store):
+    store.put("GET", URL, None, 200, body(1))
+    store.put("POST", URL, '{"data": []}', 200, body(2))
+
+    assert store.get("GET", URL) == (200, json.loads(body(1).decode()))
+    assert store.get_content("GET", URL) == (200, body(1))
+    assert store.get("POST", URL, '{"data": []}')[1]["data"]["n"] == 2
+    # Different bodies are different requests
+    assert store.get("POST", URL, '{"data": [1]}') is None
+    assert store.get("GET", url(9)) is None
+
+
+def test_login_passwords_are_not_hashed():
+    login = "https://bmc/login"
+    secret = json.dumps({"data": ["root", "s3cret"]})
+    other = json.dumps({"data": ["root", "0penBmc"]})
+
+    assert body_hash(secret, login) == body_hash(other, login)
+    assert body_hash(secret, login) != body_hash(
+        json.dumps({"data": ["admin", "s3cret"]}), login)
+    assert body_hash(secret, login) != hashlib.sha1(
+        secret.encode("utf-8")).hexdigest()
+    # Other requests are told apart by their whole body
+    assert body_hash(secret, URL) != body_hash(other, URL)
+
+
+def test_the_least_recently_used_are_evicted(tmpdir):
+    store = ResponseStore(str(tmpdir.join("r.db")),
+                          max_bytes=350,
+                          compress=False)
+    try:
+        fill(store, 3)
+        # Reading the oldest makes it the most recently used
+        assert store.get("GET", url(0)) is not None
+        time.sleep(0.01)
+
+        store.put("GET", url(3), None, 200, body(3))
+
+        assert store.get_content("GET", url(1)) is None
+        for number in (0, 2, 3):
+            assert store.get_content("GET", url(number)) == (200,
+                                                             body(number))
+    finally:
+        store.close()
+
+
+def test_replacing_a_response_does_not_count_twice(tmpdir):
+    store = ResponseStore(str(tmpdir.join("r.db")),
+                          max_bytes=250,
+                          compress=False)
+    try:
+        fill(store, 2)
+        for _ in range(5):
+            store.put("GET", url(1), None, 200, body(1))
+        assert store.get_content("GET", url(0)) == (200, body(0))
+    finally:
+        store.close()
+
+
+def test_when_used_is_kept_across_reopening(tmpdir):
+    filename = str(tmpdir.join("r.db"))
+
+    store = ResponseStore(filename, max_bytes=350, compress=False)
+    fill(store, 3)
+    assert store.get("GET", url(0)) is not None
+    store.close()
+
+    time.sleep(0.01)
+    store = ResponseStore(filename, max_bytes=350, compress=False)
+    try:
+        store.put("GET", url(3), None, 200, body(3))
+        assert store.get_content("GET", url(0)) is not None
+        assert store.get_content("GET", url(1)) is None
+    finally:
+        store.close()
+
+
+def test_evicted_responses_leave_the_memory_cache(tmpdir):
+    store = ResponseStore(str(tmpdir.join("r.db")),
+                          max_bytes=150,
+                          compress=False)
+    try:
+        store.put("GET", url(0), None, 200, body(0))
+        assert store.get("GET", url(0)) is not None
+        time.sleep(0.01)
+        store.put("GET", url(1), None, 200, body(1))
+        assert store.get("GET", url(0)) is None
+    finally:
+        store.close()
@@ -0,0 +1,127 @@
+"""
+Tests for sampling sensors into ring buffers with openbmc.Sampler.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import array
+import json
+import os
+
+import pytest
+
+from openbmc.OpenBMC import OpenBMC
+from openbmc.Sampler import POWER_STATE_SENSOR, HostSamples, Sampler
+
+AMBIENT = "temperature/ambient"
+PROGRESS = "host/BootProgress"
+
+
+def test_ring_buffer_keeps_the_last_samples():
+    host = HostSamples(3)
+    for when in range(5):
+        host.add(float(when), {"t": when * 10.0})
+
+    assert host.samples("t") == [(2.0, 20.0), (3.0, 30.0), (4.0, 40.0)]
+    assert host.samples("t", start=3) == [(3.0, 30.0), (4.0, 40.0)]
+    assert host.samples("missing") == []
+
+
+def test_missing_readings_are_left_out():
+    host = HostSamples(4)
+    host.add(1.0, {"a": 1.0})
+    host.add(2.0, {"b": 2.0})
+    host.add(3.0, {"a": 3.0, "b": 3.0})
+
+    assert host.samples("a") == [(1.0, 1.0), (3.0, 3.0)]
+    assert host.samples("b") == [(2.0, 2.0), (3.0, 3.0)]
+
+
+def test_window_of_numbers_and_strings():
+    sampler = Sampler(capacity=10)
+    sampler.record("bmc", 0.0, {AMBIENT: 20.0, PROGRESS: "Off"})
+    sampler.record("bmc", 10.0, {AMBIENT: 30.0, PROGRESS: "Booting"})
+    sampler.record("bmc", 20.0, {AMBIENT: 25.0, PROGRESS: "Booting"})
+
+    assert sampler.window("bmc", AMBIENT) == {"hostname": "bmc",
+                                              "sensor": AMBIENT,
+                                              "count": 3,
+                                              "min": 20.0,
+                                              "max": 30.0,
+                                              "mean": 25.0,
+                                              "rate": 0.25}
+    assert sampler.window("bmc", PROGRESS, start=5) == {
+        "hostname": "bmc",
+        "sensor": PROGRESS,
+        "count": 2,
+        "values": ["Booting"],
+        "last": "Booting"}
+    assert sampler.window("other", AMBIENT)["count"] == 0
+
+
+def test_sample_the_mock(bmc, store):
+    ob = OpenBMC(bmc.hostname, bmc.user, bmc.password, True, store=store)
+    sampler = Sampler(capacity=4)
+
+    sampler.run([ob], interval=0, rounds=2)
+    bmc.set_power(1)
+    assert sampler.sample([ob]) == []
+
+    assert sampler.window(bmc.hostname, AMBIENT)["mean"] == 24.5
+    assert sampler.window(bmc.hostname, "host/cpu0/OccActive")["max"] == 1
+    power = sampler.window(bmc.hostname, POWER_STATE_SENSOR)
+    assert (power["count"], power["min"], power["max"]) == (3, 0, 1)
+    assert sampler.window(bmc.hostname, PROGRESS)["last"] == \
+        "FW Progress, Starting OS"
+
+
+def test_exports(tmpdir):
+    sampler = Sampler(capacity=4)
+    sampler.record("bmc", 1.0, {AMBIENT: 20.5, PROGRESS: 'Say "hi"'})
+    sampler.record("bmc", 2.0, {AMBIENT: 21.0})
+
+    filename = str(tmpdir.join("samples.csv"))
+    with open(filename, "w") as fp:
+        sampler.export_csv(fp)
+    with open(filename) as fp:
+        assert fp.read().splitlines() == [
+            "hostname,sensor,time,value",
+            'bmc,host/BootProgress,1.000,"Say ""hi"""',
+            "bmc,temperature/ambient,1.000,20.5",
+            "bmc,temperature/ambient,2.000,21"]
+
+    directory = str(tmpdir.join("columns"))
+    sampler.export_columns(directory)
+    with open(os.path.join(directory, "columns.json")) as fp:
+        layout = json.load(fp)
+    assert layout["rows"] == 3
+    assert layout["series"] == [["bmc", PROGRESS], ["bmc", AMBIENT]]
+
+    columns = {}
+    for (name, column) in layout["columns"].items():
+        columns[name] = array.array(str(column["typecode"]))
+        with open(os.path.join(directory, column["file"]), "rb") as fp:
+            columns[name].fromfile(fp, layout["rows"])
+    assert list(columns["series"]) == [0, 1, 1]
+    assert list(columns["time"]) == [1.0, 1.0, 2.0]
+    assert list(columns["value"]) == [0.0, 20.5, 21.0]
+
+
+@pytest.mark.parametrize("capacity", [1, 60])
+def test_buffers_are_fixed_size(capacity):
+    sampler = Sampler(capacity=capacity)
+    for when in range(100):
+        sampler.record("bmc", float(when), {AMBIENT: 1.0})
+
+    assert sampler.nbytes() == capacity * (8 + 4)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for reusing login sessions with openbmc.OpenBMC.SessionCache.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=redefined-outer-name
+
+import json
+import os
+import stat
+
+import pytest
+
+from openbmc.OpenBMC import HTTPError, OpenBMC, SessionCache
+
+
+@pytest.fixture
+def sessions(tmpdir):
+    return SessionCache(str(tmpdir.join("sessions.json")))
+
+
+def connect(bmc, store, sessions, password=None):
+    if password is None:
+        password = bmc.password
+    return OpenBMC(bmc.hostname, bmc.user, password, True,
+                   session_cache=sessions, store=store)
+
+
+def logins(bmc):
+    return bmc.stats()["logins"]
+
+
+def test_a_saved_session_is_reused(bmc, store, sessions):
+    connect(bmc, store, sessions)
+    assert logins(bmc) == 1
+
+    ob = connect(bmc, store, sessions)
+    assert ob.get_power_state() == 0
+    assert logins(bmc) == 1
+
+
+def test_the_file_is_private_and_holds_no_password(bmc, store, sessions):
+    connect(bmc, store, sessions)
+
+    assert stat.S_IMODE(os.stat(sessions.filename).st_mode) == 0o600
+    with open(sessions.filename) as fp:
+        text = fp.read()
+    assert bmc.password not in text
+    assert set(json.loads(text)) == set(["%s@%s" % (bmc.user,
+                                                    bmc.hostname, )])
+
+
+def test_another_password_logs_in_itself(bmc, store, sessions):
+    connect(bmc, store, sessions)
+
+    with pytest.raises(HTTPError) as info:
+        connect(bmc, store, sessions, password="wrong")
+    assert info.value.get_status_code() == 401
+    assert logins(bmc) == 1
+
+
+def test_expired_entries_are_not_used(bmc, store, tmpdir):
+    sessions = SessionCache(str(tmpdir.join("sessions.json")), ttl=-1)
+    connect(bmc, store, sessions)
+    connect(bmc, store, sessions)
+
+    assert logins(bmc) == 2
+
+
+def test_a_session_the_bmc_dropped_is_replaced(bmc, store, sessions):
+    connect(bmc, store, sessions)
+    bmc.expire_sessions()
+
+    ob = connect(bmc, store, sessions)
+    assert ob.get_power_state() == 0
+    assert logins(bmc) == 2
+    # Only the new session's cookie is sent
+    assert [cookie.name for cookie in ob.session.session.cookies] == ["sid"]
+
+    # and it is what the next run picks up
+    connect(bmc, store, sessions).get_power_state()
+    assert logins(bmc) == 2
+
+
+def test_logging_in_replaces_a_loaded_cookie(bmc, store, sessions):
+    connect(bmc, store, sessions)
+    ob = connect(bmc, store, sessions)
+
+    ob._login()  # pylint: disable=protected-access
+
+    assert [cookie.name for cookie in ob.session.session.cookies] == ["sid"]
+
+
+def test_passwords_as_bytes_or_text_match(sessions):
+    password = u"pässwörd"
+    sessions.save("bmc", "root", password, {"sid": "1"})
+
+    assert sessions.load("bmc", "root", password) == {"sid": "1"}
+    assert sessions.load("bmc", "root", password.encode("utf-8")) == {
+        "sid": "1"}
+    assert sessions.load("bmc", "root", u"passwörd") is None
+
+
+def test_the_tool_logs_in_once_across_runs(bmc, tool):
+    tool("--online", "get_power_state")
+    tool("--online", "get_power_state")
+    assert logins(bmc) == 1
+
+    tool("--online", "--no-session-cache", "get_power_state")
+    assert logins(bmc) == 2
@@ -0,0 +1,134 @@
+"""
+Tests for openbmc.Snapshots.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=redefined-outer-name
+
+import os
+
+import pytest
+
+from openbmc.OpenBMC import OpenBMC
+from openbmc.Snapshots import SnapshotStore, compose_changes, diff_trees
+
+HOST = "bmc"
+KEY = "/org/openbmc/control/"
+
+
+def trees():
+    """Return a series of trees, each changing the one before"""
+
+    first = {"/a": {"x": 1, "y": 2}, "/b": {"z": 3}}
+    second = {"/a": {"x": 1, "y": 5}, "/b": {"z": 3}, "/c": {"w": 0}}
+    third = {"/a": {"x": 1}, "/c": {"w": 0}}
+    fourth = {"/a": {"x": 2}, "/b": {"z": 4}, "/c": {"w": 0}}
+    return [first, second, third, fourth]
+
+
+@pytest.fixture
+def snapshots(tmpdir):
+    return SnapshotStore(str(tmpdir.join("snapshots")))
+
+
+def record_all(snapshots, series):
+    for (number, tree) in enumerate(series):
+        snapshots.record(HOST, KEY, tree, when=1000.0 + number)
+
+
+def changes_filename(snapshots):
+    return os.path.join(snapshots.directory, HOST,
+                        "org_openbmc_control.changes.ndjson")
+
+
+def test_every_snapshot_comes_back(snapshots):
+    series = trees()
+    record_all(snapshots, series)
+
+    assert snapshots.times(HOST, KEY) == [1000.0, 1001.0, 1002.0, 1003.0]
+    for (number, tree) in enumerate(series):
+        assert snapshots.tree(HOST, KEY, number) == tree
+    assert snapshots.tree(HOST, KEY) == series[-1]
+
+
+def test_diff_in_either_direction(snapshots):
+    series = trees()
+    record_all(snapshots, series)
+
+    for start in range(len(series)):
+        for end in range(len(series)):
+            assert (snapshots.diff(HOST, KEY, start, end) ==
+                    diff_trees(series[start], series[end]))
+
+
+def test_compose_matches_a_direct_diff():
+    series = trees()
+    runs = [diff_trees(old, new) for (old, new) in zip(series, series[1:])]
+
+    assert compose_changes(runs) == diff_trees(series[0], series[-1])
+
+
+def test_no_snapshots(snapshots):
+    assert snapshots.times(HOST, KEY) == []
+    with pytest.raises(KeyError):
+        snapshots.tree(HOST, KEY)
+
+
+def test_a_half_written_change_is_skipped(snapshots):
+    series = trees()
+    record_all(snapshots, series[:2])
+
+    # As if interrupted while appending
+    with open(changes_filename(snapshots), "ab") as fp:
+        fp.write(b'{"time": 1002.0, "changes": {"added"')
+
+    snapshots.record(HOST, KEY, series[2], when=1002.0)
+    snapshots.record(HOST, KEY, series[3], when=1003.0)
+
+    assert snapshots.times(HOST, KEY) == [1000.0, 1001.0, 1002.0, 1003.0]
+    assert snapshots.diff(HOST, KEY, 0, 3) == diff_trees(series[0],
+                                                         series[3])
+    assert snapshots.diff(HOST, KEY) == diff_trees(series[2], series[3])
+    for (number, tree) in enumerate(series):
+        assert snapshots.tree(HOST, KEY, number) == tree
+
+
+def test_a_lost_index_and_latest_tree_are_rebuilt(snapshots):
+    series = trees()
+    record_all(snapshots, series)
+
+    prefix = changes_filename(snapshots)[:-len(".changes.ndjson")]
+    os.unlink(prefix + ".changes.index")
+    os.unlink(prefix + ".latest.json")
+
+    assert snapshots.tree(HOST, KEY) == series[-1]
+    assert snapshots.diff(HOST, KEY, 1, 3) == diff_trees(series[1],
+                                                         series[3])
+    assert os.path.exists(prefix + ".changes.index")
+
+
+def test_take_from_a_mock(bmc, store, snapshots):
+    ob = OpenBMC(bmc.hostname, bmc.user, bmc.password, True, store=store)
+
+    first = snapshots.take(ob, KEY)
+    assert "/org/openbmc/control/power0" in first["added"]
+
+    ob.power_on()
+    changes = snapshots.take(ob, KEY)
+
+    assert changes["changed"]["/org/openbmc/control/power0"]["changed"][
+        "state"] == [0, 1]
+    assert snapshots.tree(bmc.hostname, KEY, 0)[
+        "/org/openbmc/control/power0"]["state"] == 0
@@ -0,0 +1,102 @@
+"""
+Tests for openbmc.StateWaiter.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import time
+
+from openbmc.MockOpenBMC import MockOpenBMC
+from openbmc.StateWaiter import StateWaiter, wait_until
+
+
+def counter(reached_after):
+    """Return a check which answers True from its reached_after'th call"""
+
+    calls = []
+
+    def check():
+        calls.append(time.time())
+        return len(calls) >= reached_after
+
+    return check
+
+
+def test_hosts_finish_as_they_get_there():
+    waiter = StateWaiter(initial=0.01, factor=1, maximum=0.01)
+    waiter.add("slow", counter(10), bool)
+    waiter.add("fast", counter(2), bool)
+
+    results = list(waiter.wait(5))
+
+    assert [result.name for result in results] == ["fast", "slow"]
+    assert all(result.reached for result in results)
+    assert [result.polls for result in results] == [2, 10]
+
+
+def test_a_hung_host_does_not_hold_up_the_others():
+    def hang():
+        time.sleep(1)
+        return False
+
+    waiter = StateWaiter(initial=0.01)
+    waiter.add("hung", hang, bool)
+    waiter.add("up", counter(3), bool)
+
+    start = time.time()
+    results = waiter.wait(0.5)
+    first = next(results)
+
+    assert first.name == "up"
+    assert time.time() - start < 0.5
+    rest = list(results)
+    assert [(result.name, result.reached) for result in rest] == [
+        ("hung", False)]
+
+
+def test_errors_count_as_not_there_yet():
+    def fail():
+        raise IOError("rebooting")
+
+    result = wait_until(fail, bool, 0.1, initial=0.01)
+
+    assert not result.reached
+    assert isinstance(result.error, IOError)
+    assert result.polls > 1
+
+
+def test_tool_waits_for_every_host(bmc, tool, tmpdir):
+    other = MockOpenBMC().start()
+    hosts_file = tmpdir.join("hosts.txt")
+    hosts_file.write("%s\n%s\n" % (bmc.hostname, other.hostname))
+    try:
+        other.set_power(1)
+
+        (out, _) = tool("--online", "--hosts-file", str(hosts_file),
+                        "--user", bmc.user, "--password", bmc.password,
+                        "wait_power", "on", "--timeout", "1",
+                        login=False,
+                        status=2)
+    finally:
+        other.stop()
+
+    # The host which was already there comes first
+    lines = [json.loads(line) for line in out.splitlines()]
+    assert [(line["hostname"], line["rc"], line["output"])
+            for line in lines] == [
+                (other.hostname, True, "Power is on\n"),
+                (bmc.hostname, False, "Timed out waiting for power on\n")]
+    # Polling only logs in once
+    assert bmc.stats()["logins"] == 1
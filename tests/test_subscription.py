@@ -0,0 +1,109 @@
+"""
+Tests for openbmc.Subscription against the mock's /subscribe websocket.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=redefined-outer-name
+
+import pytest
+
+from openbmc.EventSync import EventSync
+from openbmc.OpenBMC import EVENTS_PATH, OpenBMC
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+pytest.importorskip("websocket")
+
+# pylint: disable=wrong-import-position
+from openbmc.Subscription import Subscription
+
+POWER = "/org/openbmc/control/power0"
+
+
+@pytest.fixture
+def subscribe(bmc, store, tmpdir):
+    subscriptions = []
+
+    def start(paths):
+        ob = OpenBMC(bmc.hostname, bmc.user, bmc.password, True, store=store)
+        sync = EventSync(ob,
+                         log_filename=str(tmpdir.join("events.ndjson")),
+                         state_filename=str(tmpdir.join("events.json")))
+        seen = queue.Queue()
+        subscription = Subscription(
+            ob,
+            paths=paths,
+            on_change=lambda path, properties: seen.put((path, properties)),
+            on_event=lambda path, record: seen.put((path, None)),
+            event_sync=sync)
+        subscription.start()
+        subscriptions.append(subscription)
+        return seen
+
+    yield start
+
+    for subscription in subscriptions:
+        subscription.stop()
+
+
+def next_change(seen, path):
+    # The mock notifies every subscriber of every change
+    while True:
+        change = seen.get(timeout=10)
+        if change[0] == path:
+            return change[1]
+
+
+def test_changes_are_pushed(bmc, subscribe):
+    seen = subscribe([POWER])
+
+    assert next_change(seen, POWER)["state"] == 0
+
+    # The subscriber is in place once the state has been fetched
+    bmc.set_power(1)
+    assert next_change(seen, POWER) == {"state": 1, "pgood": 1}
+
+
+def test_events_are_pushed(bmc, subscribe):
+    seen = subscribe([EVENTS_PATH])
+
+    # The events already logged come first, oldest first
+    assert [seen.get(timeout=10)[0] for _ in range(4)] == [
+        "%s%d" % (EVENTS_PATH, number) for number in range(1, 5)]
+
+    path = bmc.add_event()
+    assert seen.get(timeout=10) == (path, None)
+
+
+def test_tool_watch(bmc, tool):
+    (out, _) = tool("--online", "watch", "--duration", "1", POWER)
+
+    assert out.splitlines()[0] == POWER
+
+
+def test_tool_watch_without_websocket_client(tool, tmpdir):
+    # A websocket module which cannot be imported hides the real one
+    shim = tmpdir.mkdir("shim")
+    shim.join("websocket.py").write("raise ImportError('No module named"
+                                    " websocket')\n")
+    pythonpath = "%s:%s" % (shim, tool.env["PYTHONPATH"])
+
+    (_, err) = tool("--online", "watch", "--duration", "1",
+                    env={"PYTHONPATH": pythonpath},
+                    status=2)
+    assert "watch needs websocket-client" in err
@@ -0,0 +1,88 @@
+"""
+Tests for remembering control object paths with openbmc.OpenBMC.TopologyCache.
+"""
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=redefined-outer-name
+
+import pytest
+
+from openbmc.OpenBMC import OpenBMC, TopologyCache
+
+ENUMERATE = "/org/openbmc/control/enumerate"
+VERSION = "/org/openbmc/control/flash/bmc"
+MOCK_VERSION = "v1.99.0-mock"
+
+
+@pytest.fixture
+def topology(tmpdir):
+    return TopologyCache(str(tmpdir.join("topology.json")))
+
+
+def connect(bmc, store, topology):
+    return OpenBMC(bmc.hostname, bmc.user, bmc.password, True,
+                   topology_cache=topology, store=store)
+
+
+def remember(bmc, topology, chassis, version=MOCK_VERSION):
+    topology.save(bmc.hostname, version, {
+        "0": {"control/power": "/org/openbmc/control/power0",
+              "control/chassis": chassis,
+              "control/bmc": "/org/openbmc/control/bmc0"}})
+
+
+def gets(seen, endpoint):
+    return len([info for info in seen
+                if info.method == "GET" and info.endpoint == endpoint])
+
+
+def test_paths_are_remembered(bmc, store, topology):
+    assert connect(bmc, store, topology).get_power_state() == 0
+
+    (version, mappings) = topology.load(bmc.hostname)
+    assert version == MOCK_VERSION
+    assert mappings["0"]["control/chassis"] == "/org/openbmc/control/chassis0"
+
+
+def test_remembered_paths_skip_enumeration(bmc, store, topology,
+                                           requests_seen):
+    remember(bmc, topology, "/org/openbmc/control/chassis0")
+
+    ob = connect(bmc, store, topology)
+    assert gets(requests_seen, VERSION) == 0
+
+    assert ob.get_power_state() == 0
+    assert ob.get_power_state() == 0
+    assert gets(requests_seen, ENUMERATE) == 0
+    assert gets(requests_seen, VERSION) == 1
+
+
+def test_rediscovers_on_404(bmc, store, topology, requests_seen):
+    remember(bmc, topology, "/org/openbmc/control/chassis7")
+
+    assert connect(bmc, store, topology).get_power_state() == 0
+    assert gets(requests_seen, ENUMERATE) == 1
+
+    (_, mappings) = topology.load(bmc.hostname)
+    assert mappings["0"]["control/chassis"] == "/org/openbmc/control/chassis0"
+
+
+def test_new_firmware_forgets_paths(bmc, store, topology, requests_seen):
+    remember(bmc, topology, "/org/openbmc/control/chassis0",
+             version="v1.0.0-old")
+
+    assert connect(bmc, store, topology).get_power_state() == 0
+    assert gets(requests_seen, ENUMERATE) == 1
+    assert topology.load(bmc.hostname)[0] == MOCK_VERSION